@@ -29,10 +29,19 @@ import FRTBCalculator
 
 
 class CB_BA_BA_CVA(FRTBCalculator.FRTBCalculator):
-    def __init__(self, assetClass, regulator, ccy, cob):
-        super().__init__(assetClass, regulator, ccy, cob)
-        self._DS = self.getConfigItem('BA-DiscountScalar')
-        self._rho = self.getConfigItem('BA-Rho')
+    _parameterSheet = 'CVA'
+    _parameters = {
+        'BA-DiscountScalar' : float,
+        'BA-Rho'            : float
+    }
+
+    @property
+    def _DS(self):
+        return self._params.BA_DiscountScalar
+
+    @property
+    def _rho(self):
+        return self._params.BA_Rho
 
 
     def getConfigItem(self, item):
@@ -71,6 +80,7 @@ class CB_BA_BA_CVA(FRTBCalculator.FRTBCalculator):
 
 @FRTBCalculator.registerClass
 class CB_RE_BACVA_Reduced(CB_BA_BA_CVA):
+    @FRTBCalculator.pinConfig
     def calcRiskClassCapital(self, riskClass, df):
         df = self.calcSCVA(df)
         BACVA = {}
@@ -84,13 +94,26 @@ class CB_RE_BACVA_Reduced(CB_BA_BA_CVA):
 
 @FRTBCalculator.registerClass
 class CB_FU_BACVA_Full(CB_BA_BA_CVA):
-    def __init__(self, assetClass, regulator, ccy, cob, **kwargs):
-        super().__init__(assetClass, regulator, ccy, cob, **kwargs)
-        self._rDirect = self.getConfigItem('BA-rDirect')
-        self._rRelated = self.getConfigItem('BA-rRelated')
-        self._rSectorRegion = self.getConfigItem('BA-rSectorRegion')
+    _parameters = {
+        'BA-rDirect'        : float,
+        'BA-rRelated'       : float,
+        'BA-rSectorRegion'  : float
+    }
+
+    @property
+    def _rDirect(self):
+        return self._params.BA_rDirect
+
+    @property
+    def _rRelated(self):
+        return self._params.BA_rRelated
+
+    @property
+    def _rSectorRegion(self):
+        return self._params.BA_rSectorRegion
 
 
+    @FRTBCalculator.pinConfig
     def calcRiskClassCapital(self, riskClass, df):
         df = self.calcSCVA(df)
         BACVA = {}
@@ -0,0 +1,63 @@
+"""
+Compare the time taken to build a complete FRTBConfig from the regulator's workbook with the
+time taken to load it from the compiled snapshots, and with lazily loading just one risk class.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FRTBConfig as cf
+
+
+regulators = ['BCBS', 'UK-PRA', 'EU-EBA', 'SG-MAS', 'SA-SARB']
+repeats = 5
+
+
+def timeLoad(regulator, useSnapshot, riskClass=None):
+    best = None
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+
+        if riskClass is None:
+            cf.FRTBConfig(regulator, useSnapshot=useSnapshot, lazy=False)
+        else:
+            cf.FRTBConfig(regulator, useSnapshot=useSnapshot).getConfig(riskClass)
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == '__main__':
+    print(f"{'Regulator':<10} {'xlsx (ms)':>12} {'snapshot (ms)':>14} {'speed-up':>9} {'xlsx MS_FX only (ms)':>21}")
+
+    for regulator in regulators:
+        cf.FRTBConfig(regulator, lazy=False)        # make sure the snapshots are built and current
+        xlsxTime = timeLoad(regulator, False)
+        snapTime = timeLoad(regulator, True)
+        lazyTime = timeLoad(regulator, False, 'MS_FX')
+        print(f"{regulator:<10} {xlsxTime * 1000:>12.1f} {snapTime * 1000:>14.2f} {xlsxTime / snapTime:>8.0f}x {lazyTime * 1000:>21.1f}")
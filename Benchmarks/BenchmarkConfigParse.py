@@ -0,0 +1,75 @@
+"""
+Time the parsing of each sheet of each regulator's config workbook, split into reading the
+cells from the workbook and extracting the keyed data from them (FRTBUtils.extractKeyedData).
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FRTBConfig as cf
+import FRTBUtils as FNU
+
+
+regulators = ['BCBS', 'UK-PRA', 'EU-EBA', 'SG-MAS', 'SA-SARB']
+repeats = 20
+
+
+def timeSheet(config, sheet):
+    ws = config._getWorkbook()[sheet]
+    keyTypes = config._riskClassCongigKeyTypes[sheet]
+    dataTypes = config._riskClassKeyDataType[sheet]
+    bestRead = bestExtract = None
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cfgdf = pd.DataFrame(config.getCellValues(ws)).fillna('')
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        FNU.extractKeyedData(sheet, cfgdf, dataTypes, **keyTypes)
+        extract = time.perf_counter() - start
+
+        bestRead = read if bestRead is None else min(bestRead, read)
+        bestExtract = extract if bestExtract is None else min(bestExtract, extract)
+
+    return cfgdf.shape, bestRead, bestExtract
+
+
+if __name__ == '__main__':
+    for regulator in regulators:
+        config = cf.FRTBConfig(regulator, useSnapshot=False)
+        totalRead = totalExtract = 0.0
+        print()
+        print(regulator)
+        print(f"  {'Sheet':<8} {'cells':>9} {'read (ms)':>10} {'extract (ms)':>13}")
+
+        for sheet in config.getConfigList():
+            shape, read, extract = timeSheet(config, sheet)
+            totalRead += read
+            totalExtract += extract
+            print(f"  {sheet:<8} {shape[0]:>4}x{shape[1]:<4} {read * 1000:>10.2f} {extract * 1000:>13.2f}")
+
+        print(f"  {'Total':<8} {'':>9} {totalRead * 1000:>10.2f} {totalExtract * 1000:>13.2f}")
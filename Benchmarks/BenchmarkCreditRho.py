@@ -0,0 +1,152 @@
+"""
+Time building the credit spread (MS_CR, MS_CC and MS_CS) delta and vega rho matrices of a bucket with the
+shared SA_SBM_Calc.getCreditRho, which builds them with numpy from masks of which pairs of factors have
+different names, CurveTypes and Tenors, against the loop over every pair of factors that it replaced,
+checking that the two give bit-identical matrices.  MS_CR is timed for both an ordinary and an index bucket.
+
+    python BenchmarkCreditRho.py [factors per bucket ...] [--loop-max N]
+
+The default is buckets of 100, 1,000, 5,000 and 10,000 factors.  The loop grows with the square of the
+factors, so it is only run for buckets of up to 5,000 factors unless --loop-max is given.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FRTBCalculator
+import FRTBUtils as FNU
+import SA_SBM_Calc           # registers the SBM calculators with FRTBCalculator
+
+
+sizes = [100, 1000, 5000, 10000]
+loopMax = 5000
+regulator = 'BCBS'
+tenors = ['0.5', '1', '3', '5', '10']
+
+# (asset class, bucket) of each bucket timed, MS_CR's bucket 17 is an index bucket
+buckets = [('MS_CR', '1'), ('MS_CR', '17'), ('MS_CC', '1'), ('MS_CS', '1')]
+
+
+def makeFactors(calc, riskType, n):
+    # n factors of a bucket over n / 5 names, each with bond and CDS curves
+    rng = np.random.default_rng(n)
+    nameField = calc._rhoFactorFields[riskType][0]
+    names = np.char.add('Name', rng.integers(0, max(1, n // 5), n).astype(str))
+
+    if riskType == 'Delta':
+        return pd.DataFrame({
+            nameField       : names,
+            'CurveType'     : np.array(['Bond', 'CDS'])[rng.integers(0, 2, n)],
+            'Tenor'         : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+    else:
+        return pd.DataFrame({
+            nameField           : names,
+            'OptionMaturity'    : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+
+
+def loopRho(calc, riskClass, bucket, df):
+    # The getRho of MS_CR, MS_CC and MS_CS as they were, looping over every pair of factors
+    rho = np.zeros((df.shape[0], df.shape[0]))
+    factors = df[calc._rhoFactorFields[riskClass[5:]]]
+    params = calc._params
+
+    if bucket in getattr(params, 'IndexBuckets', []):
+        nameRho = params.DeltaNameIndexRho
+        tenorRho = params.DeltaTenorIndexRho
+        basisRho = params.DeltaBasisIndexRho
+    else:
+        nameRho = params.DeltaTrancheRho if riskClass[:5] == 'MS_CS' else params.DeltaNameRho
+        tenorRho = params.DeltaTenorRho
+        basisRho = params.DeltaBasisRho
+
+    if riskClass[5:] == 'Vega':
+        optionTenorRho = calc.getFastLookup('VegaOptionTenorRho')
+        optionIdx = FNU.encodeLabels(calc.getFastLookup('VegaTenors'), factors['OptionMaturity'])
+
+    for i, r in enumerate(factors.itertuples(index=False)):
+        for j, c in enumerate(factors.itertuples(index=False)):
+            if i <= j:
+                break
+
+            corr = 1.0
+
+            if r[0] != c[0]:
+                corr *= nameRho
+
+            if riskClass[5:] == 'Delta':
+                if r[1] != c[1]:
+                    corr *= basisRho
+
+                if r[2] != c[2]:
+                    corr *= tenorRho
+            elif riskClass[5:] == 'Vega':
+                corr = min(corr * optionTenorRho[optionIdx[i], optionIdx[j]], 1.0)
+
+            rho[i, j] = rho[j, i] = corr
+
+    return pd.DataFrame(rho, index=df.index, columns=df.index)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    if '--loop-max' in args:
+        i = args.index('--loop-max')
+        loopMax = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+
+    if args:
+        sizes = [int(x) for x in args]
+
+    print(f"{'Risk class':<12} {'bucket':>6} {'factors':>8} {'loop (s)':>10} {'numpy (s)':>10} {'ratio':>8}  identical")
+
+    for riskType in ['Delta', 'Vega']:
+        for assetClass, bucket in buckets:
+            calc = FRTBCalculator.FRTBCalculator.create(assetClass, regulator, 'USD', dt.date(2024, 4, 1))
+            riskClass = assetClass + riskType
+
+            for n in sizes:
+                df = makeFactors(calc, riskType, n)
+                after, rho = timed(lambda : calc.getRho(riskClass, bucket, df))
+
+                if n <= loopMax:
+                    before, expected = timed(lambda : loopRho(calc, riskClass, bucket, df))
+                    same = expected.to_numpy().tobytes() == rho.to_numpy().tobytes()
+                    print(f"{riskClass:<12} {bucket:>6} {n:>8,} {before:>10.3f} {after:>10.3f} {before / after:>7.0f}x  {same}")
+                else:
+                    print(f"{riskClass:<12} {bucket:>6} {n:>8,} {'-':>10} {after:>10.3f} {'-':>8}")
+
+                del rho
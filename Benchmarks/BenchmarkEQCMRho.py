@@ -0,0 +1,164 @@
+"""
+Time building the equity (MS_EQ) and commodity (MS_CM) delta and vega rho matrices of a bucket with their
+getRho, which build them with SA_SBM_Calc.getProductRho from masks of which pairs of factors have different
+names, spot / repo, tenors and delivery locations, against the loop over every pair of factors that they
+replaced, checking that the two give bit-identical matrices.
+
+    python BenchmarkEQCMRho.py [factors per bucket ...] [--loop-max N]
+
+The default is buckets of 100, 1,000, 5,000 and 10,000 factors.  The equity delta buckets hold a spot and
+a repo factor for each name.  The loop grows with the square of the factors, so it is only run for buckets
+of up to 5,000 factors unless --loop-max is given.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FRTBCalculator
+import FRTBUtils as FNU
+import SA_SBM_Calc           # registers the SBM calculators with FRTBCalculator
+
+
+sizes = [100, 1000, 5000, 10000]
+loopMax = 5000
+regulator = 'BCBS'
+bucket = '1'
+tenors = ['0.5', '1', '3', '5', '10']
+deltaTenors = ['0', '0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+
+
+def makeFactors(riskClass, n):
+    rng = np.random.default_rng(n)
+
+    if riskClass == 'MS_EQDelta':
+        # a spot and a repo factor for each of n / 2 names
+        return pd.DataFrame({
+            'EquityName'    : np.repeat(np.char.add('Equity', np.arange((n + 1) // 2).astype(str)), 2)[:n],
+            'SpotRepo'      : np.tile(['Spot', 'Repo'], (n + 1) // 2)[:n],
+        })
+    elif riskClass == 'MS_EQVega':
+        return pd.DataFrame({
+            'EquityName'        : np.char.add('Equity', rng.integers(0, max(1, n // 5), n).astype(str)),
+            'OptionMaturity'    : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+    elif riskClass == 'MS_CMDelta':
+        return pd.DataFrame({
+            'CommodityName'     : np.char.add('Commodity', rng.integers(0, max(1, n // 50), n).astype(str)),
+            'DeliveryLocation'  : np.char.add('Location', rng.integers(0, 5, n).astype(str)),
+            'Tenor'             : np.array(deltaTenors)[rng.integers(0, len(deltaTenors), n)],
+        })
+    else:
+        return pd.DataFrame({
+            'CommodityName'     : np.char.add('Commodity', rng.integers(0, max(1, n // 5), n).astype(str)),
+            'OptionMaturity'    : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+
+
+def loopRho(calc, riskClass, bucket, df):
+    # The getRho of MS_EQ and MS_CM as they were, looping over every pair of factors
+    rho = np.zeros((df.shape[0], df.shape[0]))
+    factors = df[calc._rhoFactorFields[riskClass[5:]]]
+    params = calc._params
+
+    if riskClass[:5] == 'MS_EQ':
+        nameRho = params.DeltaNameBucketRho[bucket]
+        spotRepoRho = params.DeltaSpotRepoRho
+    else:
+        nameRho = params.DeltaCommodityRho[bucket]
+        deltaTenorRho = params.DeltaTenorRho
+        basisRho = params.DeltaBasisRho
+
+    if riskClass[5:] == 'Vega':
+        optionTenorRho = calc.getFastLookup('VegaOptionTenorRho')
+        optionIdx = FNU.encodeLabels(calc.getFastLookup('VegaTenors'), factors['OptionMaturity'])
+
+    for i, r in enumerate(factors.itertuples(index=False)):
+        for j, c in enumerate(factors.itertuples(index=False)):
+            if i <= j:
+                break
+
+            corr = 1.0
+
+            if r[0] != c[0]:
+                corr *= nameRho
+
+            if riskClass == 'MS_EQDelta':
+                if r[1] != c[1]:
+                    corr *= spotRepoRho
+            elif riskClass == 'MS_EQVega':
+                if r[1] != c[1]:
+                    corr = min(corr * optionTenorRho[optionIdx[i], optionIdx[j]], 1.0)
+            elif riskClass == 'MS_CMDelta':
+                if r[2] != c[2]:
+                    corr *= deltaTenorRho
+
+                if r[1] != c[1]:
+                    corr *= basisRho
+            elif riskClass == 'MS_CMVega':
+                corr = min(corr * optionTenorRho[optionIdx[i], optionIdx[j]], 1)
+
+            rho[i, j] = rho[j, i] = corr
+
+    return pd.DataFrame(rho, index=df.index, columns=df.index)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    if '--loop-max' in args:
+        i = args.index('--loop-max')
+        loopMax = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+
+    if args:
+        sizes = [int(x) for x in args]
+
+    print(f"{'Risk class':<12} {'factors':>8} {'loop (s)':>10} {'numpy (s)':>10} {'ratio':>8}  identical")
+
+    for assetClass in ['MS_EQ', 'MS_CM']:
+        calc = FRTBCalculator.FRTBCalculator.create(assetClass, regulator, 'USD', dt.date(2024, 4, 1))
+
+        for riskClass in [assetClass + 'Delta', assetClass + 'Vega']:
+            for n in sizes:
+                df = makeFactors(riskClass, n)
+                after, rho = timed(lambda : calc.getRho(riskClass, bucket, df))
+
+                if n <= loopMax:
+                    before, expected = timed(lambda : loopRho(calc, riskClass, bucket, df))
+                    same = expected.to_numpy().tobytes() == rho.to_numpy().tobytes()
+                    print(f"{riskClass:<12} {n:>8,} {before:>10.3f} {after:>10.3f} {before / after:>7.0f}x  {same}")
+                else:
+                    print(f"{riskClass:<12} {n:>8,} {'-':>10} {after:>10.3f} {'-':>8}")
+
+                del rho
@@ -0,0 +1,133 @@
+"""
+Time loading a large CSV extract of sensitivities into FNetF with the streaming FNetF.loadCSV and,
+for comparison, by reading the whole file with pd.read_csv and splitting it by RiskClass for
+FNetF.setRiskClassData.  Reports rows/sec, and the peak RSS of the process doing the load alongside
+its RSS once the load is done, which is mostly the loaded data.
+
+    python BenchmarkFNetFCSV.py [rows] [stream|full ...]
+
+The default is 20M rows and just the streaming load, as reading the whole file needs several times
+the memory of the loaded data.  Each load runs in a fresh process so that the peak RSS is its own.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+
+
+rows = 20_000_000
+modes = ['stream']
+chunkRows = 1_000_000
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25y', '0.5y', '1y', '2y', '3y', '5y', '10y', '15y', '20y', '30y']
+
+
+def writeCSV(path, rows):
+    # a mix of MS_IRDelta, MS_FXDelta and MS_EQDelta rows, written a chunk at a time
+    rng = np.random.default_rng(1)
+
+    for start in range(0, rows, chunkRows):
+        n = min(chunkRows, rows - start)
+        riskClass = np.array(['MS_IRDelta', 'MS_FXDelta', 'MS_EQDelta'])[rng.integers(0, 3, n)]
+        isIR = riskClass == 'MS_IRDelta'
+        isEQ = riskClass == 'MS_EQDelta'
+        pd.DataFrame({
+            'Sensitivity ID'    : [f"S_{i}" for i in range(start, start + n)],
+            'RiskGroup'         : 'Bench',
+            'RiskSubGroup'      : np.array([f"Desk{i}" for i in range(20)])[rng.integers(0, 20, n)],
+            'RiskClass'         : riskClass,
+            'Bucket'            : np.where(isEQ, rng.integers(1, 12, n).astype(str), np.array(ccys)[rng.integers(0, len(ccys), n)]),
+            'CurveType'         : np.where(isIR, 'IR', ''),
+            'Curve'             : np.where(isIR, 'OIS', ''),
+            'Tenor'             : np.where(isIR, np.array(tenors)[rng.integers(0, len(tenors), n)], ''),
+            'SubBucket'         : '',
+            'EquityName'        : np.where(isEQ, np.char.add('EQ', rng.integers(0, 5000, n).astype(str)), ''),
+            'SpotRepo'          : np.where(isEQ, 'Spot', ''),
+            'Sensitivity'       : rng.normal(0.0, 1000.0, n),
+        }).to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def residentBytes():
+    # the current RSS, where /proc is available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return float('nan')
+
+
+def load(path, mode, results):
+    start = time.perf_counter()
+    fnf = FNetF.FNetF()
+
+    if mode == 'stream':
+        fnf.loadCSV(path)
+    else:
+        df = pd.read_csv(path, dtype={'Sensitivity' : 'float64'}, keep_default_na=False)
+
+        for riskClass, sensis in df.groupby('RiskClass'):
+            fnf.setRiskClassData(riskClass, sensis)
+
+        del df
+
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    results.put((elapsed, peak, residentBytes()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        modes = sys.argv[2:]
+
+    # the peak RSS is inherited by child processes, so the file is written in a process of its own too
+    path = os.path.join(tempfile.mkdtemp(), 'Sensitivities.csv')
+    ctx = mp.get_context('spawn')
+    start = time.perf_counter()
+    proc = ctx.Process(target=writeCSV, args=(path, rows))
+    proc.start()
+    proc.join()
+    print(f"Wrote {rows:,} rows, {os.path.getsize(path) / 2**20:,.0f} MB in {time.perf_counter() - start:.1f}s")
+    print(f"{'Mode':<8} {'load (s)':>9} {'rows/s':>12} {'peak RSS (MB)':>14} {'final RSS (MB)':>15}")
+
+    try:
+        for mode in modes:
+            results = ctx.Queue()
+            proc = ctx.Process(target=load, args=(path, mode, results))
+            proc.start()
+            elapsed, peak, final = results.get()
+            proc.join()
+            print(f"{mode:<8} {elapsed:>9.1f} {rows / elapsed:>12,.0f} {peak / 2**20:>14,.0f} {final / 2**20:>15,.0f}")
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
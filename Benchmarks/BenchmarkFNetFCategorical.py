@@ -0,0 +1,136 @@
+"""
+Compare holding the FNetF key fields as Python strings with holding them as categoricals seeded from
+the config (FNetF.setCategorical), on a synthetic portfolio of MS_IRDelta and MS_EQDelta sensitivities.
+Reports the memory used by the sensitivities and the time taken by the groupbys and label lookups
+the SBM calculator does on them.
+
+    python BenchmarkFNetFCategorical.py [rows]
+
+The default is 1M rows of each risk class.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+import FRTBConfig as cf
+import FRTBCalculator
+import FRTBUtils as FNU
+import SA_SBM_Calc
+
+
+rows = 1_000_000
+regulator = 'BCBS'
+repeats = 3
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+
+
+def makeSensis(rows):
+    rng = np.random.default_rng(1)
+    common = {
+        'RiskGroup'         : 'Bench',
+        'RiskSubGroup'      : np.array([f"Desk{i}" for i in range(20)])[rng.integers(0, 20, rows)],
+    }
+    ir = pd.DataFrame({
+        'Sensitivity ID'    : [f"IR_{i}" for i in range(rows)],
+        **common,
+        'RiskClass'         : 'MS_IRDelta',
+        'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), rows)],
+        'CurveType'         : 'IR',
+        'Curve'             : np.array(['OIS', 'LIBOR3M', 'LIBOR6M'])[rng.integers(0, 3, rows)],
+        'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), rows)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+    })
+    eq = pd.DataFrame({
+        'Sensitivity ID'    : [f"EQ_{i}" for i in range(rows)],
+        **common,
+        'RiskClass'         : 'MS_EQDelta',
+        'Bucket'            : rng.integers(1, 12, rows).astype(str),
+        'SubBucket'         : '',
+        'EquityName'        : np.char.add('EQ', rng.integers(0, 200, rows).astype(str)),
+        'SpotRepo'          : np.array(['Spot', 'Repo'])[rng.integers(0, 2, rows)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+    })
+    return {'MS_IRDelta' : ir, 'MS_EQDelta' : eq}
+
+
+def best(f):
+    times = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def timeRiskClass(calc, riskClass, df):
+    keyFields = ['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + calc.getFactorNettingFields(riskClass)
+    weighted = calc.applyRiskWeights(riskClass, df)
+    return {
+        'groupby Bucket'    : best(lambda : [len(x) for _, x in df.groupby('Bucket', observed=True)]),
+        'groupby factors'   : best(lambda : weighted.groupby(keyFields + ['RiskWeight'], observed=True)[['Sensitivity', 'WeightedSensitivity']].sum()),
+        'risk weights'      : best(lambda : calc.getRiskWeights(riskClass, df.copy())),
+        'bucket labels'     : best(lambda : FNU.encodeLabels(calc.getFastLookup('BucketCodes'), FNU.joinLabels(df['Bucket'], df['SubBucket'])))
+                              if 'SubBucket' in df.columns else float('nan'),
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    sensis = makeSensis(rows)
+    config = cf.getSharedConfig(regulator)
+    results = {}
+
+    for categorical in [False, True]:
+        fnf = FNetF.FNetF()
+        fnf.setCategorical(categorical, config)
+
+        for riskClass, df in sensis.items():
+            fnf.setRiskClassData(riskClass, df)
+
+        for riskClass in sensis.keys():
+            df = fnf.getRiskClassData(riskClass)
+            calc = FRTBCalculator.FRTBCalculator.create(riskClass[:5], regulator, 'USD', dt.date(2024, 4, 1))
+            timings = timeRiskClass(calc, riskClass, df)
+            timings['memory (MB)'] = df.memory_usage(deep=True).sum() / 2**20
+            results[(riskClass, categorical)] = timings
+
+    print(f"{rows:,} rows per risk class, best of {repeats}, times in seconds")
+
+    for riskClass in sensis.keys():
+        print()
+        print(f"{riskClass:<16} {'str':>10} {'categorical':>12} {'ratio':>8}")
+
+        for measure, str_ in results[(riskClass, False)].items():
+            cat = results[(riskClass, True)][measure]
+            print(f"  {measure:<14} {str_:>10.3f} {cat:>12.3f} {str_ / cat:>7.1f}x")
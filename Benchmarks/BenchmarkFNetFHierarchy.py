@@ -0,0 +1,136 @@
+"""
+Time pulling the sensitivities of each desk (RiskGroup and RiskSubGroup), and of each of its buckets, out of
+a large risk class by filtering the whole risk class for them, against slicing the contiguous rows of each
+from an FNetF sorted with FNetF.setHierarchyIndex.  Also times splitting each desk into its buckets with
+groupby('Bucket'), as the calculators do, against using the bucket ranges of the hierarchy index.  Filtering
+for each bucket of every desk takes minutes, so the buckets are only timed for the desks of one RiskGroup.
+
+    python BenchmarkFNetFHierarchy.py [rows] [RiskGroups] [RiskSubGroups per RiskGroup]
+
+The default is 1M MS_IRDelta sensitivities in 20 RiskGroups of 10 RiskSubGroups each.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+import FRTBUtils as FNU
+
+
+rows = 1_000_000
+riskGroups = 20
+riskSubGroups = 10
+riskClass = 'MS_IRDelta'
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+
+
+def makeSensis(rows):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'Sensitivity ID'    : np.char.add('IR_', np.arange(rows).astype(str)).astype(object),
+        'RiskGroup'         : np.array([f"Desk{i}" for i in range(riskGroups)])[rng.integers(0, riskGroups, rows)],
+        'RiskSubGroup'      : np.array([f"Book{i}" for i in range(riskSubGroups)])[rng.integers(0, riskSubGroups, rows)],
+        'RiskClass'         : riskClass,
+        'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), rows)],
+        'CurveType'         : 'IR',
+        'Curve'             : np.array(['OIS', 'LIBOR3M', 'LIBOR6M'])[rng.integers(0, 3, rows)],
+        'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), rows)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+    })
+
+
+def timed(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def filterDesks(df, desks):
+    for riskGroup, riskSubGroup in desks:
+        df[(df['RiskGroup'] == riskGroup) & (df['RiskSubGroup'] == riskSubGroup)]
+
+
+def filterDeskBuckets(df, desks):
+    for riskGroup, riskSubGroup in desks:
+        for bucket in ccys:
+            df[(df['RiskGroup'] == riskGroup) & (df['RiskSubGroup'] == riskSubGroup) & (df['Bucket'] == bucket)]
+
+
+def sliceDesks(fnf, desks):
+    for riskGroup, riskSubGroup in desks:
+        fnf.getHierarchyData(riskClass, riskGroup, riskSubGroup)
+
+
+def sliceDeskBuckets(fnf, desks):
+    for riskGroup, riskSubGroup in desks:
+        for bucket in ccys:
+            fnf.getHierarchyData(riskClass, riskGroup, riskSubGroup, bucket)
+
+
+def splitBuckets(fnf, desks, ranges):
+    for riskGroup, riskSubGroup in desks:
+        df = fnf.getHierarchyData(riskClass, riskGroup, riskSubGroup)
+
+        for bucket, bucketSensis in FNU.groupRows(df, 'Bucket', fnf.getBucketRanges(riskClass, riskGroup, riskSubGroup) if ranges else None):
+            bucketSensis['Sensitivity'].sum()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        riskGroups = int(sys.argv[2])
+
+    if len(sys.argv) > 3:
+        riskSubGroups = int(sys.argv[3])
+
+    sensis = makeSensis(rows)
+    desks = [(f"Desk{i}", f"Book{j}") for i in range(riskGroups) for j in range(riskSubGroups)]
+
+    plain = FNetF.FNetF()
+    plain.setRiskClassData(riskClass, sensis)
+    df = plain.getRiskClassData(riskClass)
+
+    indexed = FNetF.FNetF()
+    indexed.setHierarchyIndex()
+    sortTime = timed(lambda : indexed.setRiskClassData(riskClass, sensis))
+    indexTime = timed(lambda : indexed.getHierarchy(riskClass))
+
+    print(f"{rows:,} rows, {len(desks)} desks of {len(ccys)} buckets, times in seconds")
+    print(f"  {'sort on setRiskClassData':<36} {sortTime:>9.3f}")
+    print(f"  {'build the hierarchy index':<36} {indexTime:>9.3f}")
+    print()
+    print(f"{'Every desk':<38} {'filter':>9} {'hierarchy':>10} {'ratio':>8}")
+
+    # filtering for every bucket of every desk takes minutes, so just those of the first RiskGroup's desks
+    for name, before, after in [('rows of the desk', lambda : filterDesks(df, desks), lambda : sliceDesks(indexed, desks)),
+                                ('rows of each bucket, first RiskGroup', lambda : filterDeskBuckets(df, desks[:riskSubGroups]), lambda : sliceDeskBuckets(indexed, desks[:riskSubGroups])),
+                                ('desk split into buckets', lambda : splitBuckets(indexed, desks, False), lambda : splitBuckets(indexed, desks, True))]:
+        before, after = timed(before), timed(after)
+        print(f"  {name:<36} {before:>9.3f} {after:>10.3f} {before / after:>7.0f}x")
@@ -0,0 +1,147 @@
+"""
+Compare the memory used by worker processes that each get a pickled copy of an FNetF's sensitivities
+with workers that each load the same mapped FNetF file (.fnmap), whose numeric columns and, with
+FNetF.setCategorical, key field codes are memory-mapped and so shared through the page cache.
+
+    python BenchmarkFNetFMapped.py [rows] [workers]
+
+The default is 2M MS_IRDelta sensitivities and 4 workers.  Each worker sums the sensitivities by Bucket
+and Tenor, so that it touches every page of the columns it uses, and reports its proportional set size
+(PSS), in which shared pages are divided between the processes sharing them.  Needs Linux for
+/proc/self/smaps_rollup.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+
+
+rows = 2_000_000
+workers = 4
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+
+
+def makeFNetF(rows):
+    rng = np.random.default_rng(1)
+    fnf = FNetF.FNetF()
+    fnf.setParam('COB Date', '2024-04-01')
+    fnf.setRiskClassData('MS_IRDelta', pd.DataFrame({
+        'Sensitivity ID'    : np.char.add('IR_', np.arange(rows).astype(str)).astype(object),
+        'RiskGroup'         : 'Bench',
+        'RiskSubGroup'      : np.array([f"Desk{i}" for i in range(20)])[rng.integers(0, 20, rows)],
+        'RiskClass'         : 'MS_IRDelta',
+        'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), rows)],
+        'CurveType'         : 'IR',
+        'Curve'             : np.array(['OIS', 'LIBOR3M', 'LIBOR6M'])[rng.integers(0, 3, rows)],
+        'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), rows)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+    }))
+    return fnf
+
+
+def memory():
+    # the PSS and the private memory of this process
+    mem = {}
+
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            fields = line.split()
+
+            if fields[0] in ['Pss:', 'Private_Clean:', 'Private_Dirty:']:
+                mem[fields[0][:-1]] = int(fields[1]) * 1024
+
+    return mem['Pss'], mem['Private_Clean'] + mem['Private_Dirty']
+
+
+def work(df, path, categorical, ready, done, results):
+    start = time.perf_counter()
+
+    if df is None:
+        fnf = FNetF.FNetF()
+
+        if categorical:
+            fnf.setCategorical()
+
+        fnf.load(path)
+        df = fnf.getRiskClassData('MS_IRDelta')
+
+    df.groupby(['Bucket', 'Tenor'], observed=True)['Sensitivity'].sum()
+    elapsed = time.perf_counter() - start
+    ready.put(None)
+    done.wait()         # so that all the workers are alive, and sharing, when they measure
+    results.put((elapsed,) + memory())
+
+
+def run(ctx, df, path, categorical):
+    ready, done, results = ctx.Queue(), ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=work, args=(df, path, categorical, ready, done, results)) for _ in range(workers)]
+
+    for proc in procs:
+        proc.start()
+
+    for proc in procs:
+        ready.get()
+
+    done.set()
+    stats = [results.get() for _ in procs]
+
+    for proc in procs:
+        proc.join()
+
+    return max(x[0] for x in stats), sum(x[1] for x in stats), sum(x[2] for x in stats)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        workers = int(sys.argv[2])
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'Bench.fnmap')
+
+    try:
+        fnf = makeFNetF(rows)
+        fnf.save(path)
+        df = fnf.getRiskClassData('MS_IRDelta')
+        print(f"{rows:,} rows, {df.memory_usage(deep=True).sum() / 2**20:,.0f} MB in memory, {workers} workers")
+        print(f"{'Workers get':<28} {'load + sum (s)':>15} {'total PSS (MB)':>15} {'total private (MB)':>19}")
+        ctx = mp.get_context('spawn')
+
+        for name, args in [('a pickled copy', (df, None, False)),
+                           ('the mapped file', (None, path, False)),
+                           ('the mapped file, categorical', (None, path, True))]:
+            elapsed, pss, private = run(ctx, *args)
+            print(f"{name:<28} {elapsed:>15.2f} {pss / 2**20:>15,.0f} {private / 2**20:>19,.0f}")
+    finally:
+        shutil.rmtree(tmpdir)
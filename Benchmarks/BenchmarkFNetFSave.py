@@ -0,0 +1,137 @@
+"""
+Time saving a large FNetF, and measure the peak memory of doing so, in each format.  For Excel the
+streaming save of FNetF.save is compared with writing each sheet with pd.DataFrame.to_excel through a
+pd.ExcelWriter, which builds the whole workbook in memory, as FNetF.save used to.  For Parquet and mapped
+(.fnmap) FNetFs, writing the tabs one at a time is compared with writing them concurrently.
+
+    python BenchmarkFNetFSave.py [rows per risk class] [risk classes]
+
+The default is 100k rows in each of 6 risk classes.  Each save runs in a fresh process so that its peak
+RSS is its own, and the RSS once the FNetF has been built is reported alongside it.  Parquet needs pyarrow.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+
+
+rows = 100_000
+riskClasses = 6
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+irClasses = ['MS_IRDelta', 'CS_IRDelta', 'MS_CCDelta', 'MS_CRDelta', 'MS_CSDelta', 'CS_CRDelta']
+
+
+def makeFNetF(rows, riskClasses):
+    rng = np.random.default_rng(1)
+    fnf = FNetF.FNetF()
+    fnf.setParam('COB Date', '2024-04-01')
+
+    for riskClass in irClasses[:riskClasses]:
+        fnf.setRiskClassData(riskClass, pd.DataFrame({
+            'Sensitivity ID'    : [f"{riskClass}_{i}" for i in range(rows)],
+            'RiskGroup'         : 'Bench',
+            'RiskSubGroup'      : np.array([f"Desk{i}" for i in range(20)])[rng.integers(0, 20, rows)],
+            'RiskClass'         : riskClass,
+            'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), rows)],
+            'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), rows)],
+            'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+        }))
+
+    return fnf
+
+
+def saveWithExcelWriter(fnf, filename):
+    # FNetF.save's Excel output before it was streamed
+    writer = pd.ExcelWriter(filename)
+    pd.DataFrame(fnf.getParams(), index=['Params']).T['Params'].to_excel(writer, sheet_name=fnf.FNF_Params_Tab, index=True, header=False)
+
+    for riskClass in fnf.getRiskClasses():
+        df = fnf.getRiskClassData(riskClass)
+        cols = [x for x in ['Sensitivity ID'] + list(FNetF.FNetFieldType[riskClass].keys()) if x in df.columns]
+        df[cols].to_excel(writer, sheet_name=riskClass, index=False)
+
+    writer.close()
+
+
+def residentBytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+
+def save(mode, path, results):
+    fnf = makeFNetF(rows, riskClasses)
+    before = residentBytes()
+    start = time.perf_counter()
+
+    if mode == 'xlsx, ExcelWriter':
+        saveWithExcelWriter(fnf, path)
+    else:
+        fnf.save(path, workers=1 if mode.endswith('1 worker') else None)
+
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    results.put((elapsed, before, peak))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        riskClasses = int(sys.argv[2])
+
+    tmpdir = tempfile.mkdtemp()
+    ctx = mp.get_context('spawn')
+    modes = {
+        'xlsx, ExcelWriter'     : 'Bench.xlsx',
+        'xlsx, streamed'        : 'Bench.xlsx',
+        'parquet, 1 worker'     : 'Bench.parquet',
+        'parquet'               : 'Bench.parquet',
+        'fnmap, 1 worker'       : 'Bench.fnmap',
+        'fnmap'                 : 'Bench.fnmap',
+    }
+    print(f"{riskClasses} risk classes x {rows:,} rows, {os.cpu_count()} CPUs")
+    print(f"{'Save':<20} {'time (s)':>9} {'rows/s':>10} {'RSS before (MB)':>16} {'peak RSS (MB)':>14}")
+
+    try:
+        for mode, file in modes.items():
+            path = os.path.join(tmpdir, file)
+            shutil.rmtree(path, ignore_errors=True)
+            results = ctx.Queue()
+            proc = ctx.Process(target=save, args=(mode, path, results))
+            proc.start()
+            elapsed, before, peak = results.get()
+            proc.join()
+            print(f"{mode:<20} {elapsed:>9.2f} {rows * riskClasses / elapsed:>10,.0f} {before / 2**20:>16,.0f} {peak / 2**20:>14,.0f}")
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,113 @@
+"""
+Compare the load and save throughput of FNetF files in Excel (.xlsx) and Parquet (.parquet) format
+for a synthetic set of MS_IRDelta sensitivities.
+
+    python BenchmarkFNetFStorage.py [rows ...]
+
+The default sizes are 10k, 1M and 10M rows.  An Excel sheet holds at most 1,048,576 rows, so the
+xlsx timings are only reported for the sizes that fit in a single sheet.  Parquet needs pyarrow.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+
+
+sizes = [10_000, 1_000_000, 10_000_000]
+excelMaxRows = 1_048_576 - 1        # less the header row
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25y', '0.5y', '1y', '2y', '3y', '5y', '10y', '15y', '20y', '30y']
+curves = ['OIS', 'LIBOR3M', 'LIBOR6M']
+
+
+def makeFNetF(rows):
+    rng = np.random.default_rng(1)
+    sensis = pd.DataFrame({
+        'Sensitivity ID'    : [f"MS_IRD_{i}" for i in range(rows)],
+        'RiskGroup'         : 'Bench',
+        'RiskSubGroup'      : np.array([f"Desk{i}" for i in range(20)])[rng.integers(0, 20, rows)],
+        'RiskClass'         : 'MS_IRDelta',
+        'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), rows)],
+        'CurveType'         : 'IR',
+        'Curve'             : np.array(curves)[rng.integers(0, len(curves), rows)],
+        'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), rows)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, rows),
+    })
+
+    fnf = FNetF.FNetF()
+    fnf.setParam('COB Date', '2024-04-01')
+    fnf.setParam('Regulator', 'BCBS')
+    fnf.setRiskClassData('MS_IRDelta', sensis)
+    fnf.setUnitTests('CapitalTests', pd.DataFrame({
+        'Test ID'           : ['Bench_1'],
+        'RiskClass'         : ['MS_IRDelta'],
+        'Description'       : ['ALL MS_IRDelta'],
+        'Sensitivity IDs'   : ['MS_IRD_0'],
+    }))
+    return fnf
+
+
+def timeFormat(fnf, path):
+    start = time.perf_counter()
+    fnf.save(path)
+    save = time.perf_counter() - start
+
+    start = time.perf_counter()
+    FNetF.FNetF().load(path)
+    load = time.perf_counter() - start
+
+    if os.path.isdir(path):
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    else:
+        size = os.path.getsize(path)
+
+    return save, load, size
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sizes = [int(x) for x in sys.argv[1:]]
+
+    tmpdir = tempfile.mkdtemp()
+    print(f"{'Rows':>10} {'Format':<8} {'save (s)':>9} {'load (s)':>9} {'save rows/s':>12} {'load rows/s':>12} {'MB':>8}")
+
+    try:
+        for rows in sizes:
+            fnf = makeFNetF(rows)
+
+            for fmt in ['xlsx', 'parquet']:
+                if fmt == 'xlsx' and rows > excelMaxRows:
+                    print(f"{rows:>10} {fmt:<8} {'n/a - too many rows for an Excel sheet':>52}")
+                    continue
+
+                save, load, size = timeFormat(fnf, os.path.join(tmpdir, f"Bench_{rows}.{fmt}"))
+                print(f"{rows:>10} {fmt:<8} {save:>9.2f} {load:>9.2f} {rows / save:>12,.0f} {rows / load:>12,.0f} {size / 2**20:>8.1f}")
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,145 @@
+"""
+Time pulling one RiskGroup on one COB date out of a partitioned FNetFStore holding many dates, against
+loading a small FNetF file holding just that RiskGroup and date, in Parquet and Excel format.
+
+    python BenchmarkFNetFStore.py [dates] [rows per RiskGroup]
+
+The default is a store of 250 dates, each with 10 RiskGroups of 5,000 MS_IRDelta and 5,000 MS_EQDelta
+sensitivities.  Parquet needs pyarrow.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FNetF
+import FNetFStore
+
+
+dates = 250
+rows = 5000
+riskGroups = [f"Desk{i}" for i in range(10)]
+repeats = 5
+ccys = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'SEK', 'CHF', 'ZAR', 'SGD']
+tenors = ['0.25', '0.5', '1', '2', '3', '5', '10', '15', '20', '30']
+
+
+def makeFNetF(cob, riskGroups, rows, seed):
+    rng = np.random.default_rng(seed)
+    n = rows * len(riskGroups)
+    common = {
+        'RiskGroup'         : np.repeat(riskGroups, rows),
+        'RiskSubGroup'      : np.array([f"Book{i}" for i in range(5)])[rng.integers(0, 5, n)],
+    }
+    ir = pd.DataFrame({
+        'Sensitivity ID'    : [f"IR_{i}" for i in range(n)],
+        **common,
+        'RiskClass'         : 'MS_IRDelta',
+        'Bucket'            : np.array(ccys)[rng.integers(0, len(ccys), n)],
+        'CurveType'         : 'IR',
+        'Curve'             : np.array(['OIS', 'LIBOR3M', 'LIBOR6M'])[rng.integers(0, 3, n)],
+        'Tenor'             : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        'Sensitivity'       : rng.normal(0.0, 1000.0, n),
+    })
+    eq = pd.DataFrame({
+        'Sensitivity ID'    : [f"EQ_{i}" for i in range(n)],
+        **common,
+        'RiskClass'         : 'MS_EQDelta',
+        'Bucket'            : rng.integers(1, 12, n).astype(str),
+        'SubBucket'         : '',
+        'EquityName'        : np.char.add('EQ', rng.integers(0, 500, n).astype(str)),
+        'SpotRepo'          : 'Spot',
+        'Sensitivity'       : rng.normal(0.0, 1000.0, n),
+    })
+
+    fnf = FNetF.FNetF()
+    fnf.setParam('COB Date', cob.isoformat())
+    fnf.setParam('Regulator', 'BCBS')
+    fnf.setParam('ReportingCcy', 'USD')
+    fnf.setRiskClassData('MS_IRDelta', ir)
+    fnf.setRiskClassData('MS_EQDelta', eq)
+    return fnf
+
+
+def best(f):
+    times = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def loadFile(path):
+    fnf = FNetF.FNetF()
+    fnf.load(path)
+
+    for riskClass in fnf.getRiskClasses():
+        fnf.getRiskClassData(riskClass)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        dates = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        rows = int(sys.argv[2])
+
+    tmpdir = tempfile.mkdtemp()
+
+    try:
+        store = FNetFStore.FNetFStore(os.path.join(tmpdir, 'Store'))
+        cobs = pd.bdate_range('2024-01-01', periods=dates).date
+        start = time.perf_counter()
+
+        for i, cob in enumerate(cobs):
+            store.save(makeFNetF(cob, riskGroups, rows, i))
+
+        print(f"Wrote {dates} dates x {len(riskGroups)} RiskGroups x 2 risk classes x {rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+        # the same RiskGroup and date as a file of its own
+        cob = cobs[dates // 2]
+        small = makeFNetF(cob, riskGroups[:1], rows, 0)
+        small.save(os.path.join(tmpdir, 'Small.parquet'))
+        small.save(os.path.join(tmpdir, 'Small.xlsx'))
+
+        print(f"{'Load one RiskGroup on one date':<44} {'time (s)':>9}")
+        timings = {
+            'store'                         : lambda : store.load(cob, cob, riskGroups=[riskGroups[0]]),
+            'store, one Bucket of each'     : lambda : store.load(cob, cob, riskGroups=[riskGroups[0]], buckets=['USD', '1']),
+            'small Parquet file'            : lambda : loadFile(os.path.join(tmpdir, 'Small.parquet')),
+            'small xlsx file'               : lambda : loadFile(os.path.join(tmpdir, 'Small.xlsx')),
+        }
+
+        for name, f in timings.items():
+            print(f"  {name:<42} {best(f):>9.3f}")
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,157 @@
+"""
+Time building the GIRR (MS_IR) delta and vega rho matrices of a bucket with MS_IR_SA_SBM_Calc.getRho, which
+builds them with numpy from masks of the factors' CurveTypes and Curves, against the loop over every pair of
+factors that it replaced, checking that the two give bit-identical matrices.
+
+    python BenchmarkIRRho.py [factors per bucket ...] [--loop-max N]
+
+The default is buckets of 100, 1,000 and 5,000 factors.  The loop grows with the square of the factors, so
+it is only run for buckets of up to 5,000 factors unless --loop-max is given.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import FRTBCalculator
+import FRTBUtils as FNU
+import SA_SBM_Calc           # registers the SBM calculators with FRTBCalculator
+
+
+sizes = [100, 1000, 5000]
+loopMax = 5000
+regulator = 'BCBS'
+
+
+def makeFactors(calc, riskType, n):
+    # n distinct factors of a currency bucket spread over IR curves, inflation and cross currency basis
+    rng = np.random.default_rng(n)
+    curveType = np.array(['IR'] * 8 + ['INFL', 'XCCY'])[rng.integers(0, 10, n)]
+    curve = np.array(['OIS', 'LIBOR1M', 'LIBOR3M', 'LIBOR6M', 'LIBOR12M'])[rng.integers(0, 5, n)]
+
+    if riskType == 'Delta':
+        tenors = list(calc.getFastLookup('DeltaTenors').keys())
+        return pd.DataFrame({
+            'CurveType'     : curveType,
+            'Curve'         : np.char.add(curve, rng.integers(0, max(1, n // 50), n).astype(str)),
+            'Tenor'         : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+    else:
+        tenors = list(calc.getFastLookup('VegaTenors').keys())
+        return pd.DataFrame({
+            'CurveType'                     : curveType,
+            'OptionMaturity'                : np.array(tenors)[rng.integers(0, len(tenors), n)],
+            'UnderlyingResidualMaturity'    : np.array(tenors)[rng.integers(0, len(tenors), n)],
+        })
+
+
+def loopRho(calc, riskClass, df):
+    # MS_IR_SA_SBM_Calc.getRho as it was, looping over every pair of factors
+    rho = np.zeros((df.shape[0], df.shape[0]))
+    factors = df[calc._rhoFactorFields[riskClass[5:]]]
+    params = calc._params
+    curveRho = params.DeltaCurveRho
+    inflRho = params.DeltaInflationRho
+    xCcyRho = params.DeltaXCcyBasisRho
+
+    if riskClass[5:] == 'Delta':
+        tenorRho = calc.getFastLookup('DeltaTenorRho')
+        tenorIdx = np.full(df.shape[0], -1)
+        hasTenor = (~factors['CurveType'].isin(['XCCY', 'INFL'])).to_numpy()
+        tenorIdx[hasTenor] = FNU.encodeLabels(calc.getFastLookup('DeltaTenors'), factors['Tenor'][hasTenor])
+    elif riskClass[5:] == 'Vega':
+        optionTenorRho = calc.getFastLookup('VegaOptionTenorRho')
+        underlyingTenorRho = calc.getFastLookup('VegaUnderlyingTenorRho')
+        vegaTenors = calc.getFastLookup('VegaTenors')
+        optionIdx = FNU.encodeLabels(vegaTenors, factors['OptionMaturity'])
+        underlyingIdx = np.full(df.shape[0], -1)
+        isIR = (factors['CurveType'] == 'IR').to_numpy()
+        underlyingIdx[isIR] = FNU.encodeLabels(vegaTenors, factors['UnderlyingResidualMaturity'][isIR])
+
+    for i, r in enumerate(factors.itertuples(index=False)):
+        for j, c in enumerate(factors.itertuples(index=False)):
+            if i <= j:
+                break
+
+            if riskClass[5:] == 'Delta':
+                if r[0] == 'XCCY' or c[0] == 'XCCY':
+                    corr = xCcyRho
+                elif r[0] == 'INFL' or c[0] == 'INFL':
+                    corr = 1.0 if r[0] == c[0] else inflRho
+                else:
+                    corr = tenorRho[tenorIdx[i], tenorIdx[j]]
+
+                if r[0] == c[0] and r[1] != c[1]:
+                    corr *= curveRho
+            elif riskClass[5:] == 'Vega':
+                if r[0] == 'IR' and c[0] == 'IR':
+                    corr = optionTenorRho[optionIdx[i], optionIdx[j]] * underlyingTenorRho[underlyingIdx[i], underlyingIdx[j]]
+                elif r[0] == c[0]:
+                    corr = optionTenorRho[optionIdx[i], optionIdx[j]]
+                elif r[0] == 'XCCY' or c[0] == 'XCCY':
+                    corr = xCcyRho
+                else:
+                    corr = inflRho * optionTenorRho[optionIdx[i], optionIdx[j]]
+
+                corr = min(corr, 1.0)
+
+            rho[i, j] = rho[j, i] = corr
+
+    return pd.DataFrame(rho, index=df.index, columns=df.index)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    if '--loop-max' in args:
+        i = args.index('--loop-max')
+        loopMax = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+
+    if args:
+        sizes = [int(x) for x in args]
+
+    calc = FRTBCalculator.FRTBCalculator.create('MS_IR', regulator, 'USD', dt.date(2024, 4, 1))
+    print(f"{'Risk class':<12} {'factors':>8} {'loop (s)':>10} {'numpy (s)':>10} {'ratio':>8}  identical")
+
+    for riskClass in ['MS_IRDelta', 'MS_IRVega']:
+        for n in sizes:
+            df = makeFactors(calc, riskClass[5:], n)
+            after, rho = timed(lambda : calc.getRho(riskClass, 'USD', df))
+
+            if n <= loopMax:
+                before, expected = timed(lambda : loopRho(calc, riskClass, df))
+                same = expected.to_numpy().tobytes() == rho.to_numpy().tobytes()
+                print(f"{riskClass:<12} {n:>8,} {before:>10.3f} {after:>10.3f} {before / after:>7.0f}x  {same}")
+            else:
+                print(f"{riskClass:<12} {n:>8,} {'-':>10} {after:>10.3f} {'-':>8}")
@@ -72,8 +72,7 @@ if __name__ == '__main__':
                 comboRCcapital = pd.DataFrame()
 
                 for riskClass, grp3 in grp2.groupby('RiskClass'):
-                    df = fnf.getRiskClassData(riskClass)
-                    df = df[df['Sensitivity ID'].isin(grp3['Sensitivity ID'])]
+                    df = fnf.getUnitTestSensis(testSet, combo, riskClass)
                     calc = frtb.FRTBCalculator.create(riskClass[:5], regulator, ccy, cob)
 
                     if testSet == 'CapitalTests':
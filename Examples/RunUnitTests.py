@@ -75,8 +75,7 @@ if __name__ == '__main__':
         comboRCcapital = pd.DataFrame()
 
         for riskClass, grp3 in grp2.groupby('RiskClass'):
-            df = fnf.getRiskClassData(riskClass)
-            df = df[df['Sensitivity ID'].isin(grp3['Sensitivity ID'])]
+            df = fnf.getUnitTestSensis('CapitalTests', combo, riskClass)
 
             if riskClass in calculators.keys():
                 calc = calculators[riskClass]
@@ -21,13 +21,34 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import numpy as np
 import pandas as pd
 import os
+import sys
+import shutil
+import tempfile
+import concurrent.futures
+import openpyxl
+import openpyxl.styles
+from openpyxl.cell import WriteOnlyCell
 
 import FRTBUtils as FNU
 
 FNetFormatVersion = '3.0'
 
+# FNetF files are either Excel workbooks with a tab for each risk class, the parameters and each set of
+# tests, or Parquet datasets: a directory holding a Parquet file for each of those tabs.  The format is
+# chosen by the extension of the path.  Parquet stores the FNetFieldType dtypes natively, so unlike Excel
+# there is no round trip through strings, and it needs pyarrow (pip install pyarrow).
+#
+FNetFExcelExtensions = ['.xlsx', '.xlsm', '.xls']
+FNetFParquetExtensions = ['.parquet']
+FNetFMappedExtensions = ['.fnmap']
+FNetFExcelChunkRows = 10000     # rows converted at a time when streaming a sheet out to Excel
+FNetFHierarchyFields = ['RiskGroup', 'RiskSubGroup', 'Bucket']   # the sort order of FNetF.setHierarchyIndex
+FNetFRequiredFields = ['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket']    # key fields that may not be blank, see FNetF.setValidation
+FNetFMissingValues = ['', 'nan', 'None']    # what the readers' fillna('') and astype(str) leave of a missing value
+
 FNetFieldType = {
     'MS_IRDelta' : {
         'RiskGroup'                     : 'str',
@@ -415,6 +436,66 @@ FNetFieldType = {
     },
 }
 
+# The config fast lookups that hold the known values of some of the FNetF key fields.  These, along with
+# the config's Bucket table for Bucket and SubBucket, seed the categories when the key fields are held as
+# categoricals (see FNetF.setCategorical).
+#
+FNetFieldVocabularies = {
+    'Bucket'                        : ['CurrencyGroupCodes'],
+    'Tenor'                         : ['DeltaTenors'],
+    'OptionMaturity'                : ['VegaTenors'],
+    'UnderlyingResidualMaturity'    : ['VegaTenors'],
+    'SpotRepo'                      : ['SpotRepoCodes'],
+}
+
+# The reference data the calculators look the FNetF fields up in, checked for each row when validation is
+# on (see FNetF.setValidation).  Each check is (fields, vocabulary, where, exempt): the values of the fields,
+# joined as FNU.joinLabels joins Bucket and SubBucket when there are two, must be keys of the vocabulary, a
+# config fast lookup in the risk class's sheet, or be in the vocabulary if it's a list.  If where is given,
+# a (field, values) pair, only the rows with one of those values in field are checked.  The check is skipped
+# for the regulators listed in exempt.  Null values of 'object' fields, e.g. unrated DRC tranches, are valid.
+#
+FNetFBucketCheck = (['Bucket', 'SubBucket'], 'BucketCodes', None, [])
+FNetFVegaTenorCheck = (['OptionMaturity'], 'VegaTenors', None, [])
+
+FNetFieldReferenceData = {
+    'MS_IRDelta'        : [(['CurveType'], ['IR', 'INFL', 'XCCY'], None, []),
+                           (['Tenor'], 'DeltaTenors', ('CurveType', ['IR']), [])],
+    'MS_IRVega'         : [(['CurveType'], ['IR', 'INFL', 'XCCY'], None, []),
+                           FNetFVegaTenorCheck,
+                           (['UnderlyingResidualMaturity'], 'VegaTenors', ('CurveType', ['IR']), [])],
+    'MS_CRDelta'        : [FNetFBucketCheck],
+    'MS_CRVega'         : [FNetFBucketCheck, FNetFVegaTenorCheck],
+    'MS_CRCurvature'    : [FNetFBucketCheck],
+    'MS_CCDelta'        : [FNetFBucketCheck],
+    'MS_CCVega'         : [FNetFBucketCheck, FNetFVegaTenorCheck],
+    'MS_CCCurvature'    : [FNetFBucketCheck],
+    'MS_CSDelta'        : [FNetFBucketCheck],
+    'MS_CSVega'         : [FNetFBucketCheck, FNetFVegaTenorCheck],
+    'MS_CSCurvature'    : [FNetFBucketCheck],
+    'MS_EQDelta'        : [FNetFBucketCheck, (['SpotRepo'], 'SpotRepoCodes', None, [])],
+    'MS_EQVega'         : [FNetFBucketCheck, FNetFVegaTenorCheck],
+    'MS_EQCurvature'    : [FNetFBucketCheck],
+    'MS_CMDelta'        : [FNetFBucketCheck],
+    'MS_CMVega'         : [FNetFBucketCheck, FNetFVegaTenorCheck],
+    'MS_CMCurvature'    : [FNetFBucketCheck],
+    'MS_FXVega'         : [FNetFVegaTenorCheck],
+    'MD_CR_DRC'         : [(['Seniority'], ['EQUITY', 'NON-SENIOR', 'SENIOR', 'COVERED'], None, []),
+                           (['Rating'], 'RatingCodes', None, [])],
+    'MD_CC_DRC'         : [(['Rating'], 'RatingCodes', None, [])],
+    'MD_CS_DRC'         : [(['Rating'], 'RatingCodes', None, [])],
+    'MR_RRAO'           : [(['Bucket'], 'BucketCodes', None, [])],
+    'CS_IRDelta'        : [(['CurveType'], ['IR', 'INFL'], None, [])],
+    'CS_IRVega'         : [(['CurveType'], ['IR', 'INFL'], None, [])],
+    'CS_CCDelta'        : [FNetFBucketCheck, (['IG_HYNR'], 'CreditQualityCodes', None, ['EU-EBA'])],
+    'CS_CRDelta'        : [FNetFBucketCheck],
+    'CS_CRVega'         : [FNetFBucketCheck],
+    'CS_EQDelta'        : [FNetFBucketCheck],
+    'CS_EQVega'         : [FNetFBucketCheck],
+    'CS_CMDelta'        : [FNetFBucketCheck],
+    'CS_CMVega'         : [FNetFBucketCheck],
+}
+
 
 class FNetF():
     def __init__(self):
@@ -422,23 +503,72 @@ class FNetF():
         self.FNF_Copyright_Tab = "Copyright"
         self.FNF_Test_Tabs = [ "ObligorTests", "FactorTests", "BucketTests", "CapitalTests" ]
         self._params = {'FNetFormatVersion' : FNetFormatVersion}
-        self._sensis = {}
+        self._sensis = {}       # riskClass -> DataFrame, or None for a sheet that hasn't been read yet
+        self._pending = {}      # riskClass -> the file to read its sheet from, for the sheets not read yet
         self._riskGroups = set()
         self._tests = {}
-
-    def load(self, filepath):
+        self._idIndex = {}      # riskClass -> pd.Index of its Sensitivity IDs, built when first needed
+        self._testRows = {}     # (testSet, testID) -> {riskClass -> positions of the test's rows}
+        self._categorical = False
+        self._vocabularyConfig = None
+        self._validate = False
+        self._validationConfig = None
+        self._rejects = {}      # riskClass -> the rows that failed validation, with the reasons why
+        self._touched = set()   # (RiskGroup, RiskClass, Bucket) partitions changed by the updates since clearTouchedPartitions
+        self._hierarchy = False
+        self._hierarchyIndex = {}   # riskClass -> {(RiskGroup[, RiskSubGroup[, Bucket]]) -> (start, stop) of its rows}
+
+    def getFormat(self, filepath):
+        ext = os.path.splitext(filepath)[1].lower()
+
+        if ext in FNetFExcelExtensions:
+            return 'xlsx'
+        elif ext in FNetFParquetExtensions:
+            return 'parquet'
+        elif ext in FNetFMappedExtensions:
+            return 'mapped'
+        else:
+            raise ValueError(f"Unknown FNetF file extension '{ext}' - expected one of {FNetFExcelExtensions + FNetFParquetExtensions + FNetFMappedExtensions}")
+
+
+    def load(self, filepath, riskClasses=None):
+        # The parameters and test tabs are read straight away but the sensitivities for each risk class
+        # are only read from the file when they are first needed, e.g. by getRiskClassData, so a job that
+        # uses a few risk classes from a large file only pays for those sheets.
+        #
+        # Returns the Sensitivity IDs of each unit test.  The Sensitivity IDs and "ALL" prefixes of the
+        # tests are matched against every risk class in the file, which means reading all of them, unless
+        # riskClasses lists the only risk classes wanted, in which case just the tests for those risk
+        # classes are collected, matching against just their sensitivities.
+        #
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File '{filepath}' not found")
             return None
 
-        if not os.path.isfile(filepath):
-            raise ValueError(f"'{filepath}' is not a file")
-            return None
+        if self.getFormat(filepath) in ['parquet', 'mapped']:
+            if not os.path.isdir(filepath):
+                raise ValueError(f"'{filepath}' is not a {self.getFormat(filepath).capitalize()} FNetF directory")
+                return None
+
+            loaded = self._loadParquet(filepath) if self.getFormat(filepath) == 'parquet' else self._loadMapped(filepath)
+        else:
+            if not os.path.isfile(filepath):
+                raise ValueError(f"'{filepath}' is not a file")
+                return None
+
+            if os.path.getsize(filepath) == 0:
+                raise ValueError(f"File '{filepath}' is empty")
+                return None
 
-        if os.path.getsize(filepath) == 0:
-            raise ValueError(f"File '{filepath}' is empty")
+            loaded = self._loadExcel(filepath)
+
+        if not loaded or not self._sensis:
             return None
+        else:
+            return self._collectTests(filepath, riskClasses)
 
+
+    def _loadExcel(self, filepath):
         with  pd.ExcelFile(filepath) as fnf:
             for sheet in fnf.sheet_names:
                 if sheet == self.FNF_Params_Tab:
@@ -447,7 +577,7 @@ class FNetF():
 
                     if self._params['FNetFormatVersion'] != FNetFormatVersion:
                         print(f"Incompatible FNetFormatVersion: code version = {FNetFormatVersion}, file version = {self._params['FNetFormatVersion']}")
-                        return None
+                        return False
                 elif sheet in self.FNF_Test_Tabs:
                     unitTests = pd.read_excel(fnf, sheet_name=sheet, dtype=str)
                     colNames = [x for x in unitTests.columns if x not in ['Test ID',
@@ -461,84 +591,286 @@ class FNetF():
                     unitTests = unitTests.rename(columns=dict(zip(colNames, newColNames))).astype(colTypeDict)
                     self._tests[sheet] = unitTests
                 elif sheet in FNetFieldType.keys():
-                    # default to string and then convert known fields to the correct type
-                    df = pd.read_excel(fnf, sheet_name=sheet, dtype=str)
-                    typemap = {}
-
-                    for col, dtype in FNetFieldType[sheet].items():
-                        # check the columns specified in the type map all exist before we convert
-                        if col not in df.columns:
-                            print(f"Column {col} not found in {sheet}")
-                        elif dtype == 'bool':
-                            df.loc[:, col] = df[col].apply(lambda x : False if x == 'False' else True)
-                            typemap[col] = dtype
-                        elif dtype != 'object':
-                            df.loc[:, col] = df[col].fillna(FNU._fillnaMap[dtype])
-                            typemap[col] = dtype
-
-                    df = df.astype(typemap)
-                    self._sensis[sheet] = df
-                    self._riskGroups |= set([(r.at['RiskGroup'], r.at['RiskSubGroup']) for _,r in df[['RiskGroup','RiskSubGroup']].drop_duplicates().iterrows()])
+                    self._addPendingRiskClass(sheet, filepath)
                 elif sheet != self.FNF_Copyright_Tab:
                     print(f"Unknown sheet '{sheet}' in file '{filepath}'")
 
+        return True
 
-        if not self._sensis :
-            return None
+
+    def _loadParquet(self, filepath):
+        # The tabs are stored with their in-memory dtypes, so the test benchmarks are already
+        # named Benchmark_* and the sensitivities need no conversion.
+        #
+        for file in sorted(os.listdir(filepath)):
+            sheet, ext = os.path.splitext(file)
+
+            if ext != '.parquet':
+                continue
+
+            if sheet in FNetFieldType.keys():
+                self._addPendingRiskClass(sheet, filepath)
+                continue
+
+            df = pd.read_parquet(os.path.join(filepath, file))
+
+            if sheet == self.FNF_Params_Tab:
+                self._params = dict(zip(df['Param'], df['Value']))
+
+                if self._params['FNetFormatVersion'] != FNetFormatVersion:
+                    print(f"Incompatible FNetFormatVersion: code version = {FNetFormatVersion}, file version = {self._params['FNetFormatVersion']}")
+                    return False
+            elif sheet in self.FNF_Test_Tabs:
+                self._tests[sheet] = df
+            else:
+                print(f"Unknown dataset '{sheet}' in '{filepath}'")
+
+        return True
+
+
+    def _loadMapped(self, filepath):
+        # A mapped FNetF is a directory with a subdirectory of .npy files for each tab, see _saveMapped
+        for tab in sorted(os.listdir(filepath)):
+            if not os.path.isfile(os.path.join(filepath, tab, 'columns.npy')):
+                continue
+
+            if tab == self.FNF_Params_Tab:
+                df = self._readMappedTab(os.path.join(filepath, tab))
+                self._params = dict(zip(df['Param'], df['Value']))
+
+                if self._params['FNetFormatVersion'] != FNetFormatVersion:
+                    print(f"Incompatible FNetFormatVersion: code version = {FNetFormatVersion}, file version = {self._params['FNetFormatVersion']}")
+                    return False
+            elif tab in self.FNF_Test_Tabs:
+                self._tests[tab] = self._readMappedTab(os.path.join(filepath, tab))
+            elif tab in FNetFieldType.keys():
+                self._addPendingRiskClass(tab, filepath)
+            else:
+                print(f"Unknown dataset '{tab}' in '{filepath}'")
+
+        return True
+
+
+    def _readMappedTab(self, path, categoricals=()):
+        # The numeric columns are memory-mapped read-only, so every process that loads the same file shares
+        # the page cache rather than having a copy of its own.  The string columns are dictionary-encoded, and
+        # those in categoricals are loaded as categoricals whose codes are mapped the same way, with just
+        # their labels read into memory.  The others are decoded to Python strings.
+        #
+        columns = np.load(os.path.join(path, 'columns.npy'), allow_pickle=False)
+        data = {}
+
+        for i, col in enumerate(columns):
+            stem = os.path.join(path, str(i))
+
+            if os.path.isfile(stem + '.codes.npy'):
+                codes = np.load(stem + '.codes.npy', mmap_mode='r', allow_pickle=False)
+                labels = np.load(stem + '.labels.npy', allow_pickle=False).astype(object)
+
+                if col in categoricals:
+                    data[col] = pd.Categorical.from_codes(codes, labels)
+                else:
+                    data[col] = np.append(labels, np.nan)[codes]
+            elif os.path.isfile(stem + '.objects.npy'):
+                # written by earlier versions for columns of other objects, which are pickled, and loading a
+                # pickle can run arbitrary code
+                raise ValueError(f"Column '{col}' of {path} is pickled and won't be loaded, save the FNetF again")
+            else:
+                data[col] = np.load(stem + '.npy', mmap_mode='r', allow_pickle=False)
+
+        # copy=False stops pandas consolidating the mapped columns into blocks of its own
+        return pd.DataFrame(data, columns=list(columns), copy=False)
+
+
+    def _coerceRiskClassData(self, riskClass, df, warn=True):
+        # convert the fields of data read as strings to their FNetFieldType types
+        typemap = {}
+
+        for col, dtype in FNetFieldType[riskClass].items():
+            # check the columns specified in the type map all exist before we convert
+            if col not in df.columns:
+                if warn:
+                    print(f"Column {col} not found in {riskClass}")
+            elif dtype == 'bool':
+                df.loc[:, col] = df[col].apply(lambda x : False if x == 'False' else True)
+                typemap[col] = dtype
+            elif dtype != 'object':
+                df.loc[:, col] = df[col].fillna(FNU._fillnaMap[dtype])
+                typemap[col] = dtype
+
+        return df.astype(typemap)
+
+
+    def _addPendingRiskClass(self, riskClass, filepath):
+        # register a sheet to be read by _readPending when its data is first needed
+        self._dropRowIndexes(riskClass)
+        self._sensis[riskClass] = None
+        self._pending[riskClass] = filepath
+
+
+    def _readPending(self, riskClasses=None):
+        # read the pending sheets of the given risk classes, or of all of them, opening each file just once
+        riskClasses = [x for x in (self._pending.keys() if riskClasses is None else riskClasses) if x in self._pending]
+
+        for filepath in dict.fromkeys(self._pending[x] for x in riskClasses):
+            sheets = [x for x in riskClasses if self._pending[x] == filepath]
+
+            for riskClass, df in self._readRiskClasses(filepath, sheets).items():
+                self._addRiskClassData(riskClass, df)
+
+
+    def _readRiskClasses(self, filepath, sheets):
+        data = {}
+
+        if self.getFormat(filepath) == 'mapped':
+            for sheet in sheets:
+                # the key fields stay dictionary-encoded if they're to be held as categoricals
+                data[sheet] = self._readMappedTab(os.path.join(filepath, sheet), self.getKeyFields(sheet) if self._categorical else ())
+        elif self.getFormat(filepath) == 'parquet':
+            # stored with their in-memory dtypes so need no conversion
+            for sheet in sheets:
+                data[sheet] = pd.read_parquet(os.path.join(filepath, sheet + '.parquet'))
+
+                for col in FNetFieldType[sheet].keys():
+                    if col not in data[sheet].columns:
+                        print(f"Column {col} not found in {sheet}")
         else:
-            self._filename = filepath
-            self.setParam('FileName', filepath)
-            sensis = pd.concat([x[['Sensitivity ID', 'RiskClass']] for x in self._sensis.values()], axis=0).set_index('Sensitivity ID', drop=False)
-
-            # Collect all the sensitivities for each combination
-            #
-            comboSensis = pd.DataFrame()
-
-            for testSet, testSetData in self._tests.items():
-                for combo, cRow in testSetData.set_index('Test ID').iterrows():
-                    # if combo in self._CombosToOmit:
-                    #     continue
-
-                    getAll = False
-                    newRows = []
-
-                    for s in cRow['Sensitivity IDs'].replace(', ', ',').split(','):
-                        if s.startswith('ALL '):
-                            getAll = True    # we treat all the remaining Sensitivity IDs as prefixes and match against them
-                            sensiSubList = sensis[[ss.startswith(s[4:]) # and (
-                                                #     s[4:] == ss                 # exact match
-                                                #     or
-                                                #     ss[len(s)-4:].isdigit()     # all the characters after the matching prefix are digits
-                                                #                                 # so "ALL MS_EQV_a" doesn't match "MS_EQV_aa1"
-                                                # ) 
-                                                for ss in sensis['Sensitivity ID']]
-                                            ]['Sensitivity ID'].unique()
-                        elif getAll:
-                            # same as the above case but we don't have to look past the "ALL " prefix
-                            sensiSubList = sensis[[ss.startswith(s) # and (
-                                                #     s == ss                     # exact match
-                                                #     or
-                                                #     ss[len(s):].isdigit()       # all the characters after the matching prefix are digits
-                                                #                                 # so "ALL MS_EQV_a" doesn't match "MS_EQV_aa1"
-                                                # )
-                                                for ss in sensis['Sensitivity ID']]
-                                            ]['Sensitivity ID'].unique()
-                        else:
-                            if s in sensis.index:
-                                sensiSubList = [s]
-                            else:
-                                print(f"Missing Sensitivity ID: {s} in Test {combo}")
-                                continue
-
-                        for ss in sensiSubList:
-                            newRows.append([testSet, combo, sensis.at[ss, 'RiskClass'], ss])
-
-                    comboSensis = pd.concat([comboSensis, pd.DataFrame(newRows, columns=['Test Set', 'Test ID', 'RiskClass', 'Sensitivity ID'])], axis=0)
-
-            if not comboSensis.empty:
-                comboSensis.set_index(['Test Set', 'Test ID'], inplace=True)
-    
-            return comboSensis
+            with pd.ExcelFile(filepath) as fnf:
+                for sheet in sheets:
+                    # default to string and then convert known fields to the correct type
+                    df = pd.read_excel(fnf, sheet_name=sheet, dtype=str)
+                    data[sheet] = self._coerceRiskClassData(sheet, df)
+
+        return data
+
+
+    def _addRiskClassData(self, riskClass, df):
+        self._rejects.pop(riskClass, None)
+        df = self._sortHierarchy(self._quarantine(riskClass, self._setKeyDtypes(riskClass, df)))
+        self._pending.pop(riskClass, None)
+        self._dropRowIndexes(riskClass)
+        self._sensis[riskClass] = df
+        self._riskGroups |= set(df[['RiskGroup', 'RiskSubGroup']].drop_duplicates().itertuples(index=False, name=None))
+
+
+    def _dropRowIndexes(self, riskClass):
+        # forget the row positions into data for the risk class that's being replaced
+        if self._sensis.get(riskClass) is not None:
+            self._idIndex.pop(riskClass, None)
+            self._hierarchyIndex.pop(riskClass, None)
+            self._testRows = {k : v for k, v in self._testRows.items() if riskClass not in v}
+
+
+    def _getIdIndex(self, riskClass):
+        if riskClass not in self._idIndex:
+            self._idIndex[riskClass] = pd.Index(self.getRiskClassData(riskClass)['Sensitivity ID'].to_numpy(dtype=object))
+
+        return self._idIndex[riskClass]
+
+
+    def _collectTests(self, filepath, riskClasses=None):
+        self._filename = filepath
+        self.setParam('FileName', filepath)
+
+        if not self._tests:
+            return pd.DataFrame()
+
+        riskClasses = [x for x in (self._sensis.keys() if riskClasses is None else riskClasses) if x in self._sensis]
+        self._readPending(riskClasses)
+        sensis = pd.concat([self._sensis[x][['Sensitivity ID', 'RiskClass']] for x in riskClasses] or [pd.DataFrame(columns=['Sensitivity ID', 'RiskClass'])],
+                           axis=0)
+        ids = sensis['Sensitivity ID'].to_numpy(dtype=object)
+        sensiRiskClasses = sensis['RiskClass'].to_numpy(dtype=object)
+
+        # Index the Sensitivity IDs for the lookups: the row of the first occurrence of each ID, and the IDs
+        # in sorted order, in which those starting with a given prefix are a contiguous range.
+        #
+        firstRow = dict(zip(ids[::-1], range(len(ids) - 1, -1, -1)))
+        order = np.argsort(np.asarray(ids, dtype=str), kind='stable')
+        sortedIds = ids[order]
+
+        def prefixRows(prefix):
+            # the rows of the distinct Sensitivity IDs that start with prefix, in the order they're in the file
+            lo = np.searchsorted(sortedIds, prefix, side='left')
+
+            if prefix == '':
+                hi = len(sortedIds)
+            elif ord(prefix[-1]) < sys.maxunicode:
+                hi = np.searchsorted(sortedIds, prefix[:-1] + chr(ord(prefix[-1]) + 1), side='left')
+            else:
+                hi = np.searchsorted(sortedIds, prefix + chr(sys.maxunicode), side='right')
+
+            rows = np.sort(order[lo:hi])
+            return [firstRow[x] for x in pd.unique(ids[rows])] if len(rows) > len(set(ids[rows])) else rows
+
+        # Collect all the sensitivities for each combination as the rows of their Sensitivity IDs, and
+        # make a single frame of them at the end
+        #
+        testSets = []
+        testIDs = []
+        testRows = []
+        testCounts = []
+        self._testRows = {}
+
+        for testSet, testSetData in self._tests.items():
+            if len(riskClasses) < len(self._sensis):
+                testSetData = testSetData[testSetData['RiskClass'].isin(riskClasses)]
+
+            for combo, sensiIDs in zip(testSetData['Test ID'], testSetData['Sensitivity IDs']):
+                # if combo in self._CombosToOmit:
+                #     continue
+
+                rows = []
+                exact, prefixes = self._splitTestIds(sensiIDs)
+
+                for s in exact:
+                    if s in firstRow:
+                        rows.append(firstRow[s])
+                    else:
+                        print(f"Missing Sensitivity ID: {s} in Test {combo}")
+
+                for s in prefixes:
+                    rows.extend(prefixRows(s))
+
+                testSets.extend([testSet] * len(rows))
+                testIDs.extend([combo] * len(rows))
+                testRows.extend(rows)
+                testCounts.append(len(rows))
+
+        testRows = np.asarray(testRows, dtype='int64')
+        comboSensis = pd.DataFrame({
+            'Test Set'          : pd.Series(testSets, dtype=object),
+            'Test ID'           : pd.Series(testIDs, dtype=object),
+            'RiskClass'         : sensiRiskClasses[testRows],
+            'Sensitivity ID'    : ids[testRows],
+        })
+
+        # Keep the rows of each test's sensitivities, as positions in the data for each risk class, for
+        # getUnitTestSensis.  Where a risk class has duplicated Sensitivity IDs every row with a test's
+        # IDs is included, as isin would.
+        #
+        offsets = np.cumsum([0] + [self._sensis[x].shape[0] for x in riskClasses])
+        rcNo = np.searchsorted(offsets, testRows, side='right') - 1
+        testNo = np.repeat(np.arange(len(testCounts)), testCounts)
+        order = np.lexsort((testRows, rcNo, testNo))
+        starts = np.flatnonzero(np.diff(testNo[order] * len(riskClasses) + rcNo[order], prepend=-1))
+
+        for start, end in zip(starts, np.append(starts[1:], len(order))):
+            rows = order[start:end]
+            riskClass = riskClasses[rcNo[rows[0]]]
+            index = self._getIdIndex(riskClass)
+
+            if index.is_unique:
+                positions = np.unique(testRows[rows] - offsets[rcNo[rows[0]]])
+            else:
+                positions = np.unique(index.get_indexer_for(ids[testRows[rows]]))
+
+            self._testRows.setdefault((testSets[rows[0]], testIDs[rows[0]]), {})[riskClass] = positions
+
+        if not comboSensis.empty:
+            comboSensis.set_index(['Test Set', 'Test ID'], inplace=True)
+
+        return comboSensis
 
 
     def getParams(self):
@@ -561,14 +893,19 @@ class FNetF():
             return self._params[param]
 
 
-    def getRiskClasses(self):
-        if self._sensis:
-            return list(self._sensis.keys())
-        else:
-            return []
+    def getRiskClasses(self, withData=False):
+        # The risk classes in the file, including those whose sheets haven't been read yet.  With withData
+        # they're all read so that just the risk classes that have some sensitivities can be returned.
+        #
+        if withData:
+            self._readPending()
+            return [riskClass for riskClass, df in self._sensis.items() if not df.empty]
+
+        return list(self._sensis.keys())
 
 
     def getRiskGroups(self):
+        self._readPending()
         return list(self._riskGroups)
 
 
@@ -585,6 +922,7 @@ class FNetF():
             raise ValueError(f"RiskClass '{riskClass}' not found")
             return None
         else:
+            self._readPending([riskClass])
             return self._sensis[riskClass]
 
 
@@ -624,22 +962,77 @@ class FNetF():
         return self._tests[testSet][self._tests[testSet]['Test ID'] == testID]
 
 
-    def getUnitTestSensis(self, testSet, testID):
-        if not self._tests:
-            raise ValueError("No test data loaded")
-            return None
+    def _splitTestIds(self, sensiIDs):
+        # The Sensitivity IDs of a test as (IDs, prefixes).  From the first that starts "ALL " on they're all
+        # prefixes, matching every Sensitivity ID that starts with them, and the "ALL " is dropped.
+        #
+        exact = []
+        prefixes = []
 
-        if not testSet in self._tests.keys():
-            raise ValueError(f"TestSet '{testSet}' not found")
-            return None
-        
-        if not testID in self._tests[testSet]['Test ID'].values:
-            raise ValueError(f"TestID '{testID}' not found in TestSet '{testSet}'")
-            return None
+        for s in sensiIDs.replace(', ', ',').split(','):
+            if s.startswith('ALL '):
+                prefixes.append(s[4:])
+            elif prefixes:
+                prefixes.append(s)
+            else:
+                exact.append(s)
 
-        riskClass = self._tests[testSet][self._tests[testSet]['Test ID'] == testID]['RiskClass'].iat[0]
-        sensis = self._tests[testSet][self._tests[testSet]['Test ID'] == testID]['Sensitivity IDs'].iat[0].replace(', ', ',').split(',')
-        return self._sensis[riskClass][self._sensis[riskClass]['Sensitivity ID'].isin(sensis)]
+        return exact, prefixes
+
+
+    def getUnitTestSensis(self, testSet, testID, riskClass=None):
+        # the test's sensitivities for riskClass, by default the test's RiskClass
+        rows = self.getUnitTestRows(testSet, testID)
+
+        if riskClass is None:
+            riskClass = self._tests[testSet][self._tests[testSet]['Test ID'] == testID]['RiskClass'].iat[0]
+
+        return self.getRiskClassData(riskClass).iloc[rows.get(riskClass, [])]
+
+
+    def getUnitTestRows(self, testSet, testID):
+        # The rows of the test's sensitivities as a dictionary of riskClass -> positions in the risk class data.
+        # load works these out for all the tests at once, with their "ALL" prefixes expanded.  The rows of
+        # tests added since with setUnitTests, or whose risk class data has since been changed, are looked
+        # up from their Sensitivity IDs and prefixes, in every risk class.
+        #
+        if (testSet, testID) not in self._testRows:
+            exact, prefixes = self._splitTestIds(self.getUnitTest(testSet, testID)['Sensitivity IDs'].iat[0])
+            testRows = {}
+
+            for riskClass in self.getRiskClasses():
+                rows = self.getSubset(exact, riskClass, positions=True)
+
+                if prefixes:
+                    matched = pd.Series(self._getIdIndex(riskClass), dtype=object).str.startswith(tuple(prefixes))
+                    rows = np.union1d(rows, np.flatnonzero(matched.fillna(False).to_numpy(dtype=bool)))
+
+                if len(rows):
+                    testRows[riskClass] = rows
+
+            self._testRows[(testSet, testID)] = testRows
+
+        return self._testRows[(testSet, testID)]
+
+
+    def getSubset(self, ids, riskClass=None, positions=False):
+        # The sensitivities with any of the given Sensitivity IDs, in the order they're in the risk class data,
+        # i.e. df[df['Sensitivity ID'].isin(ids)], but looked up in an index of the IDs that's built once for
+        # each risk class rather than by scanning the whole column each time.
+        #
+        # With positions=True the positions of the rows in the risk class data are returned instead, for use
+        # with iloc or to index the column arrays directly.  Without a riskClass every risk class is searched
+        # and a dictionary of riskClass -> subset is returned for the risk classes with any of the IDs.
+        #
+        if riskClass is None:
+            subsets = {rc : self.getSubset(ids, rc, positions) for rc in self.getRiskClasses()}
+            return {rc : x for rc, x in subsets.items() if len(x) > 0}
+
+        index = self._getIdIndex(riskClass)
+        ids = pd.unique(np.asarray(ids, dtype=object))
+        rows = index.get_indexer(ids) if index.is_unique else index.get_indexer_for(ids)
+        rows = np.unique(rows[rows >= 0])
+        return rows if positions else self.getRiskClassData(riskClass).iloc[rows]
 
 
     def addRiskClassFields(seld, rc, fields):
@@ -650,26 +1043,197 @@ class FNetF():
                 FNetFieldType[rc][k] = v
 
 
-    def save(self, filename):
-        # create the ExcelWriter object
-        writer = pd.ExcelWriter(filename)
-        params = pd.DataFrame(self._params, index=['Params'])
+    def save(self, filename, workers=None):
+        # The tabs of Parquet and mapped FNetFs are separate files and are written concurrently by up to
+        # workers threads, by default one per CPU.  An Excel workbook is a single file so its sheets are
+        # written one after the other.
+        #
+        self._readPending()     # before a Parquet save can clear the files they're read from
+
+        if self.getFormat(filename) == 'parquet':
+            self._saveParquet(filename, workers)
+        elif self.getFormat(filename) == 'mapped':
+            self._saveMapped(filename, workers)
+        else:
+            self._saveExcel(filename)
+
+
+    def _runConcurrently(self, jobs, workers):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            for future in [executor.submit(job) for job in jobs]:
+                future.result()     # raises any exception from the job
+
+
+    def _saveExcel(self, filename):
+        # Written with a write-only openpyxl workbook, which streams the rows of each sheet out to a
+        # temporary file as they're added rather than building every cell of the workbook in memory.
+        # The rows are converted FNetFExcelChunkRows at a time, so memory stays bounded however big the
+        # sheets.  The cells are as pd.DataFrame.to_excel writes them, with the same header style.
+        #
+        wb = openpyxl.Workbook(write_only=True)
         # TODO maybe: create the inverse of FRTBUtils.extractKeyedData to write the data back to the Excel file
-        params.T['Params'].to_excel(writer, sheet_name=self.FNF_Params_Tab, index=True, header=False)
+        params = pd.DataFrame({'Param' : list(self._params.keys()), 'Value' : list(self._params.values())})
+        self._writeExcelSheet(wb, self.FNF_Params_Tab, params, header=False, index=True)
 
         for testType in self.FNF_Test_Tabs:
             if testType in self._tests and not self._tests[testType].empty:
                 keycols = ['Test ID', 'RiskClass', 'Description', 'Sensitivity IDs']
                 valcols = [x for x in self._tests[testType].columns if x not in keycols]
                 cols = keycols + valcols
-                self._tests[testType][cols].to_excel(writer, sheet_name=testType, index=False)
+                self._writeExcelSheet(wb, testType, self._tests[testType][cols])
 
         for riskClass, df in self._sensis.items():
             if not df.empty:
                 cols = [x for x in ['Sensitivity ID'] + list(FNetFieldType[riskClass].keys()) if x in df.columns]
-                df[cols].to_excel(writer, sheet_name=riskClass, index=False)
+                self._writeExcelSheet(wb, riskClass, df[cols])
+
+        wb.save(filename)
+
+
+    def _writeExcelSheet(self, wb, sheet, df, header=True, index=False):
+        # index=True styles the first column as pandas styles an index
+        ws = wb.create_sheet(sheet)
+        font = openpyxl.styles.Font(bold=True)
+        side = openpyxl.styles.Side(style='thin')
+        border = openpyxl.styles.Border(left=side, right=side, top=side, bottom=side)
+        alignment = openpyxl.styles.Alignment(horizontal='center', vertical='top')
+
+        def styled(value):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = font
+            cell.border = border
+            cell.alignment = alignment
+            return cell
+
+        if header:
+            ws.append([styled(col) for col in df.columns])
+
+        for start in range(0, df.shape[0], FNetFExcelChunkRows):
+            chunk = df.iloc[start:start + FNetFExcelChunkRows]
+            columns = [self._excelValues(chunk[col]) for col in chunk.columns]
+
+            if index:
+                columns[0] = [styled(x) for x in columns[0]]
+
+            for row in zip(*columns):
+                ws.append(row)
+
+
+    def _excelValues(self, values):
+        # a column as Python objects for openpyxl, with NaN as an empty cell and infinities as pandas writes them
+        cells = values.to_numpy(dtype=object)
+        cells[pd.isna(cells)] = None
+
+        if values.dtype.kind == 'f':
+            cells[np.isposinf(values.to_numpy())] = 'inf'
+            cells[np.isneginf(values.to_numpy())] = '-inf'
+
+        return cells
 
-        writer.close()
+
+    def _saveParquet(self, dirname, workers=None):
+        # One Parquet file per tab, written with the in-memory dtypes.
+        #
+        params = pd.DataFrame({'Param' : list(self._params.keys()), 'Value' : [str(x) for x in self._params.values()]})
+        writers = {self.FNF_Params_Tab + '.parquet' : lambda path : params.to_parquet(path, index=False)}
+
+        for testType in self.FNF_Test_Tabs:
+            if testType in self._tests and not self._tests[testType].empty:
+                writers[testType + '.parquet'] = lambda path, testType=testType : self._tests[testType].to_parquet(path, index=False)
+
+        for riskClass, df in self._sensis.items():
+            if not df.empty:
+                cols = [x for x in ['Sensitivity ID'] + list(FNetFieldType[riskClass].keys()) if x in df.columns]
+                writers[riskClass + '.parquet'] = lambda path, df=df, cols=cols : df[cols].to_parquet(path, index=False)
+
+        self._saveTabs(dirname, writers, workers, lambda path : os.path.isfile(path) and os.path.splitext(path)[1] == '.parquet')
+
+
+    def _saveMapped(self, dirname, workers=None):
+        # A subdirectory for each tab holding columns.npy, the column names, and for the i'th column either
+        #   i.npy                           numeric and bool columns, which load memory-mapped
+        #   i.codes.npy and i.labels.npy    string columns, as integer codes into the sorted labels, -1 for NaN
+        # Nothing is pickled, as loading a pickle can run arbitrary code, so any other column can't be saved.
+        # Data mapped from the tabs of an earlier save stays valid when they're replaced, as their files are
+        # only unlinked.
+        #
+        params = pd.DataFrame({'Param' : list(self._params.keys()), 'Value' : [str(x) for x in self._params.values()]})
+        writers = {self.FNF_Params_Tab : lambda path : self._writeMappedTab(path, params)}
+
+        for testType in self.FNF_Test_Tabs:
+            if testType in self._tests and not self._tests[testType].empty:
+                writers[testType] = lambda path, testType=testType : self._writeMappedTab(path, self._tests[testType])
+
+        for riskClass, df in self._sensis.items():
+            if not df.empty:
+                cols = [x for x in ['Sensitivity ID'] + list(FNetFieldType[riskClass].keys()) if x in df.columns]
+                writers[riskClass] = lambda path, df=df, cols=cols : self._writeMappedTab(path, df[cols])
+
+        self._saveTabs(dirname, writers, workers, lambda path : os.path.isfile(os.path.join(path, 'columns.npy')))
+
+
+    def _saveTabs(self, dirname, writers, workers, isTab):
+        # Write the tabs of a Parquet or mapped FNetF, writers maps the name of each tab's file or directory to
+        # a function writing it to a path, concurrently into a temporary sibling of dirname.  Only once every
+        # one has been written are they moved into dirname, replacing those of an earlier save, whose stale
+        # tabs, those isTab finds there that aren't in this save, are removed so they aren't picked up by
+        # load.  So a save that fails leaves the earlier one as it was.
+        #
+        dirname = os.path.abspath(dirname)
+        os.makedirs(os.path.dirname(dirname), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.' + os.path.basename(dirname) + '.', dir=os.path.dirname(dirname))
+
+        try:
+            self._runConcurrently([lambda name=name, write=write : write(os.path.join(tmp, name)) for name, write in writers.items()], workers)
+            os.makedirs(dirname, exist_ok=True)
+
+            for name in os.listdir(dirname):
+                path = os.path.join(dirname, name)
+
+                if isTab(path) and name not in writers:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+
+            for name in writers.keys():
+                path = os.path.join(dirname, name)
+
+                if os.path.isdir(path):
+                    shutil.rmtree(path)     # a directory can't be replaced by os.replace unless it's empty
+
+                os.replace(os.path.join(tmp, name), path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+    def _writeMappedTab(self, path, df):
+        os.makedirs(path)
+        np.save(os.path.join(path, 'columns.npy'), np.array(df.columns, dtype=str))
+
+        for i, col in enumerate(df.columns):
+            stem = os.path.join(path, str(i))
+            values = df[col]
+            isCategorical = isinstance(values.dtype, pd.CategoricalDtype)
+
+            if isCategorical and values.cat.categories.is_monotonic_increasing and pd.api.types.is_string_dtype(values.cat.categories):
+                cat = values.array      # keep all the categories, so a load in the same vocabulary needn't recode
+            elif (values.dtype == object or isCategorical) and values.dropna().map(type).eq(str).all():
+                cat = pd.Categorical(values.to_numpy(dtype=object))
+            else:
+                cat = None
+
+            if cat is not None:
+                np.save(stem + '.codes.npy', cat.codes)
+                np.save(stem + '.labels.npy', np.array(list(cat.categories), dtype=str))
+            else:
+                array = values.to_numpy()
+
+                if array.dtype == object or isCategorical:
+                    # anything else would have to be pickled, and loading a pickle can run arbitrary code
+                    raise ValueError(f"Column '{col}' of {os.path.basename(path)} has values that aren't strings or numbers and can't be saved to a mapped FNetF")
+
+                np.save(stem + '.npy', array, allow_pickle=False)
 
 
     def setParam(self, param, value):
@@ -686,7 +1250,456 @@ class FNetF():
             if k in sensis.columns:
                 sensisTypeMap[k] = v
 
-        self._sensis[riskClass] = sensis.astype(sensisTypeMap)
+        self._pending.pop(riskClass, None)
+        self._dropRowIndexes(riskClass)
+        self._rejects.pop(riskClass, None)
+        self._sensis[riskClass] = self._sortHierarchy(self._quarantine(riskClass, self._setKeyDtypes(riskClass, sensis.astype(sensisTypeMap))))
+
+
+    # Intraday updates to the sensitivities of a risk class, keyed by Sensitivity ID, rather than replacing the
+    # lot with setRiskClassData.  The (RiskGroup, RiskClass, Bucket) partitions that each update touches, both
+    # those of the rows it removes and of those it adds, are collected so that just their capital need be
+    # recalculated, see getTouchedPartitions.
+    #
+    def appendRiskClassData(self, riskClass, sensis):
+        # add new sensitivities, e.g. for new trades, none of whose Sensitivity IDs may be held already
+        self._applyDelta(riskClass, sensis, None, append=True)
+
+
+    def upsertRiskClassData(self, riskClass, sensis):
+        # add new sensitivities and replace those already held with the same Sensitivity IDs
+        self._applyDelta(riskClass, sensis, None)
+
+
+    def deleteRiskClassData(self, riskClass, ids):
+        # remove the sensitivities with the given Sensitivity IDs, e.g. for cancelled trades, returning how many were removed
+        return self._applyDelta(riskClass, None, ids)
+
+
+    def getTouchedPartitions(self):
+        return sorted(self._touched, key=lambda x : tuple(str(y) for y in x))
+
+
+    def clearTouchedPartitions(self):
+        self._touched = set()
+
+
+    def _partitionsOf(self, riskClass, df):
+        keys = df[[x for x in ['RiskGroup', 'Bucket'] if x in df.columns]].drop_duplicates()
+        buckets = keys['Bucket'] if 'Bucket' in keys.columns else [None] * len(keys)
+        return set((riskGroup, riskClass, bucket) for riskGroup, bucket in zip(keys['RiskGroup'], buckets))
+
+
+    def _applyDelta(self, riskClass, sensis, ids, append=False):
+        if not riskClass in FNetFieldType.keys():
+            raise ValueError(f"Unknown RiskClass '{riskClass}'")
+
+        if sensis is not None:
+            if sensis['Sensitivity ID'].duplicated().any():
+                raise ValueError(f"Duplicate Sensitivity IDs in the update to {riskClass}: {sensis.loc[sensis['Sensitivity ID'].duplicated(), 'Sensitivity ID'].unique()[:5].tolist()}")
+
+            # only the rows that pass validation replace those held, a rejected amendment leaves its row as it was
+            sensis = sensis.astype({k : v for k, v in FNetFieldType[riskClass].items() if k in sensis.columns})
+            sensis = self._quarantine(riskClass, self._setKeyDtypes(riskClass, sensis))
+            ids = sensis['Sensitivity ID']
+
+        current = self.getRiskClassData(riskClass) if riskClass in self._sensis else None
+        removed = np.zeros(0 if current is None else current.shape[0], dtype=bool)
+
+        if current is not None and len(ids):
+            removed = self._getIdIndex(riskClass).isin(pd.Index(np.asarray(ids, dtype=object)))
+
+        if append and removed.any():
+            raise ValueError(f"Sensitivity IDs already in {riskClass}: {current.loc[removed, 'Sensitivity ID'].unique()[:5].tolist()}")
+
+        if (sensis is None or sensis.empty) and not removed.any():
+            return 0
+
+        parts = [] if current is None else [current[~removed]]
+        touched = set() if current is None else self._partitionsOf(riskClass, current[removed])
+
+        if sensis is not None:
+            parts.append(sensis)
+            touched |= self._partitionsOf(riskClass, sensis)
+            self._riskGroups |= set(zip(sensis['RiskGroup'], sensis['RiskSubGroup']))
+
+        self._pending.pop(riskClass, None)
+        self._dropRowIndexes(riskClass)
+        self._sensis[riskClass] = self._sortHierarchy(self._setKeyDtypes(riskClass, pd.concat([x for x in parts if not x.empty] or parts[:1], axis=0, ignore_index=True)))
+        self._touched |= touched
+        return int(removed.sum())
+
+
+    def setHierarchyIndex(self, indexed=True):
+        # Keep the rows of each risk class sorted by RiskGroup, RiskSubGroup and Bucket, in their original order
+        # within each, so that the rows of a RiskGroup, a RiskSubGroup of it or a Bucket of that are a contiguous
+        # range.  getHierarchyData then slices out the rows of such a node rather than filtering the whole risk
+        # class for them, and getBucketRanges gives the calculators the ranges of the buckets of a RiskSubGroup
+        # so that they needn't group its rows by Bucket again.  This applies to the data already loaded and to
+        # any loaded later.
+        #
+        self._hierarchy = indexed
+        self._hierarchyIndex = {}
+
+        if not indexed:
+            return
+
+        for riskClass, df in self._sensis.items():
+            order = None if df is None else self._hierarchyOrder(df)    # the pending sheets are sorted as they're read
+
+            if order is not None:
+                # the unit tests' rows move with the sensitivities
+                moved = np.empty(len(order), dtype='int64')
+                moved[order] = np.arange(len(order))
+                self._testRows = {k : {rc : np.sort(moved[x]) if rc == riskClass else x for rc, x in v.items()} for k, v in self._testRows.items()}
+                self._idIndex.pop(riskClass, None)
+                self._sensis[riskClass] = df.take(order).reset_index(drop=True)
+
+
+    def _hierarchyOrder(self, df):
+        # the stable order that sorts the rows by the hierarchy, or None if they're sorted already
+        keys = [x for x in FNetFHierarchyFields if x in df.columns]
+
+        if df.shape[0] < 2 or not keys:
+            return None
+
+        order = np.lexsort([pd.factorize(df[x], sort=True)[0] for x in reversed(keys)])
+        return None if (order[1:] > order[:-1]).all() else order
+
+
+    def _sortHierarchy(self, df):
+        order = self._hierarchyOrder(df) if self._hierarchy else None
+        return df if order is None else df.take(order).reset_index(drop=True)
+
+
+    def _getHierarchyIndex(self, riskClass):
+        # Returns the (start, stop) of the rows of each node, keyed by (RiskGroup,), (RiskGroup, RiskSubGroup)
+        # and (RiskGroup, RiskSubGroup, Bucket), and for each (RiskGroup, RiskSubGroup) the (Bucket, start, stop)
+        # of its buckets relative to its own start.  Built from the changes of key along the sorted rows.
+        #
+        if not self._hierarchy:
+            raise ValueError("No hierarchy index, see setHierarchyIndex")
+
+        if riskClass not in self._hierarchyIndex:
+            df = self.getRiskClassData(riskClass)
+            keys = [x for x in FNetFHierarchyFields if x in df.columns]
+            codes = np.vstack([pd.factorize(df[x])[0] for x in keys]) if keys else np.zeros((0, df.shape[0]))
+            nodes = {}
+            buckets = {}
+
+            for depth in range(1, len(keys) + 1) if df.shape[0] else []:
+                starts = np.flatnonzero(np.r_[True, (codes[:depth, 1:] != codes[:depth, :-1]).any(axis=0)])
+                stops = np.r_[starts[1:], df.shape[0]]
+                labels = list(zip(*[df[x].to_numpy()[starts] for x in keys[:depth]]))
+                nodes.update(zip(labels, zip(starts.tolist(), stops.tolist())))
+
+                if depth == 3:
+                    for label, start, stop in zip(labels, starts.tolist(), stops.tolist()):
+                        if not pd.isna(label[2]):   # as groupby drops NaN buckets
+                            offset = nodes[label[:2]][0]
+                            buckets.setdefault(label[:2], []).append((label[2], start - offset, stop - offset))
+
+            self._hierarchyIndex[riskClass] = (nodes, buckets)
+
+        return self._hierarchyIndex[riskClass]
+
+
+    def getHierarchy(self, riskClass):
+        # the RiskGroup, RiskSubGroup and Bucket nodes of the risk class, with the Start and Stop of their rows
+        nodes = self._getHierarchyIndex(riskClass)[0]
+        keys = [x for x in FNetFHierarchyFields if x in self.getRiskClassData(riskClass).columns]
+        return pd.DataFrame([k + v for k, v in nodes.items() if len(k) == len(keys)], columns=keys + ['Start', 'Stop'])
+
+
+    def getHierarchyData(self, riskClass, riskGroup, riskSubGroup=None, bucket=None):
+        # the rows of a RiskGroup, of one of its RiskSubGroups or of a Bucket of that, sliced from the risk class data
+        if bucket is not None and riskSubGroup is None:
+            raise ValueError("A bucket needs its riskSubGroup")
+
+        node = tuple(x for x in [riskGroup, riskSubGroup, bucket] if x is not None)
+        start, stop = self._getHierarchyIndex(riskClass)[0].get(node, (0, 0))
+        return self.getRiskClassData(riskClass).iloc[start:stop]
+
+
+    def getBucketRanges(self, riskClass, riskGroup, riskSubGroup):
+        # The (Bucket, start, stop) of the rows of each bucket of getHierarchyData(riskClass, riskGroup, riskSubGroup),
+        # in the order groupby('Bucket') would give them, to pass to a calculator's calcRiskClassCapital.
+        #
+        return self._getHierarchyIndex(riskClass)[1].get((riskGroup, riskSubGroup), [])
+
+
+    def setCategorical(self, categorical=True, config=None):
+        # Hold the key fields of the sensitivities, the FNetFieldType 'str' fields such as RiskClass, Bucket
+        # and Tenor, as pandas categoricals instead of Python strings.  This applies to the data already
+        # loaded and to any loaded later.  Categoricals take much less memory, and the calculators' groupbys
+        # and config lookups work on their integer codes.
+        #
+        # The categories are seeded from the config's buckets and tenors where it has them, so the codes
+        # don't depend on which values happen to be in the data.  They're kept sorted so that groupbys
+        # come out in the same order as they do for strings.
+        #
+        self._categorical = categorical
+        self._vocabularyConfig = config
+
+        for riskClass, df in self._sensis.items():
+            if df is not None:      # the pending sheets are converted as they're read
+                self._sensis[riskClass] = self._setKeyDtypes(riskClass, df)
+
+
+    def getKeyFields(self, riskClass):
+        return [col for col, dtype in FNetFieldType[riskClass].items() if dtype == 'str']
+
+
+    def _getVocabulary(self, riskClass, field):
+        # the known values of a key field from the config, if any
+        config = self._vocabularyConfig
+        sheet = riskClass[:5]
+
+        if field == 'RiskClass':
+            return list(FNetFieldType.keys())
+
+        if config is None or sheet not in config.getConfigList():
+            return []
+
+        vocab = []
+        buckets = config.getConfig(sheet).get('Bucket')
+
+        if isinstance(buckets, pd.DataFrame) and field in buckets.columns:
+            vocab.extend(buckets[field])
+        elif isinstance(buckets, pd.Series) and field == 'Bucket':
+            vocab.extend(buckets)
+
+        for item in FNetFieldVocabularies.get(field, []):
+            try:
+                vocab.extend(config.getFastLookup(sheet, item).keys())
+            except ValueError:
+                pass    # not every risk class has every lookup
+
+        return [x for x in vocab if isinstance(x, str)]
+
+
+    def _setKeyDtypes(self, riskClass, df):
+        keyFields = [x for x in self.getKeyFields(riskClass) if x in df.columns]
+
+        if self._categorical:
+            typemap = {col : pd.CategoricalDtype(sorted(set(self._getVocabulary(riskClass, col)).union(df[col].dropna().unique())))
+                       for col in keyFields}
+            typemap = {col : dtype for col, dtype in typemap.items() if df[col].dtype != dtype}
+        else:
+            typemap = {col : 'str' for col in keyFields if isinstance(df[col].dtype, pd.CategoricalDtype)}
+
+        if not typemap:
+            return df
+
+        # convert a column at a time, leaving the others as they are, e.g. memory-mapped
+        df = df.copy(deep=False)
+
+        for col, dtype in typemap.items():
+            df[col] = df[col].astype(dtype)
+
+        return df
+
+
+    def setValidation(self, validate=True, config=None):
+        # Check each row of the sensitivities as it's loaded or set, rather than leaving bad data to be found as
+        # a KeyError deep in a calculator part way through a run.  The rows must fit the FNetFieldType schema:
+        # no missing RiskGroup, RiskSubGroup, RiskClass or Bucket, finite numbers and the right RiskClass.  With the config of a regulator they
+        # must also fit its reference data, the buckets, tenors, ratings etc. of FNetFieldReferenceData.  The
+        # rows that don't are set aside, with the reasons why, in a reject report (see getRejects) so that the
+        # rest can still be run.  This applies to the data already loaded and to any loaded later.
+        #
+        self._validate = validate
+        self._validationConfig = config
+
+        for riskClass, df in self._sensis.items():
+            if df is not None:      # the pending sheets are validated as they're read
+                kept = self._quarantine(riskClass, df)
+
+                if kept is not df:
+                    self._dropRowIndexes(riskClass)
+                    self._sensis[riskClass] = kept
+
+
+    def _quarantine(self, riskClass, df):
+        # Returns df without the rows that fail validation, which are added to the rejects for the risk class.
+        # Every check is a vectorized membership test of a whole column, so each column is read just once.
+        #
+        if not self._validate or df.empty:
+            return df
+
+        fieldTypes = FNetFieldType[riskClass]
+        failures = []       # (failing rows, field, values, reason)
+
+        for col, dtype in fieldTypes.items():
+            if col not in df.columns:
+                continue
+            elif dtype == 'str':
+                # by now a missing value may have been read as '' or converted to the string 'nan' or 'None'
+                missing = df[col].isna().to_numpy()
+
+                if col in FNetFRequiredFields:
+                    missing |= df[col].isin(FNetFMissingValues).to_numpy()
+
+                failures.append((missing, col, df[col], 'is missing'))
+            elif dtype == 'float64':
+                failures.append((~np.isfinite(df[col].to_numpy(dtype='float64')), col, df[col], 'is not a finite number'))
+
+        if 'RiskClass' in df.columns:
+            failures.append(((df['RiskClass'] != riskClass).to_numpy() & df['RiskClass'].notna().to_numpy(),
+                             'RiskClass', df['RiskClass'], f"is not {riskClass}"))
+
+        config = self._validationConfig
+        sheet = riskClass[:5]
+
+        if config is not None and sheet in config.getConfigList():
+            for fields, vocabulary, where, exempt in FNetFieldReferenceData.get(riskClass, []):
+                if config.getRegulator() in exempt or not all(x in df.columns for x in fields + ([where[0]] if where else [])):
+                    continue
+
+                if isinstance(vocabulary, str):
+                    try:
+                        codes = config.getFastLookup(sheet, vocabulary)
+                    except ValueError:
+                        continue    # not every regulator has every lookup
+                else:
+                    codes = dict(zip(vocabulary, range(len(vocabulary))))
+
+                values = df[fields[0]] if len(fields) == 1 else FNU.joinLabels(df[fields[0]], df[fields[1]])
+                failed = FNU.encodeLabels(codes, values, strict=False) < 0
+
+                if where:
+                    failed &= df[where[0]].isin(where[1]).to_numpy()
+
+                if fieldTypes[fields[0]] == 'object':
+                    failed &= values.notna().to_numpy()
+
+                failures.append((failed, '/'.join(fields), values, f"is not in {vocabulary}"))
+
+        failed = np.zeros(df.shape[0], dtype=bool)
+
+        for rows, _, _, _ in failures:
+            failed |= rows
+
+        if not failed.any():
+            return df
+
+        # describe every failure of each rejected row
+        reasons = []
+
+        for rows, field, values, reason in failures:
+            rows = np.flatnonzero(rows)
+
+            if len(rows):
+                reasons.append(pd.Series(field + " '" + values.iloc[rows].astype(str).to_numpy(dtype=object) + "' " + reason, index=rows))
+
+        reasons = pd.concat(reasons).groupby(level=0).agg('; '.join)
+        rejects = df[failed].copy()
+        rejects['Reject Reason'] = reasons.to_numpy()
+        self._rejects[riskClass] = pd.concat([x for x in [self._rejects.get(riskClass), rejects] if x is not None], axis=0)
+        print(f"{riskClass}: {failed.sum()} of {len(failed)} rows failed validation and were set aside, see getRejects('{riskClass}')")
+        return df[~failed]
+
+
+    def getRejects(self, riskClass=None):
+        # The rows that failed validation for a risk class, with a 'Reject Reason' column, or for all of them
+        # a report of the Sensitivity ID, RiskGroup, RiskSubGroup, RiskClass and reasons for each reject.
+        #
+        if riskClass is not None:
+            if riskClass in self._pending:
+                self._readPending([riskClass])
+
+            return self._rejects.get(riskClass, pd.DataFrame(columns=['Sensitivity ID', 'Reject Reason']))
+
+        self._readPending()
+        cols = ['Sensitivity ID', 'RiskGroup', 'RiskSubGroup', 'RiskClass', 'Reject Reason']
+        return pd.concat([df[[x for x in cols if x in df.columns]].astype(object) for df in self._rejects.values()] or [pd.DataFrame(columns=cols)],
+                         axis=0, ignore_index=True)
+
+
+    def loadCSV(self, filepath, chunkSize=250000, maxMemory=None, **kwargs):
+        # Stream a CSV extract of sensitivities for any number of risk classes into the risk class data.
+        # The file is read chunkSize rows at a time and each chunk's rows are routed by their RiskClass,
+        # coerced to the FNetFieldType schema and appended to columnar buffers for the risk class.  The
+        # buffers are only concatenated, a column at a time, once the whole file has been read, and within a
+        # chunk repeated strings such as Buckets share a single string object, so peak memory stays close to
+        # the size of the data loaded rather than several times it.
+        #
+        # maxMemory is a ceiling in bytes on the size of the buffers, a MemoryError is raised if the data
+        # won't fit.  Any other keyword arguments are passed on to pd.read_csv, e.g. sep or encoding.
+        #
+        # As with setRiskClassData the data for each risk class in the file replaces any already loaded, and
+        # rows that fail validation are set aside to be read with getRejects.
+        # Returns a dictionary of the number of rows loaded for each risk class, not counting the rejects.
+        #
+        if not os.path.isfile(filepath):
+            raise FileNotFoundError(f"File '{filepath}' not found")
+
+        header = pd.read_csv(filepath, nrows=0, **kwargs).columns
+
+        if 'RiskClass' not in header:
+            raise ValueError(f"No RiskClass column in '{filepath}'")
+
+        # parse the fields that are float64 in every risk class directly, everything else as strings
+        fieldTypes = {}
+
+        for fields in FNetFieldType.values():
+            for col, dtype in fields.items():
+                fieldTypes.setdefault(col, set()).add(dtype)
+
+        dtypes = {col : 'float64' if fieldTypes.get(col) == {'float64'} else str for col in header}
+        columns = {}
+        buffers = {}
+        bufferSize = 0
+        skipped = {}
+
+        with pd.read_csv(filepath, dtype=dtypes, chunksize=chunkSize, **kwargs) as reader:
+            for chunk in reader:
+                for riskClass, rows in chunk.groupby('RiskClass', sort=False, dropna=False):
+                    if riskClass not in FNetFieldType.keys():
+                        skipped[riskClass] = skipped.get(riskClass, 0) + rows.shape[0]
+                        continue
+
+                    if riskClass not in buffers:
+                        for col in FNetFieldType[riskClass].keys():
+                            if col not in header:
+                                print(f"Column {col} not found in {riskClass}")
+
+                        columns[riskClass] = [x for x in ['Sensitivity ID'] + list(FNetFieldType[riskClass].keys()) if x in header]
+                        buffers[riskClass] = {col : [] for col in columns[riskClass]}
+
+                    rows = self._coerceRiskClassData(riskClass, rows[columns[riskClass]].copy(), warn=False)
+
+                    for col, buffer in buffers[riskClass].items():
+                        values = rows[col].to_numpy()
+
+                        if values.dtype == object and col != 'Sensitivity ID':      # the IDs are unique anyway
+                            codes, uniques = pd.factorize(values, use_na_sentinel=False)
+                            values = uniques[codes]
+                            bufferSize += sum(map(sys.getsizeof, uniques))
+
+                        buffer.append(values)
+                        bufferSize += values.nbytes
+
+                    if maxMemory is not None and bufferSize > maxMemory:
+                        raise MemoryError(f"Loading '{filepath}' needs more than the maxMemory of {maxMemory} bytes")
+
+        for riskClass, count in skipped.items():
+            print(f"Skipped {count} rows with unknown RiskClass '{riskClass}' in '{filepath}'")
+
+        loaded = {}
+
+        for riskClass, buffer in buffers.items():
+            # Concatenate a column at a time, popping its chunks so they can be freed straight away, and
+            # add the columns one by one so that pandas doesn't copy them all to consolidate its blocks.
+            df = pd.DataFrame(index=pd.RangeIndex(sum(x.shape[0] for x in buffer['RiskClass'])))
+
+            for col in columns[riskClass]:
+                df[col] = np.concatenate(buffer.pop(col))
+
+            self._addRiskClassData(riskClass, df)
+            loaded[riskClass] = self._sensis[riskClass].shape[0]
+
+        return loaded
 
 
     def setUnitTests(self, testType, tests):
@@ -694,6 +1707,7 @@ class FNetF():
             raise ValueError(f"Unknown testType '{testType}'")
         else:
             self._tests[testType] = tests
+            self._testRows = {k : v for k, v in self._testRows.items() if k[0] != testType}
 
 
 if __name__ == '__main__':
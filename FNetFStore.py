@@ -0,0 +1,453 @@
+"""
+A store of FNetF sensitivities for many COB dates, kept as Parquet files partitioned by COB date,
+RiskGroup and risk class so that a load only reads the partitions that match its filters.
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import shutil
+import threading
+import urllib.parse
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+import FNetF
+
+# The layout of the store, with a directory for each COB date and within it one for each RiskGroup:
+#
+#   <root>/COBDate=2024-04-01/Parameters.parquet
+#   <root>/COBDate=2024-04-01/RiskGroup=Rates%20Desk/MS_IRDelta.parquet
+#   <root>/COBDate=2024-04-01/RiskGroup=Rates%20Desk/MS_IRVega.parquet
+#
+# The FNetF Parameters, e.g. ReportingCcy and Regulator, are kept once per COB date.  RiskGroups are
+# %-encoded in the directory names.  Within each file the rows are sorted by RiskSubGroup and Bucket so
+# that filters on those can skip whole row groups.
+#
+FNetFStoreDatePrefix = 'COBDate='
+FNetFStoreGroupPrefix = 'RiskGroup='
+FNetFStoreRowGroupSize = 100000
+
+# Intraday updates to a date are kept as delta segments alongside its RiskGroups until they're compacted:
+#
+#   <root>/COBDate=2024-04-01/Delta=01712000000000000000/MS_IRDelta.parquet           added or amended rows
+#   <root>/COBDate=2024-04-01/Delta=01712000000000000000/MS_IRDelta.deletes.parquet   deleted Sensitivity IDs
+#   <root>/COBDate=2024-04-01/Delta=01712000000000000000/Touched.parquet              partitions it touched
+#
+# A segment is named by the time it was written, in ns, so the names sort in the order they were written.
+# load applies the segments of a date to its RiskGroup files in that order, and compact folds them in.
+#
+FNetFStoreDeltaPrefix = 'Delta='
+
+
+class FNetFStore():
+    def __init__(self, root):
+        self._root = root
+        self._lock = threading.RLock()      # between the writes of this process, e.g. an FNetFStoreCompactor
+
+
+    def _dateDir(self, cob):
+        return os.path.join(self._root, FNetFStoreDatePrefix + cob.isoformat())
+
+
+    def _groupDir(self, cob, riskGroup):
+        return os.path.join(self._dateDir(cob), FNetFStoreGroupPrefix + urllib.parse.quote(str(riskGroup), safe=''))
+
+
+    def _partitions(self, path, prefix):
+        # the values of the partitions in path named prefix<value>
+        if not os.path.isdir(path):
+            return []
+
+        return sorted(urllib.parse.unquote(x[len(prefix):]) for x in os.listdir(path) if x.startswith(prefix))
+
+
+    def _asDate(self, cob):
+        if isinstance(cob, dt.datetime):
+            return cob.date()
+        elif isinstance(cob, dt.date):
+            return cob
+        elif isinstance(cob, str):
+            return dt.date.fromisoformat(cob)
+        else:
+            raise ValueError(f"'{cob}' : Invalid date type: {type(cob)}")
+
+
+    def getCOBDates(self, fromDate=None, toDate=None):
+        dates = [dt.date.fromisoformat(x) for x in self._partitions(self._root, FNetFStoreDatePrefix)]
+        fromDate = dt.date.min if fromDate is None else self._asDate(fromDate)
+        toDate = dt.date.max if toDate is None else self._asDate(toDate)
+        return [x for x in dates if fromDate <= x <= toDate]
+
+
+    def getRiskGroups(self, cob):
+        return self._partitions(self._dateDir(self._asDate(cob)), FNetFStoreGroupPrefix)
+
+
+    def getRiskClasses(self, cob, riskGroup):
+        path = self._groupDir(self._asDate(cob), riskGroup)
+
+        if not os.path.isdir(path):
+            return []
+
+        return sorted(os.path.splitext(x)[0] for x in os.listdir(path) if x.endswith('.parquet'))
+
+
+    def getParams(self, cob):
+        # the partition metadata for the COB date, read without touching any of its sensitivities
+        path = os.path.join(self._dateDir(self._asDate(cob)), 'Parameters.parquet')
+
+        if not os.path.isfile(path):
+            raise ValueError(f"COB date '{cob}' not found in store '{self._root}'")
+
+        df = pd.read_parquet(path)
+        return dict(zip(df['Param'], df['Value']))
+
+
+    def save(self, fnf):
+        # Add the sensitivities of an FNetF to the store under its 'COB Date' param.  The data for each of
+        # its RiskGroups replaces any already in the store for that date, other RiskGroups are left as they
+        # are.  The FNetF's params replace those of the date.  Any deltas for the date are compacted first
+        # so that they aren't applied on top of the new data.
+        #
+        cob = self._asDate(fnf.getParam('COB Date'))
+        data = {riskClass : fnf.getRiskClassData(riskClass) for riskClass in fnf.getRiskClasses()}
+        data = {riskClass : df for riskClass, df in data.items() if not df.empty}
+        riskGroups = sorted(set().union(*[df['RiskGroup'].astype(str).unique() for df in data.values()]))
+
+        with self._lock:
+            self.compact(cob)
+            os.makedirs(self._dateDir(cob), exist_ok=True)
+            built = {riskGroup : self._hiddenDir(cob, riskGroup, '.new') for riskGroup in riskGroups}
+
+            try:
+                # each RiskGroup is built in full alongside the one it replaces, so a failed save leaves the
+                # store as it was
+                for path in built.values():
+                    shutil.rmtree(path, ignore_errors=True)     # left by a save that didn't finish
+                    os.makedirs(path)
+
+                for riskClass, df in data.items():
+                    for riskGroup, grp in df.groupby(df['RiskGroup'].astype(str), sort=False):
+                        self._writePartition(riskClass, grp, os.path.join(built[riskGroup], riskClass + '.parquet'))
+
+                for riskGroup, path in built.items():
+                    old = self._hiddenDir(cob, riskGroup, '.old')
+                    shutil.rmtree(old, ignore_errors=True)
+
+                    if os.path.isdir(self._groupDir(cob, riskGroup)):
+                        # moved aside first, as a directory can't be renamed onto one that isn't empty
+                        os.rename(self._groupDir(cob, riskGroup), old)
+
+                    os.rename(path, self._groupDir(cob, riskGroup))
+                    shutil.rmtree(old, ignore_errors=True)
+            finally:
+                for path in built.values():
+                    shutil.rmtree(path, ignore_errors=True)
+
+            params = fnf.getParams()
+            params = pd.DataFrame({'Param' : list(params.keys()), 'Value' : [str(x) for x in params.values()]})
+            path = os.path.join(self._dateDir(cob), 'Parameters.parquet')
+            params.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+
+
+    def _hiddenDir(self, cob, riskGroup, suffix):
+        # a RiskGroup directory that's being built or replaced, hidden from the partitions of the date
+        return os.path.join(self._dateDir(cob), '.' + os.path.basename(self._groupDir(cob, riskGroup)) + suffix)
+
+
+    def _writePartition(self, riskClass, df, path):
+        # written to a temporary file that then replaces the partition, so a load never sees half a file
+        cols = [x for x in ['Sensitivity ID'] + list(FNetF.FNetFieldType[riskClass].keys()) if x in df.columns]
+        sortCols = [x for x in ['RiskSubGroup', 'Bucket'] if x in cols]
+        df = df[cols].sort_values(sortCols, kind='stable') if sortCols else df[cols]
+        df.to_parquet(path + '.tmp', index=False, row_group_size=FNetFStoreRowGroupSize)
+        os.replace(path + '.tmp', path)
+
+
+    def load(self, fromDate=None, toDate=None, riskGroups=None, riskSubGroups=None, riskClasses=None, buckets=None):
+        # Load the sensitivities that match the filters, each of which is ignored if None.  The dates,
+        # RiskGroups and risk classes pick the partitions that are read, the RiskSubGroups and Buckets are
+        # passed on to the Parquet reader so that only the matching row groups and rows are read.  The
+        # delta segments of each date that haven't been compacted yet are applied on top.
+        #
+        # Returns a dictionary of COB date -> FNetF, each with the params of its date, for the dates with
+        # any matching sensitivities.
+        #
+        rowFilters = []
+
+        if riskSubGroups is not None:
+            rowFilters.append(('RiskSubGroup', 'in', list(riskSubGroups)))
+
+        if buckets is not None:
+            rowFilters.append(('Bucket', 'in', [str(x) for x in buckets]))
+
+        loaded = {}
+
+        for cob in self.getCOBDates(fromDate, toDate):
+            with self._lock:    # so that a compaction doesn't remove the deltas part way through
+                data = {}
+
+                for riskGroup in self.getRiskGroups(cob):
+                    if riskGroups is not None and riskGroup not in riskGroups:
+                        continue
+
+                    for riskClass in self.getRiskClasses(cob, riskGroup):
+                        if riskClasses is not None and riskClass not in riskClasses:
+                            continue
+
+                        path = os.path.join(self._groupDir(cob, riskGroup), riskClass + '.parquet')
+                        filters = [x for x in rowFilters if x[0] in FNetF.FNetFieldType[riskClass]]
+                        df = pd.read_parquet(path, filters=filters or None)
+
+                        if not df.empty:
+                            data.setdefault(riskClass, []).append(df)
+
+                deltas = [self._readDelta(cob, x) for x in self.getDeltas(cob)]
+                deltas = [{k : v for k, v in x.items() if riskClasses is None or k in riskClasses} for x in deltas]
+
+                if data or any(deltas):
+                    fnf = FNetF.FNetF()
+
+                    for param, value in self.getParams(cob).items():
+                        fnf.setParam(param, value)
+
+                    for riskClass in FNetF.FNetFieldType.keys():
+                        if riskClass in data:
+                            fnf.setRiskClassData(riskClass, pd.concat(data[riskClass], axis=0, ignore_index=True))
+
+                    for changes in deltas:
+                        for riskClass, (upserts, deleted) in changes.items():
+                            # an amended row goes if it no longer matches the filters and is replaced if it does,
+                            # by upsertRiskClassData so that an amendment that fails validation leaves it as it was
+                            if upserts is None:
+                                fnf.deleteRiskClassData(riskClass, deleted)
+                            else:
+                                keep = np.ones(upserts.shape[0], dtype=bool)
+
+                                for col, values in [('RiskGroup', riskGroups), ('RiskSubGroup', riskSubGroups), ('Bucket', buckets)]:
+                                    if values is not None and col in upserts.columns:
+                                        keep &= upserts[col].astype(str).isin([str(x) for x in values]).to_numpy()
+
+                                fnf.deleteRiskClassData(riskClass, pd.concat([deleted, upserts.loc[~keep, 'Sensitivity ID']]))
+
+                                if keep.any():
+                                    fnf.upsertRiskClassData(riskClass, upserts[keep])
+
+                    fnf.clearTouchedPartitions()
+
+                    if any(not fnf.getRiskClassData(x).empty for x in fnf.getRiskClasses()):
+                        loaded[cob] = fnf
+
+        return loaded
+
+
+    def getDeltas(self, cob):
+        # the delta segments of the date that haven't been compacted, oldest first
+        return self._partitions(self._dateDir(self._asDate(cob)), FNetFStoreDeltaPrefix)
+
+
+    def _readDelta(self, cob, delta):
+        # returns riskClass -> (the rows added or amended or None, the Sensitivity IDs deleted)
+        path = os.path.join(self._dateDir(cob), FNetFStoreDeltaPrefix + delta)
+        changes = {}
+
+        for file in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(file)
+
+            if ext != '.parquet' or name == 'Touched':
+                continue
+            elif name.endswith('.deletes'):
+                changes.setdefault(name[:-len('.deletes')], [None, pd.Series([], dtype=object)])[1] = pd.read_parquet(os.path.join(path, file))['Sensitivity ID']
+            else:
+                changes.setdefault(name, [None, pd.Series([], dtype=object)])[0] = pd.read_parquet(os.path.join(path, file))
+
+        return {k : tuple(v) for k, v in changes.items()}
+
+
+    def saveDelta(self, cob, riskClass, upserts=None, deletes=None):
+        # Record an intraday update to the sensitivities of a risk class on a date as a delta segment: the rows
+        # of upserts are added, replacing any with the same Sensitivity IDs, and the Sensitivity IDs in deletes
+        # are removed.  Returns the name of the segment and the (RiskGroup, RiskClass, Bucket) partitions it
+        # touched, those the changed rows were in as well as those they're now in.
+        #
+        cob = self._asDate(cob)
+
+        if not riskClass in FNetF.FNetFieldType.keys():
+            raise ValueError(f"Unknown RiskClass '{riskClass}'")
+
+        fieldTypes = FNetF.FNetFieldType[riskClass]
+        deletes = pd.Series([] if deletes is None else list(deletes), dtype=object, name='Sensitivity ID')
+
+        if upserts is not None:
+            upserts = upserts[[x for x in ['Sensitivity ID'] + list(fieldTypes.keys()) if x in upserts.columns]]
+            upserts = upserts.astype({k : v for k, v in fieldTypes.items() if k in upserts.columns})
+
+            if upserts['Sensitivity ID'].duplicated().any():
+                raise ValueError(f"Duplicate Sensitivity IDs in the update to {riskClass}")
+
+        changed = deletes if upserts is None else pd.concat([deletes, upserts['Sensitivity ID']])
+
+        with self._lock:
+            # the partitions the changed IDs are in now, as well as those they're moving to
+            located = self._locate(cob, riskClass, changed)
+            touched = [located] if upserts is None else [located, upserts]
+            touched = pd.concat([x[[c for c in ['RiskGroup', 'Bucket'] if c in x.columns]].astype(object) for x in touched], axis=0)
+            touched = touched.drop_duplicates().reindex(columns=['RiskGroup', 'RiskClass', 'Bucket'])
+            touched['RiskClass'] = riskClass
+
+            delta = f"{time.time_ns():020d}"
+            path = os.path.join(self._dateDir(cob), FNetFStoreDeltaPrefix + delta)
+            tmp = os.path.join(self._dateDir(cob), '.' + FNetFStoreDeltaPrefix + delta)
+            os.makedirs(tmp)
+
+            if upserts is not None:
+                upserts.to_parquet(os.path.join(tmp, riskClass + '.parquet'), index=False)
+
+            if len(deletes):
+                deletes.to_frame().to_parquet(os.path.join(tmp, riskClass + '.deletes.parquet'), index=False)
+
+            touched.to_parquet(os.path.join(tmp, 'Touched.parquet'), index=False)
+            os.rename(tmp, path)        # the whole segment appears at once
+
+        return delta, sorted(touched.itertuples(index=False, name=None), key=lambda x : tuple(str(y) for y in x))
+
+
+    def _locate(self, cob, riskClass, ids):
+        # the RiskGroup and Bucket of those of ids in the store for the date, allowing for its deltas
+        cols = [x for x in ['Sensitivity ID', 'RiskGroup', 'Bucket'] if x == 'Sensitivity ID' or x in FNetF.FNetFieldType[riskClass]]
+        ids = [str(x) for x in ids]
+        located = [pd.DataFrame(columns=cols)]
+
+        if not ids:
+            return located[0]
+
+        for riskGroup in self.getRiskGroups(cob):
+            path = os.path.join(self._groupDir(cob, riskGroup), riskClass + '.parquet')
+
+            if os.path.isfile(path):
+                located.append(pd.read_parquet(path, columns=cols, filters=[('Sensitivity ID', 'in', ids)]))
+
+        located = pd.concat([x for x in located if not x.empty] or located[:1], axis=0, ignore_index=True)
+
+        for delta in self.getDeltas(cob):
+            upserts, deleted = self._readDelta(cob, delta).get(riskClass, (None, None))
+
+            if deleted is not None:
+                located = located[~located['Sensitivity ID'].isin(deleted if upserts is None else pd.concat([deleted, upserts['Sensitivity ID']]))]
+
+            if upserts is not None:
+                located = pd.concat([located, upserts.loc[upserts['Sensitivity ID'].isin(ids), cols]], axis=0, ignore_index=True)
+
+        return located
+
+
+    def getTouchedPartitions(self, cob, since=None):
+        # the (RiskGroup, RiskClass, Bucket) partitions touched by the delta segments written after since
+        cob = self._asDate(cob)
+        touched = set()
+
+        for delta in self.getDeltas(cob):
+            if since is None or delta > since:
+                df = pd.read_parquet(os.path.join(self._dateDir(cob), FNetFStoreDeltaPrefix + delta, 'Touched.parquet'))
+                touched |= set(df.itertuples(index=False, name=None))
+
+        return sorted(touched, key=lambda x : tuple(str(y) for y in x))
+
+
+    def compact(self, cob=None):
+        # Fold the delta segments of a date, or of every date, into its RiskGroup files and remove them.  Just
+        # the risk classes of the RiskGroups the segments touched are rewritten.  Each file is replaced whole
+        # and the segments are only removed once they're all written, and as applying a segment again changes
+        # nothing, a load at any point sees the same data.
+        #
+        with self._lock:
+            for cob in (self.getCOBDates() if cob is None else [self._asDate(cob)]):
+                deltas = self.getDeltas(cob)
+
+                if not deltas:
+                    continue
+
+                touched = sorted(set((str(x[0]), x[1]) for x in self.getTouchedPartitions(cob)))
+                riskGroups = sorted(set(x[0] for x in touched))
+                riskClasses = sorted(set(x[1] for x in touched))
+                fnf = self.load(cob, cob, riskGroups=riskGroups, riskClasses=riskClasses).get(cob)
+
+                for riskGroup, riskClass in touched:
+                    path = os.path.join(self._groupDir(cob, riskGroup), riskClass + '.parquet')
+                    df = fnf.getRiskClassData(riskClass) if fnf is not None and riskClass in fnf.getRiskClasses() else None
+                    df = None if df is None else df[(df['RiskGroup'].astype(str) == riskGroup).to_numpy()]
+
+                    if df is None or df.empty:
+                        if os.path.isfile(path):
+                            os.remove(path)
+                    else:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        self._writePartition(riskClass, df, path)
+
+                for delta in deltas:
+                    shutil.rmtree(os.path.join(self._dateDir(cob), FNetFStoreDeltaPrefix + delta))
+
+
+class FNetFStoreCompactor(object):
+    """
+        Compacts the delta segments of an FNetFStore in the background, every interval seconds, so that
+        loads don't have to apply more and more of them as the day goes on.
+
+        e.g.
+            with FNetFStore.FNetFStoreCompactor(store, interval=60):
+                ... intraday updates with store.saveDelta ...
+    """
+    def __init__(self, store, interval=60.0):
+        self._store = store
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self._store.compact()
+            except Exception as err:
+                print(f"{type(self).__name__}: unable to compact the store: {err}")
@@ -22,8 +22,11 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import abc
+import functools
+import threading
 import datetime as dt
 import FRTBConfig as cf
+import FRTBUtils as FNU
 
 
 classDict = {}
@@ -33,14 +36,75 @@ def registerClass(cls):
     return cls
 
 
+def pinConfig(calc):
+    # Decorator for the calcRiskClassCapital entry points.  The regulator's current config is pinned for
+    # the duration of the calculation, so that a config reloaded meanwhile is only used by calculations
+    # started after it, and each result is stamped with the version and hash of the config that produced it.
+    #
+    @functools.wraps(calc)
+    def pinnedCalc(self, *args, **kwargs):
+        if getattr(self._local, 'config', None) is not None:    # already pinned further up the stack
+            return calc(self, *args, **kwargs)
+
+        self._local.config = config = cf.getCurrentConfig(self._regulator)
+
+        try:
+            results = calc(self, *args, **kwargs)
+        finally:
+            self._local.config = None
+
+        for result in results if isinstance(results, list) else [results]:
+            if isinstance(result, dict):
+                result['ConfigVersion'] = config.getConfigVersion()
+                result['ConfigHash'] = config.getConfigHash()
+
+        return results
+
+    return pinnedCalc
+
+
+class Parameters(object):
+    # The base of the compiled parameter objects.  Each calculator class gets a subclass of this with a
+    # slot for each of the config items it declares in _parameters, see FRTBCalculator.__init_subclass__.
+    # Config item names that aren't identifiers, such as 'BA-Rho', have the '-' replaced with '_'.
+    #
+    __slots__ = ()
+
+    def __repr__(self):
+        items = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({items})"
+
+
 class FRTBCalculator(object):
+    # The config items used by the calculator, each mapped to its type, or to a tuple of (type, default) for
+    # an item that only some regulators have.  The items declared by a class are added to those declared by
+    # the classes it derives from.  They're compiled into a Parameters object and checked once per config,
+    # so that the hot paths can read them as plain attributes of self._params.
+    #
+    _parameters = {}
+    _parameterTypes = {}
+    _parameterClass = Parameters
+    _parameterSheet = None      # the config sheet that holds the parameters, if not the asset class's own
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._parameterTypes = {}
+
+        for base in reversed(cls.__mro__):
+            cls._parameterTypes.update(base.__dict__.get('_parameters', {}))
+
+        slots = tuple(item.replace('-', '_') for item in cls._parameterTypes)
+        cls._parameterClass = type(cls.__name__ + 'Parameters', (Parameters,), {'__slots__' : slots})
+
+
     def __init__(self, assetClass, regulator, ccy, cob):
         self._assetClass = assetClass
         self._regulator = regulator
         self._calcCcy = ccy     # calculaion currency - we don't do translation risk at preent.
-        self._config = cf.FRTBConfig(regulator)
-        self._ownCcy = self._config.getConfigItem('MR', 'ReportingCurrency')
+        self._local = threading.local()
         self._name = self.__class__.__name__
+        config = cf.getSharedConfig(regulator)      # picks up any change to the regulator's workbook
+        self._compiledParams = (config, self.compileParameters(config))
 
         if isinstance(cob, dt.datetime):
             self._cob = cob.date()
@@ -54,10 +118,38 @@ class FRTBCalculator(object):
             self._CVA = False
         else:                       # BA-CVA, SA-CVA, SA-DRC, SA-RRAO
             self._correlationLevels = ['Medium']
-            self._hedgeDisallowance = self._config.getConfigItem('CVA', 'SA-HedgeDisallowance')
             self._CVA = True
 
 
+    @property
+    def _config(self):
+        # The config pinned for the calculation in progress on this thread, otherwise the current config,
+        # which is shared by all calculators for this regulator.
+        #
+        config = getattr(self._local, 'config', None)
+        return cf.getCurrentConfig(self._regulator) if config is None else config
+
+    @property
+    def _params(self):
+        # The parameters compiled from the config in use, recompiled only when a reloaded config comes into use
+        #
+        config = self._config
+        compiled = self._compiledParams
+
+        if compiled[0] is not config:
+            compiled = self._compiledParams = (config, self.compileParameters(config))
+
+        return compiled[1]
+
+    @property
+    def _ownCcy(self):
+        return self._config.getConfigItem('MR', 'ReportingCurrency')
+
+    @property
+    def _hedgeDisallowance(self):
+        return self._config.getConfigItem('CVA', 'SA-HedgeDisallowance')
+
+
     @classmethod
     def create(cls, assetClass, regulator, ccy, cob):
         if assetClass in classDict.keys():
@@ -92,6 +184,9 @@ class FRTBCalculator(object):
         #       'SbAlt'         : 345.67
         #   }
         #
+        # Implementations are decorated with @pinConfig, which adds the ConfigVersion and
+        # ConfigHash of the config used to each of the Dictionaries.
+        #
         return {}
 
 
@@ -101,3 +196,42 @@ class FRTBCalculator(object):
 
     def getConfigItem(self, item):
         return self._config.getConfigItem(self._assetClass, item)
+
+    def compileParameters(self, config):
+        params = self._parameterClass()
+
+        if not self._parameterTypes:
+            return params
+
+        sheet = self._parameterSheet or self._assetClass
+        items = config.getConfig(sheet)
+        missing = []
+
+        for item, itemType in self._parameterTypes.items():
+            if item in items:
+                value = (itemType[0] if isinstance(itemType, tuple) else itemType)(items[item])
+            elif isinstance(itemType, tuple):
+                value = itemType[1]
+            else:
+                missing.append(item)
+                continue
+
+            setattr(params, item.replace('-', '_'), value)
+
+        if missing:
+            raise ValueError(f"{self._name}: no config item(s) {missing} for riskClass '{sheet}'")
+
+        return params
+
+    def getFastLookup(self, item):
+        return self._config.getFastLookup(self._assetClass, item)
+
+    def getWeights(self, item, vocab, labels):
+        # gather the risk weights for a whole column of labels from the compiled weight vector
+        return self.getFastLookup(item)[FNU.encodeLabels(self.getFastLookup(vocab), labels)]
+
+    def inCurrencyGroup(self, group, ccys):
+        # boolean array of whether each of ccys is in the currency group, e.g. 'BaselCcys'
+        flag = 1 << self.getFastLookup('CurrencyGroups').index(group)
+        codes = FNU.encodeLabels(self.getFastLookup('CurrencyGroupCodes'), ccys, strict=False)
+        return (codes > 0) & ((codes & flag) != 0)
@@ -25,6 +25,15 @@ Copyright © 2024 by Alan Skea
 """
 
 import os
+import io
+import hashlib
+import pickle
+import platform
+import struct
+import tempfile
+import threading
+import types
+from multiprocessing import shared_memory
 import numpy as np
 import pandas as pd
 import math
@@ -43,6 +52,55 @@ class FRTBConfig(object):
 
     _configFile = 'FRTBConfig_{}.xlsx'
 
+    # Compiled snapshots of each fully processed config sheet are kept in _snapshotDir (by default
+    # a .cache folder next to the workbooks) in a folder per regulator.  Bump _snapshotVersion
+    # whenever the shape of the processed config changes so that old snapshots are rebuilt.  They
+    # hold pickled pandas and numpy objects, so they're also rebuilt when the Python, pandas or
+    # numpy version changes.
+    #
+    _snapshotFile = '{}.pkl'
+    _snapshotDir = None
+    _snapshotVersion = 5
+    _snapshotLibraries = (platform.python_version(), np.__version__, pd.__version__)
+
+    # Tenor correlation matrices, along with the tenors that label them, that are also made available
+    # as fast lookups: read-only numpy matrices indexed by the integer codes of the tenors.
+    #
+    _tenorRhoItems = {
+        'DeltaTenorRho'             : 'DeltaTenors',
+        'VegaUnderlyingTenorRho'    : 'VegaTenors',
+        'VegaOptionTenorRho'        : 'VegaTenors'
+    }
+
+    # Risk weights that are also made available as fast lookups: numpy vectors indexed by the integer
+    # codes of a vocabulary (bucket/sub-bucket, tenor, rating, market cap or currency).  Where the risk
+    # weights are a DataFrame the columns are coded by the vocabulary and the rows by a second one,
+    # e.g. Spot/Repo or IG/HY_NR, giving a matrix.  A vocabulary is taken from the labels of the first
+    # item that uses it unless it already exists, in which case the weights are aligned to it.
+    #
+    _codedWeightItems = {
+        'DeltaBucketRiskWeight'     : ('BucketCodes', 'SpotRepoCodes'),
+        'VegaBucketRiskWeight'      : ('BucketCodes', None),
+        'DeltaRiskWeight'           : ('BucketCodes', 'CreditQualityCodes'),
+        'BA-RiskWeight'             : ('BucketCodes', 'CreditQualityCodes'),
+        'RiskWeight'                : ('BucketCodes', None),
+        'DeltaTenorRiskWeight'      : ('DeltaTenors', None),
+        'CQRiskWeight'              : ('RatingCodes', None),
+        'VegaRiskWeight'            : ('MarketCapCodes', None),
+        'ERMIICcys'                 : ('ERMIICcyCodes', None)
+    }
+
+    # Currency groups.  Each currency is coded with a bit flag for each group it belongs to, the
+    # bit for a group being 1 << (its position in this list).
+    #
+    _currencyGroups = ['BaselCcys', 'ERMIICcys', 'EURPegCcys']
+
+    # The inter-bucket gamma items are also compiled, already scaled for each of these correlation
+    # scenarios, both as they are for delta and vega and squared for curvature.
+    #
+    _correlationScenarios = ['Low', 'Medium', 'High']
+    _gammaItems = ['Gamma', 'GammaERMII']
+
     #
     # The following describes the shape of the data for each of the keys in the config.  If the
     # config key appears in a list here then it is given the treatment appropriate for that list.
@@ -54,16 +112,18 @@ class FRTBConfig(object):
     #   'arrayKeys'     : List of keys that are arrays
     #   'rowHdrKeys'    : List of keys that have row headers
     #   'colHdrKeys'    : List of keys that have column headers
-    #   'addIndex'      : Dictionary of keys and expressions to eval to create index labels
-    #   'addColumns'    : Dictionary of keys and expressions to eval to creatre column lalels
+    #   'addIndex'      : Dictionary of keys and references to create index labels
+    #   'addColumns'    : Dictionary of keys and references to create column labels
     #
-    # The addIndex and addColumns keys contain special magic.  They are used to set the row and column
-    # indices of a DataFrame or the index of a Series and can refer to other elements of the config data
-    # for that riskClass.  The strings are evaluated in the context of the dataDict dictionary into which
-    # all the config data is being loaded.  The usual use-case is to set an index from the list of buckets,
-    # but in the IR risk classes, the index is set from the list of tenors.  The structure of the addIndex
-    # and addColumns dictionaries is that the key is the name of the data item to which the row index or
-    # column indsex is to be added, and the value is the string to be evaluated to get the index or column values.
+    # The addIndex and addColumns keys are used to set the row and column indices of a DataFrame or the
+    # index of a Series and can refer to other elements of the config data for that riskClass.  The
+    # references use the small declarative syntax described in FRTBUtils.resolveReference, e.g.
+    # 'Bucket[Bucket] + Bucket[SubBucket]' is the Bucket column of the Bucket item concatenated with its
+    # SubBucket column and 'unique(Bucket[Bucket])' is the distinct values of the Bucket column.  The usual
+    # use-case is to set an index from the list of buckets, but in the IR risk classes, the index is set from
+    # the list of tenors.  The structure of the addIndex and addColumns dictionaries is that the key is the
+    # name of the data item to which the row index or column index is to be added, and the value is the
+    # reference to the index or column values.
     #
     _riskClassCongigKeyTypes = {
             'MR' : {
@@ -73,49 +133,49 @@ class FRTBConfig(object):
             'MS_IR' : {
                 'listKeys' : ['DeltaTenorRiskWeight', 'BaselCcys', 'DeltaTenors', 'VegaTenors', 'ERMIICcys'],
                 'arrayKeys' : ['DeltaTenorRho'],
-                'addIndex' : { 'DeltaTenorRiskWeight' : "dataDict['DeltaTenors']", 'DeltaTenorRho' : "dataDict['DeltaTenors']" },
-                'addColumns' : { 'DeltaTenorRho' : "dataDict['DeltaTenors']" }
+                'addIndex' : { 'DeltaTenorRiskWeight' : 'DeltaTenors', 'DeltaTenorRho' : 'DeltaTenors' },
+                'addColumns' : { 'DeltaTenorRho' : 'DeltaTenors' }
             },
             'MS_CR' : {
                 'listKeys' : ['DeltaBucketRiskWeight', 'DeltaTenors', 'VegaTenors', 'CoveredBondHighQuality', 'IndexBuckets'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'MS_CC' : {
                 'listKeys' : ['DeltaBucketRiskWeight', 'DeltaTenors', 'VegaTenors'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'MS_CS' : {
                 'listKeys' : ['DeltaBucketRiskWeight', 'DeltaTenors', 'VegaTenors'],
                 'arrayKeys' : ['Bucket'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']" }
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]' }
             },
             'MS_EQ' : {
                 'listKeys' : ['DeltaNameBucketRho', 'VegaTenors'],
                 'arrayKeys' : ['AdvancedEconomyCountries', 'Bucket', 'DeltaBucketRiskWeight', 'Gamma'],
                 'rowHdrKeys' : ['DeltaBucketRiskWeight'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaNameBucketRho' : "dataDict['Bucket']['Bucket'].unique()",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                                 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' : { 'DeltaNameBucketRho' : 'unique(Bucket[Bucket])',
+                               'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                                 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'MS_CM' : {
                 'listKeys' : ['DeltaBucketRiskWeight', 'DeltaCommodityRho', 'DeltaTenors', 'VegaTenors'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'DeltaCommodityRho' : "dataDict['Bucket']['Bucket'].unique()",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()"},
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'DeltaCommodityRho' : 'unique(Bucket[Bucket])',
+                               'Gamma' : 'unique(Bucket[Bucket])'},
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'MS_FX' : {
                 'listKeys' : ['BaselCcys', 'VegaTenors', 'ERMIICcys', 'EURPegCcys'],
@@ -146,13 +206,13 @@ class FRTBConfig(object):
                 'arrayKeys' : ['BA-Bucket', 'BA-RiskWeight'],
                 'rowHdrKeys' : ['BA-RiskWeight'],
                 'colHdrKeys' : ['BA-Bucket'],
-                'addColumns' : { 'BA-RiskWeight' : "dataDict['BA-Bucket']['Bucket']" }
+                'addColumns' : { 'BA-RiskWeight' : 'BA-Bucket[Bucket]' }
             },
             'CS_IR' : {
                 'listKeys' : ['BaselCcys', 'DeltaTenorRiskWeight', 'DeltaTenors', 'ERMIICcys'],
                 'arrayKeys' : ['DeltaTenorRho'],
-                'addIndex' : { 'DeltaTenorRiskWeight' : "dataDict['DeltaTenors']", 'DeltaTenorRho' : "dataDict['DeltaTenors']" },
-                'addColumns' : { 'DeltaTenorRho' : "dataDict['DeltaTenors']" }
+                'addIndex' : { 'DeltaTenorRiskWeight' : 'DeltaTenors', 'DeltaTenorRho' : 'DeltaTenors' },
+                'addColumns' : { 'DeltaTenorRho' : 'DeltaTenors' }
             },
             'CS_FX' : {
                 'listKeys' : ['ERMIICcys', 'EURPegCcys'],
@@ -163,36 +223,36 @@ class FRTBConfig(object):
                 'arrayKeys' : ['Bucket', 'Gamma', 'DeltaRiskWeight'],
                 'rowHdrKeys' : ['DeltaRiskWeight'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'DeltaRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                                 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
+                'addIndex' : { 'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'DeltaRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                                 'Gamma' : 'unique(Bucket[Bucket])' },
             },
             'CS_CR' : {
                 'listKeys' : ['DeltaBucketRiskWeight'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' :  { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                                 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' :  { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                                 'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'CS_EQ' : {
                 'listKeys' : ['AdvancedEconomyCountries', 'DeltaBucketRiskWeight', 'VegaBucketRiskWeight', 'DeltaBucketRho'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'VegaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'DeltaBucketRho' : "dataDict['Bucket']['Bucket'].unique()",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()",
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'VegaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'DeltaBucketRho' : 'unique(Bucket[Bucket])',
+                               'Gamma' : 'unique(Bucket[Bucket])',
                              },
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             },
             'CS_CM' : {
                 'listKeys' : ['DeltaBucketRiskWeight'],
                 'arrayKeys' : ['Bucket', 'Gamma'],
                 'colHdrKeys' : ['Bucket'],
-                'addIndex' : { 'DeltaBucketRiskWeight' : "dataDict['Bucket']['Bucket'] + dataDict['Bucket']['SubBucket']",
-                               'Gamma' : "dataDict['Bucket']['Bucket'].unique()" },
-                'addColumns' : { 'Gamma' : "dataDict['Bucket']['Bucket'].unique()" }
+                'addIndex' : { 'DeltaBucketRiskWeight' : 'Bucket[Bucket] + Bucket[SubBucket]',
+                               'Gamma' : 'unique(Bucket[Bucket])' },
+                'addColumns' : { 'Gamma' : 'unique(Bucket[Bucket])' }
             }
         }
 
@@ -358,88 +418,250 @@ class FRTBConfig(object):
     }
 
 
-    def __init__(self, regulator):
+    def __init__(self, regulator, useSnapshot=True, lazy=True):
         self._name = type(self).__name__
         self._regulator = regulator
-        self._config = self.readConfig()
-        self._computeVegaRiskWeights()
-        self._computeRho()
+        self._configPath = self.getConfigPath(regulator)
+        self._useSnapshot = useSnapshot
+        self._lock = threading.RLock()
+        self._workbook = None
+        self._config = {}
+        self._lookups = {}
+        self._version = 0
+
+        # We keep the workbook bytes so that sheets loaded later on come from the same
+        # version of the workbook as the hash we record, even if the file changes meanwhile.
+        #
+        with open(self._configPath, 'rb') as f:
+            self._source = f.read()
+
+        self._configHash = hashlib.sha256(self._source).hexdigest()
+        self._sheetNames = self.readSnapshot('_Sheets') if useSnapshot else None
+
+        if self._sheetNames is None:
+            self._sheetNames = self.readSheetNames()
+
+            if useSnapshot:
+                self.writeSnapshot('_Sheets', self._sheetNames)
+
+        if not lazy:
+            self.loadAll()
+
+
+    @classmethod
+    def getConfigPath(cls, regulator):
+        cfpath = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'FRTB', 'Configs')
+        return os.path.join(cfpath, cls._configFile.format(regulator))
+
+    @classmethod
+    def getSnapshotPath(cls, regulator, sheet):
+        if cls._snapshotDir is None:
+            snapDir = os.path.join(os.path.dirname(cls.getConfigPath(regulator)), '.cache')
+        else:
+            snapDir = cls._snapshotDir
+
+        return os.path.join(snapDir, regulator, cls._snapshotFile.format(sheet))
 
 
-    def _computeVegaRiskWeights(self):
-        if 'MR' not in self._config.keys():
+    def getRegulator(self):
+        return self._regulator
+
+    def getConfigHash(self):
+        # sha256 of the workbook bytes that this config was parsed from
+        return self._configHash
+
+    def getConfigVersion(self):
+        # The version of the regulator's config in this process, counting from 1 each time a new
+        # version of the workbook is registered as the shared config.  0 if never registered.
+        return self._version
+
+
+    def getLoadedConfigList(self):
+        return list(self._config.keys())
+
+    def loadAll(self):
+        for sheet in self._sheetNames:
+            self._loadSheet(sheet)
+
+
+    def _loadSheet(self, sheet):
+        # Sheets are loaded on first access.  The config is shared between calculators, and
+        # so between threads, so loading is done under the lock.  A loaded sheet is never
+        # changed again so readers can use anything already in self._config without locking.
+        #
+        cfg = self._config.get(sheet)
+
+        if cfg is not None:
+            return cfg
+
+        with self._lock:
+            if sheet in self._config:
+                return self._config[sheet]
+
+            snap = self.readSnapshot(sheet) if self._useSnapshot else None
+
+            if snap is None:
+                cfg = self.readSheet(sheet)
+                lookups = {}
+                self._computeVegaRiskWeights(sheet, cfg)
+                self._computeRho(sheet, cfg, lookups)
+                self._compileLookups(sheet, cfg, lookups)
+
+                if self._useSnapshot:
+                    self.writeSnapshot(sheet, (cfg, lookups))
+            else:
+                cfg, lookups = snap
+
+            for v in lookups.values():
+                if isinstance(v, np.ndarray):
+                    v.flags.writeable = False
+
+            # Once built, we stop anyone adding or replacing items.  The pandas objects
+            # themselves must still be treated as read-only by the callers.  The lookups
+            # go in first as readers only check self._config before using them.
+            #
+            self._lookups[sheet] = types.MappingProxyType(dict((k, types.MappingProxyType(v) if isinstance(v, dict) else v) for k, v in lookups.items()))
+            self._config[sheet] = cfg = types.MappingProxyType(cfg)
+
+            if len(self._config) == len(self._sheetNames) and self._workbook is not None:
+                self._workbook.close()
+                self._workbook = None
+
+            return cfg
+
+
+    def _computeVegaRiskWeights(self, sheet, cfg):
+        # The vega risk weights for each asset class are derived from the liquidity horizons on the MR sheet
+        #
+        if sheet == 'MR':
+            if 'VegaLiquidityHorizon' in cfg.keys():
+                vegaLH = cfg['VegaLiquidityHorizon']
+                RWSigma = cfg['VegaRiskWeightSigma']
+                sqrtTen = 10 ** 0.5
+                vegaLH.loc[:, 'RiskWeight'] = vegaLH['LiquidityHorizon'].astype('float64').apply(lambda x: min(RWSigma * (x ** 0.5) / sqrtTen, 1))
+                cfg['VegaLiquidityHorizon'] = vegaLH
+
             return
 
-        cfg = self._config['MR']
+        if 'MR' not in self._sheetNames:
+            return
 
-        if 'VegaLiquidityHorizon' not in cfg.keys():
+        mr = self._loadSheet('MR')
+
+        if 'VegaLiquidityHorizon' not in mr.keys():
             return
 
-        vegaLH = cfg['VegaLiquidityHorizon']
-        RWSigma = cfg['VegaRiskWeightSigma']
-        sqrtTen = 10 ** 0.5
-        vegaLH.loc[:, 'RiskWeight'] = vegaLH['LiquidityHorizon'].astype('float64').apply(lambda x: min(RWSigma * (x ** 0.5) / sqrtTen, 1))
-        self._config['MR']['VegaLiquidityHorizon'] = vegaLH
-
-        for key, grp in vegaLH.groupby('AssetClass'):
-            if key in self._config.keys():
-                if key == 'MS_EQ':
-                    grp.drop(columns=['AssetClass', 'LiquidityHorizon'], inplace=True)
-                    grp.set_index('MarketCap', inplace=True)
-                    self._config[key]['VegaRiskWeight'] = grp
-                else:
-                    self._config[key]['VegaRiskWeight'] = grp['RiskWeight'].iat[0]
+        vegaLH = mr['VegaLiquidityHorizon']
+        grp = vegaLH[vegaLH['AssetClass'] == sheet]
 
-    def __rhoExpr(self, tau, a, b):
-        return math.exp(-tau * abs(a - b) / min(a, b))
+        if grp.empty:
+            return
+
+        if sheet == 'MS_EQ':
+            cfg['VegaRiskWeight'] = grp.drop(columns=['AssetClass', 'LiquidityHorizon']).set_index('MarketCap')
+        else:
+            cfg['VegaRiskWeight'] = grp['RiskWeight'].iat[0]
 
-    def _computeRho(self):
-        cfg = self._config['MS_IR']
+    @staticmethod
+    def _buildTenorRho(tenors, tau, floor=None):
+        # exp(-tau * |a - b| / min(a, b)) for every pair of tenors a and b, optionally floored,
+        # with a unit diagonal.  The exponent is broadcast over the whole matrix but we still
+        # take math.exp of each element so that the results are identical to the scalar formula,
+        # numpy's exp can differ from it in the last bit.
+        #
+        t = np.asarray(tenors, dtype='float64')
+        a = t[:, np.newaxis]
+        b = t[np.newaxis, :]
+        expnt = -tau * np.abs(a - b) / np.minimum(a, b)
+        rho = np.fromiter(map(math.exp, expnt.ravel()), dtype='float64', count=expnt.size).reshape(expnt.shape)
 
-        if 'DeltaTenorRhoTheta' in cfg.keys() and 'DeltaTenors' in cfg.keys():
-            theta = cfg['DeltaTenorRhoTheta']
-            rho = np.ones((len(cfg['DeltaTenors']), len(cfg['DeltaTenors'])))
+        if floor is not None:
+            rho = np.maximum(rho, floor)
 
-            for i, r in enumerate(cfg['DeltaTenors']):
-                for j, c in enumerate(cfg['DeltaTenors']):
-                    if j <= i:
-                        continue
-                    else:
-                        rho[i, j] = rho [j, i] = max(self.__rhoExpr(theta, float(r), float(c)), 0.4)
+        np.fill_diagonal(rho, 1.0)
+        return rho
 
-            cfg['DeltaTenorRho'] = pd.DataFrame(rho, index=cfg['DeltaTenors'], columns=cfg['DeltaTenors'])
+    def _computeRho(self, sheet, cfg, lookups):
+        if sheet == 'MS_IR':
+            if 'DeltaTenorRhoTheta' in cfg.keys() and 'DeltaTenors' in cfg.keys():
+                rho = self._buildTenorRho(cfg['DeltaTenors'], cfg['DeltaTenorRhoTheta'], 0.4)
+                cfg['DeltaTenorRho'] = pd.DataFrame(rho, index=cfg['DeltaTenors'], columns=cfg['DeltaTenors'])
 
-        if 'VegaTenors' in cfg.keys():
-            alpha = cfg['VegaUnderlyingRhoAlpha']
-            rho = np.ones((len(cfg['VegaTenors']), len(cfg['VegaTenors'])))
+            if 'VegaTenors' in cfg.keys():
+                rho = self._buildTenorRho(cfg['VegaTenors'], cfg['VegaUnderlyingRhoAlpha'])
+                cfg['VegaUnderlyingTenorRho'] = pd.DataFrame(rho, index=cfg['VegaTenors'], columns=cfg['VegaTenors'])
 
-            for i, r in enumerate(cfg['VegaTenors']):
-                for j, c in enumerate(cfg['VegaTenors']):
-                    if j <= i:
-                        continue
-                    else:
-                        rho[i, j] = rho [j, i] = self.__rhoExpr(alpha, float(r), float(c))
+        if sheet in ['MS_IR', 'MS_CR', 'MS_CC', 'MS_CS', 'MS_EQ', 'MS_CM', 'MS_FX'] and 'VegaTenors' in cfg.keys():
+            rho = self._buildTenorRho(cfg['VegaTenors'], self._loadSheet('MR')['VegaOptionRhoAlpha'])
+            cfg['VegaOptionTenorRho'] = pd.DataFrame(rho, index=cfg['VegaTenors'], columns=cfg['VegaTenors'])
 
-            cfg['VegaUnderlyingTenorRho'] = pd.DataFrame(rho, index=cfg['VegaTenors'], columns=cfg['VegaTenors'])
+        # Whether computed above or read from the sheet (e.g. CS_IR), each tenor correlation matrix
+        # is also kept as a raw matrix together with the integer codes of its tenors.
+        #
+        for item, tenors in self._tenorRhoItems.items():
+            if isinstance(cfg.get(item), pd.DataFrame):
+                lookups[item] = cfg[item].to_numpy(dtype='float64', copy=True)
+                lookups[tenors] = dict((t, i) for i, t in enumerate(cfg[item].index))
 
-        self._config['MS_IR'] = cfg
-        alpha = self._config['MR']['VegaOptionRhoAlpha']
 
-        for assetClass in ['MS_IR', 'MS_CR', 'MS_CC', 'MS_CS', 'MS_EQ', 'MS_CM', 'MS_FX']:
-            cfg = self._config[assetClass]
+    def _compileLookups(self, sheet, cfg, lookups):
+        for item, (vocab, rowVocab) in self._codedWeightItems.items():
+            weights = cfg.get(item)
 
-            if 'VegaTenors' in cfg.keys():
-                rho = np.ones((len(cfg['VegaTenors']), len(cfg['VegaTenors'])))
+            if isinstance(weights, pd.DataFrame) and 'RiskWeight' in weights.columns:
+                weights = weights['RiskWeight']     # e.g. MS_EQ vega risk weights by market cap
+
+            if not isinstance(weights, (pd.Series, pd.DataFrame)) or not np.all(weights.dtypes == 'float64'):
+                continue
+
+            labels = weights.columns if isinstance(weights, pd.DataFrame) else weights.index
+
+            if vocab not in lookups:
+                lookups[vocab] = dict((l, i) for i, l in enumerate(labels))
+
+            if isinstance(weights, pd.DataFrame):
+                lookups[rowVocab] = dict((l, i) for i, l in enumerate(weights.index))
+                lookups[item] = weights.reindex(columns=list(lookups[vocab].keys())).to_numpy(dtype='float64')
+            else:
+                lookups[item] = weights.reindex(list(lookups[vocab].keys())).to_numpy(dtype='float64')
+
+        # MS_EQ vega risk weights depend on the market cap of the bucket
+        #
+        if 'BucketCodes' in lookups and 'MarketCapCodes' in lookups and isinstance(cfg.get('Bucket'), pd.DataFrame):
+            bucket = cfg['Bucket']
+            marketCap = pd.Series(bucket['MarketCap'].to_numpy(), index=bucket['Bucket'] + bucket['SubBucket'])
+            marketCap = marketCap[~marketCap.index.duplicated()].reindex(list(lookups['BucketCodes'].keys()))
+            lookups['BucketMarketCap'] = FNU.encodeLabels(lookups['MarketCapCodes'], marketCap.fillna(''), strict=False)
+
+        codes = {}
 
-                for i, r in enumerate(cfg['VegaTenors']):
-                    for j, c in enumerate(cfg['VegaTenors']):
-                        if j <= i:
-                            continue
-                        else:
-                            rho[i, j] = rho [j, i] = self.__rhoExpr(alpha, float(r), float(c))
+        for i, group in enumerate(self._currencyGroups):
+            if isinstance(cfg.get(group), pd.Series):
+                ccys = cfg[group].index if cfg[group].dtype == 'float64' else cfg[group]
 
-                cfg['VegaOptionTenorRho'] = pd.DataFrame(rho, index=cfg['VegaTenors'], columns=cfg['VegaTenors'])
-                self._config[assetClass] = cfg
+                for c in ccys:
+                    codes[c] = codes.get(c, 0) | (1 << i)
+
+        if codes:
+            lookups['CurrencyGroups'] = tuple(self._currencyGroups)
+            lookups['CurrencyGroupCodes'] = codes
+
+        # A gamma that is a single value for all bucket pairs is kept as a 0-d array, otherwise it is
+        # a matrix indexed by the codes of GammaBuckets, e.g. lookups['CurvatureGammaHigh'].
+        #
+        for item in self._gammaItems:
+            if not item in cfg:
+                continue
+
+            if isinstance(cfg[item], pd.DataFrame):
+                lookups['GammaBuckets'] = dict((b, i) for i, b in enumerate(cfg[item].index))
+                gamma = cfg[item].to_numpy(dtype='float64')
+            else:
+                gamma = np.asarray(cfg[item], dtype='float64')
+
+            for level in self._correlationScenarios:
+                lookups[item + level] = FNU.scaleCorrelation(level, gamma, 0)
+                lookups['Curvature' + item + level] = FNU.scaleCorrelation(level, gamma ** 2, 0)
 
 
     def getCellValues(self, ws):
@@ -460,44 +682,125 @@ class FRTBConfig(object):
             yield vals
 
 
-    def readConfig(self):
-        cfpath = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'FRTB', 'Configs')
-        xlfile = os.path.join(cfpath, self._configFile.format(self._regulator))
-        wb = xl.load_workbook(xlfile, read_only=True, data_only=True)
-        cfg = {}    
+    def _getWorkbook(self):
+        if self._workbook is None:
+            self._workbook = xl.load_workbook(io.BytesIO(self._source), read_only=True, data_only=True)
+
+        return self._workbook
+
 
-        for i, ws in enumerate(wb.worksheets):
-            configClass = wb.sheetnames[i]
+    def readSheetNames(self):
+        sheetNames = []
 
+        for configClass in self._getWorkbook().sheetnames:
             if configClass in self._riskClassKeyDataType.keys():
-                cfgdf = pd.DataFrame(self.getCellValues(ws)).fillna('')
-                cfg[configClass] = FNU.extractKeyedData(configClass, cfgdf, self._riskClassKeyDataType[configClass], **self._riskClassCongigKeyTypes[configClass])
+                sheetNames.append(configClass)
             elif configClass != 'Copyright':
-                print(f"Unknown config sheet : {configClass} in config for {self._regulator} in {xlfile}")
+                print(f"Unknown config sheet : {configClass} in config for {self._regulator} in {self._configPath}")
+
+        return sheetNames
+
 
-        wb.close()
-        return cfg
+    def readSheet(self, configClass):
+        # Just the data as it appears on the sheet, without the derived items
+        #
+        ws = self._getWorkbook()[configClass]
+        cfgdf = pd.DataFrame(self.getCellValues(ws)).fillna('')
+        return FNU.extractKeyedData(configClass, cfgdf, self._riskClassKeyDataType[configClass], **self._riskClassCongigKeyTypes[configClass])
+
+
+    def readConfig(self):
+        with self._lock:
+            return dict((sheet, self.readSheet(sheet)) for sheet in self._sheetNames)
+
+
+    def readSnapshot(self, sheet):
+        # Returns the processed data for the sheet from its snapshot, or None if there is no usable
+        # snapshot for the current workbook, in which case the caller rebuilds it.
+        #
+        snapfile = self.getSnapshotPath(self._regulator, sheet)
+
+        try:
+            with open(snapfile, 'rb') as f:
+                snap = pickle.load(f)
+        except Exception:
+            # a snapshot pickled by other versions of the libraries can fail in any number of ways,
+            # whatever it is the sheet is just rebuilt from the workbook
+            return None
+
+        if (not isinstance(snap, dict) or
+                snap.get('SnapshotVersion') != self._snapshotVersion or
+                snap.get('Libraries') != self._snapshotLibraries or
+                snap.get('Regulator') != self._regulator or
+                snap.get('Sheet') != sheet or
+                snap.get('SourceHash') != self._configHash):
+            return None
+
+        return snap['Config']
+
+
+    def writeSnapshot(self, sheet, cfg):
+        snapfile = self.getSnapshotPath(self._regulator, sheet)
+        snap = {
+            'SnapshotVersion'   : self._snapshotVersion,
+            'Libraries'         : self._snapshotLibraries,
+            'Regulator'         : self._regulator,
+            'Sheet'             : sheet,
+            'SourceHash'        : self._configHash,
+            'Config'            : cfg,
+        }
+
+        try:
+            os.makedirs(os.path.dirname(snapfile), exist_ok=True)
+
+            # write to a temporary file and move it into place so that concurrent readers
+            # never see a partially written snapshot
+            fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(snapfile), suffix='.tmp')
+
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(snap, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+                os.replace(tmpfile, snapfile)
+            except:
+                os.remove(tmpfile)
+                raise
+        except OSError as err:
+            print(f"{self._name}: unable to write config snapshot '{snapfile}': {err}")
 
 
     def _argCheck(self, riskClass, item=None):
-        if not riskClass in self._config.keys():
+        if not riskClass in self._sheetNames:
             raise ValueError(f"{self._name}: no config for riskClass '{riskClass}'")
 
-        if not item is None and not item in self._config[riskClass].keys():
+        if not item is None and not item in self._loadSheet(riskClass).keys():
             raise ValueError(f"{self._name}: no config item '{item}' for riskClass '{riskClass}'")
 
 
     def getConfigList(self):
-        return self._config.keys()
+        return list(self._sheetNames)
 
     def getConfig(self, riskClass):
         self._argCheck(riskClass)
-        return self._config[riskClass]
+        return self._loadSheet(riskClass)
 
     def getConfigItem(self, riskClass, item):
         self._argCheck(riskClass, item)
         return self._config[riskClass][item]
 
+    def getFastLookup(self, riskClass, item):
+        # The numeric form of a config item for use in the calculators' hot paths: either a read-only
+        # numpy array or a read-only dictionary of label -> integer code to index such arrays with.
+        #
+        self._argCheck(riskClass)
+        self._loadSheet(riskClass)
+        lookups = self._lookups[riskClass]
+
+        if not item in lookups:
+            raise ValueError(f"{self._name}: no fast lookup '{item}' for riskClass '{riskClass}'")
+
+        return lookups[item]
+
     def getBuckets(self, riskClass, buckets=None):
         if riskClass == 'CVA':
             self._argCheck(riskClass, 'BA-Bucket')
@@ -518,6 +821,369 @@ class FRTBConfig(object):
                 return bdf[bdf['Bucket'].isin(buckets)].to_list()
 
 
+    def getState(self):
+        # Everything needed to recreate this config without the workbook, as plain picklable objects
+        #
+        self.loadAll()
+
+        return {
+            'Regulator'     : self._regulator,
+            'ConfigPath'    : self._configPath,
+            'SourceHash'    : self._configHash,
+            'Sheets'        : list(self._sheetNames),
+            'Config'        : dict((sheet, dict(cfg)) for sheet, cfg in self._config.items()),
+            'Lookups'       : dict((sheet, dict((k, dict(v) if isinstance(v, types.MappingProxyType) else v) for k, v in lookups.items()))
+                                        for sheet, lookups in self._lookups.items())
+        }
+
+    @classmethod
+    def fromState(cls, state, owner=None):
+        # The inverse of getState.  owner is anything that must be kept alive for as long as the config
+        # is in use, e.g. the shared memory that the config's arrays live in.
+        #
+        config = cls.__new__(cls)
+        config._name = cls.__name__
+        config._regulator = state['Regulator']
+        config._configPath = state['ConfigPath']
+        config._useSnapshot = False
+        config._lock = threading.RLock()
+        config._workbook = None
+        config._source = None
+        config._configHash = state['SourceHash']
+        config._sheetNames = state['Sheets']
+        config._version = 0
+        config._owner = owner
+        config._lookups = dict((sheet, types.MappingProxyType(dict((k, types.MappingProxyType(v) if isinstance(v, dict) else v) for k, v in lookups.items())))
+                                    for sheet, lookups in state['Lookups'].items())
+        config._config = dict((sheet, types.MappingProxyType(cfg)) for sheet, cfg in state['Config'].items())
+        return config
+
+
+#
+# Process-wide registry of parsed configs.  Building an FRTBConfig means parsing the regulator's
+# workbook and deriving the vega risk weights and tenor correlations, so we only want to do that
+# once per regulator per process.  Configs are keyed by the regulator and the identity of the
+# workbook (path, modification time and hash) so an edited workbook gets parsed afresh.
+#
+_registry = {}
+_registryLock = threading.Lock()
+_registryStats = {}
+_hashCache = {}
+_current = {}
+_versions = {}
+
+
+class _RegistryEntry(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.config = None
+
+
+def getConfigIdentity(regulator):
+    path = FRTBConfig.getConfigPath(regulator)
+    st = os.stat(path)
+    statKey = (path, st.st_mtime_ns, st.st_size)
+
+    with _registryLock:
+        digest = _hashCache.get(statKey)
+
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        with _registryLock:
+            _hashCache[statKey] = digest
+
+    return (path, st.st_mtime_ns, digest)
+
+
+def getSharedConfig(regulator):
+    """
+        Get the process-wide FRTBConfig for a regulator, parsing the workbook only if this
+        regulator/workbook combination hasn't been seen before.  Safe to call from multiple threads.
+
+        :param regulator: Name of the regulator, e.g. 'BCBS' or 'UK-PRA'
+
+        :return: The shared FRTBConfig
+    """
+    key = (regulator,) + getConfigIdentity(regulator)
+
+    with _registryLock:
+        entry = _registry.get(key)
+
+        if entry is None:
+            # drop any entries for older versions of this regulator's workbook
+            for k in [k for k in _registry.keys() if k[0] == regulator]:
+                del _registry[k]
+
+            entry = _registry[key] = _RegistryEntry()
+
+    # parse outside the registry lock so that different regulators can load concurrently
+    with entry.lock:
+        hit = entry.config is not None
+
+        if not hit:
+            config = FRTBConfig(regulator)
+
+            with _registryLock:
+                _makeCurrent(config, entry)
+
+            entry.config = config
+
+    with _registryLock:
+        stats = _registryStats.setdefault(regulator, {'hits' : 0, 'misses' : 0})
+        stats['hits' if hit else 'misses'] += 1
+
+    return entry.config
+
+
+def _makeCurrent(config, entry):
+    # Give a newly registered config its version and, unless its registry entry has been replaced by
+    # a newer one meanwhile, make it the regulator's current config.  Called holding _registryLock.
+    #
+    regulator = config.getRegulator()
+    config._version = _versions[regulator] = _versions.get(regulator, 0) + 1
+
+    if entry in _registry.values():
+        _current[regulator] = config
+
+
+def getCurrentConfig(regulator):
+    """
+        Get the regulator's current config without checking whether the workbook has changed, which
+        is left to getSharedConfig and ConfigWatcher.  This is cheap enough to call for every access.
+
+        :param regulator: Name of the regulator, e.g. 'BCBS' or 'UK-PRA'
+
+        :return: The current FRTBConfig
+    """
+    config = _current.get(regulator)
+    return getSharedConfig(regulator) if config is None else config
+
+
+def getRegistryStats():
+    with _registryLock:
+        return dict((k, v.copy()) for k, v in _registryStats.items())
+
+
+def clearRegistry():
+    with _registryLock:
+        _registry.clear()
+        _registryStats.clear()
+        _hashCache.clear()
+        _current.clear()
+
+
+def registerConfig(config):
+    # Make config the shared config for its regulator, provided it was built from the current workbook
+    #
+    key = (config.getRegulator(),) + getConfigIdentity(config.getRegulator())
+
+    if key[-1] != config.getConfigHash():
+        return False
+
+    with _registryLock:
+        for k in [k for k in _registry.keys() if k[0] == key[0]]:
+            del _registry[k]
+
+        entry = _registry[key] = _RegistryEntry()
+        entry.config = config
+        _makeCurrent(config, entry)
+
+    return True
+
+
+class ConfigWatcher(object):
+    """
+        Watches the workbooks of the given regulators and, when one changes, builds the new config
+        in the background and then swaps it in as the regulator's current config.  Calculations
+        already in progress carry on with the config they started with.
+
+        e.g.
+            with FRTBConfig.ConfigWatcher(['UK-PRA'], interval=10):
+                ... long-running work ...
+    """
+    def __init__(self, regulators, interval=5.0, onReload=None):
+        self._regulators = list(regulators)
+        self._interval = interval
+        self._onReload = onReload       # called with the new config after each swap
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def start(self):
+        for regulator in self._regulators:
+            getSharedConfig(regulator)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            for regulator in self._regulators:
+                self.check(regulator)
+
+    def check(self, regulator):
+        # Rebuild and swap in the regulator's config if its workbook has changed.  A workbook that
+        # can't be read, e.g. while it is being saved, is left for the next check.
+        #
+        try:
+            if getConfigIdentity(regulator)[-1] == getCurrentConfig(regulator).getConfigHash():
+                return False
+
+            config = FRTBConfig(regulator, lazy=False)
+        except Exception as err:
+            print(f"{type(self).__name__}: unable to reload the config for {regulator}: {err}")
+            return False
+
+        if not registerConfig(config):
+            return False
+
+        if self._onReload is not None:
+            self._onReload(config)
+
+        return True
+
+
+#
+# Configs published to shared memory for worker processes.  The parent publishes a regulator's fully
+# loaded config and hands the name of the shared memory block to its workers, which attach to it rather
+# than parsing the workbook themselves.  The config is pickled with protocol 5 so that the numpy arrays
+# behind the DataFrames, Series and fast lookups are written as separate buffers into the block, and on
+# attaching they are recreated as read-only arrays over the shared memory without being copied.
+#
+# The block is laid out as a header (magic, length of the pickle, number of buffers), the offset and
+# length of each buffer, the pickle and then the buffers, each aligned to _sharedAlign bytes.
+#
+# Python versions before 3.13 track attached shared memory as if it were owned, so workers should be
+# started from the publishing process with multiprocessing which shares its resource tracker.
+#
+_sharedMagic = b'FRTBSHM1'
+_sharedHeader = struct.Struct('<8sQQ')
+_sharedBuffer = struct.Struct('<QQ')
+_sharedAlign = 64
+_published = {}
+
+
+def publishSharedConfig(regulator):
+    """
+        Publish the regulator's shared config, fully loaded, to a read-only shared memory block
+        for worker processes to attach to with attachSharedConfig.
+
+        :param regulator: Name of the regulator, e.g. 'BCBS' or 'UK-PRA'
+
+        :return: The name of the shared memory block
+    """
+    config = getSharedConfig(regulator)
+    name = f"frtb_{os.getpid()}_{regulator}_{config.getConfigHash()[:8]}"
+
+    with _registryLock:
+        if name in _published:
+            return name
+
+    buffers = []
+    meta = pickle.dumps(config.getState(), protocol=5, buffer_callback=buffers.append)
+    buffers = [b.raw() for b in buffers]
+    offset = _sharedHeader.size + _sharedBuffer.size * len(buffers) + len(meta)
+    layout = []
+
+    for b in buffers:
+        offset += -offset % _sharedAlign
+        layout.append((offset, b.nbytes))
+        offset += b.nbytes
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(offset, 1))
+
+    try:
+        pos = _sharedHeader.size
+        _sharedHeader.pack_into(shm.buf, 0, _sharedMagic, len(meta), len(buffers))
+
+        for start, length in layout:
+            _sharedBuffer.pack_into(shm.buf, pos, start, length)
+            pos += _sharedBuffer.size
+
+        shm.buf[pos:pos + len(meta)] = meta
+
+        for (start, length), b in zip(layout, buffers):
+            shm.buf[start:start + length] = b
+    except:
+        shm.close()
+        shm.unlink()
+        raise
+
+    with _registryLock:
+        _published[name] = shm
+
+    return name
+
+
+def attachSharedConfig(name, register=True):
+    """
+        Attach to a config published with publishSharedConfig.  The arrays of the config stay in
+        the shared memory and are read-only.
+
+        :param name: Name of the shared memory block
+        :param register: If True, and the regulator's workbook is unchanged since publishing, the
+                         attached config becomes the shared config for the regulator so that
+                         calculators created in this process use it.
+
+        :return: The FRTBConfig
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+
+    buf = shm.buf.toreadonly()
+    magic, metaLen, nbuf = _sharedHeader.unpack_from(buf, 0)
+
+    if magic != _sharedMagic:
+        raise ValueError(f"'{name}' is not a published config")
+
+    pos = _sharedHeader.size
+    buffers = []
+
+    for _ in range(nbuf):
+        start, length = _sharedBuffer.unpack_from(buf, pos)
+        buffers.append(buf[start:start + length])
+        pos += _sharedBuffer.size
+
+    config = FRTBConfig.fromState(pickle.loads(buf[pos:pos + metaLen], buffers=buffers), owner=shm)
+
+    if register and not registerConfig(config):
+        print(f"{name}: config for {config.getRegulator()} is out of date with its workbook, not registered")
+
+    return config
+
+
+def releaseSharedConfig(name=None):
+    # Remove a published config, or all of them.  Workers already attached keep their mapping.
+    #
+    with _registryLock:
+        names = list(_published.keys()) if name is None else [name]
+        blocks = [_published.pop(n) for n in names if n in _published]
+
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
 if __name__ == '__main__':
     config = FRTBConfig('BCBS')
     # print(config.getConfigItem('MS_CS', 'DeltaBucketRiskWeight'))
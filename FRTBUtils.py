@@ -21,6 +21,8 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import re
+import numpy as np
 import pandas as pd
 
 _typeMap = {
@@ -52,6 +54,71 @@ def _toList(l, n=None):
     return lst
 
 
+def _listLengths(empty, n=None):
+    # Vectorised _toList for a whole block of rows.  Each row's list takes at least the first n
+    # cells and then runs up to, but not including, the next empty cell.  Given the empty-cell
+    # mask of the block this returns the length of the list for each row.  n may be a scalar
+    # or have a value for each row.
+    #
+    width = empty.shape[1]
+
+    if width == 0:
+        return np.zeros(empty.shape[0], dtype=int)
+
+    n = np.broadcast_to(0 if n is None else n, (empty.shape[0],))
+    stops = empty & (np.arange(width) >= n[:, None])
+    return np.where(stops.any(axis=1), stops.argmax(axis=1), width)
+
+
+def _blockToLists(block, empty, n=None):
+    lengths = _listLengths(empty, n)
+    return [row[:l] for row, l in zip(block.tolist(), lengths)]
+
+
+_refTerm = re.compile(r"^\s*([^\[\]]+?)\s*(?:\[\s*([^\[\]]+?)\s*\])?\s*$")
+
+
+def resolveReference(dataDict, ref):
+    """
+        Resolve a declarative reference to data already extracted into dataDict.  The syntax is:
+
+            Key                 the item Key
+            Key[Column]         column Column of the item Key
+            A + B               element-wise concatenation of the references A and B
+            unique(A)           the unique values of reference A
+
+        e.g. 'unique(Bucket[Bucket])' or 'Bucket[Bucket] + Bucket[SubBucket]'
+
+        :param dataDict: Dictionary of extracted data
+        :param ref: The reference string
+
+        :return: The referenced data
+    """
+    ref = ref.strip()
+
+    if ref.startswith('unique(') and ref.endswith(')'):
+        return resolveReference(dataDict, ref[7:-1]).unique()
+
+    terms = ref.split('+')
+    result = None
+
+    for term in terms:
+        m = _refTerm.match(term)
+
+        if m is None:
+            raise ValueError(f"Invalid reference '{ref}'")
+
+        key, column = m.groups()
+
+        if key not in dataDict:
+            raise KeyError(key)
+
+        value = dataDict[key] if column is None else dataDict[key][column]
+        result = value if result is None else result + value
+
+    return result
+
+
 def extractKeyedData(sourceName, df, dataTypes, listKeys=[], arrayKeys=[], rowHdrKeys=[], colHdrKeys=[], addIndex=None, addColumns=None):
     """
         Extract data from a DataFrame using a key structure
@@ -63,26 +130,18 @@ def extractKeyedData(sourceName, df, dataTypes, listKeys=[], arrayKeys=[], rowHd
         :param arrayKeys: List of keys that are arrays
         :param rowHdrKeys: List of keys that are row headers
         :param colHdrKeys: List of keys that are column headers
-        :param addIndex: Dictionary of keys and expressions to eval to add to the index
-        :param addColumns: Dictionary of keys and expressions to eval add to the columns
+        :param addIndex: Dictionary of keys and references (see resolveReference) to set as the index
+        :param addColumns: Dictionary of keys and references (see resolveReference) to set as the column labels
 
         :return: Dictionary of key-value
     """
 
-    # idx is the row index for the array, if there is one
-    # cols is the column index for the array, if there is one
-    # __processKey gets these from the enclosing scope
     dataDict = {}
-    k = None
-    name = ''
-    idx = []
-    cols = None
-    values = []
 
 
-    def __processKey():
+    def __processKey(k, name, idx, cols, values):
         #
-        # deal with the collected data from the previous key
+        # deal with the collected data for a key
         #     - create a DataFrame if the key is in arrayKeys
         #     - create a Series if the key is in listKeys
         #     - otherwise it is a scalar value
@@ -116,78 +175,92 @@ def extractKeyedData(sourceName, df, dataTypes, listKeys=[], arrayKeys=[], rowHd
     #
     # Main part of function
     #
-    for _, r in df.iterrows():
-        # column 0 in the name of this data, i.e. the key
-        # if it's empty then we are still processing the previous key
-        # and if there is no previous key then we have an error
-        if r.at[0] == '':
-            if k == None:
-                raise ValueError('No initial key defined in config')
-        else:
-            if not k is None:
-                # we have a new key so process the previous one
-                __processKey()
-
-            # initialise for the new key
-            name = k = r.at[0]
-            idx = []
-            cols = None
-            values = []
-
-            # if we have column headeres on this item then collect them
-            if k in colHdrKeys:
-                if k in rowHdrKeys:
-                    name = r.at[1]
-                    cols = _toList(r.loc[2:])
-                else:
-                    cols = _toList(r.loc[1:])
-
-                continue
+    # Column 0 holds the name of each data item, i.e. the key, and the key's data runs
+    # from its key row down to the row before the next key.  We find the key rows and
+    # the extent of each block with masks over the whole sheet and then slice each block
+    # out in one go.
+    #
+    cells = df.to_numpy(dtype=object)
+    empty = (cells == '')
+    nrows, ncols = cells.shape
+    keyRows = np.flatnonzero(~empty[:, 0])
+
+    if nrows > 0 and (keyRows.size == 0 or keyRows[0] != 0):
+        raise ValueError('No initial key defined in config')
+
+    for start, end in zip(keyRows, np.append(keyRows[1:], nrows)):
+        name = k = cells[start, 0]
+        cols = None
+
+        # if we have column headers on this item then collect them from the key row
+        if k in colHdrKeys:
+            if k in rowHdrKeys:
+                name = cells[start, 1]
+                cols = _toList(cells[start, 2:])
+            else:
+                cols = _toList(cells[start, 1:])
 
-        # Ignore rows that only have noise at the rght.  All vaild rows have data in col 2.
-        if r.at[1] == '':
-            continue
+            start += 1
 
+        # Ignore rows that only have noise at the right.  All valid rows have data in col 1.
+        rows = np.arange(start, end)
+        rows = rows[~empty[rows, 1]]
+        block = cells[rows]
+        blockEmpty = empty[rows]
         col = 1
 
-        # if we have row headers then collect the header on this row
+        # if we have row headers then collect the header on each row
         if k in rowHdrKeys:
-            if r.at[col] != '':     # can this happen except on last row?
-                idx.append(r.at[col])
-
+            idx = block[:, col].tolist()
             col += 1
+        else:
+            idx = []
 
         if not k in arrayKeys:
-            if r.shape[0] > col + 1 and r.at[col + 1] != '':
-                # Horizontal list
-                if k in colHdrKeys:
-                    values = _toList(r.loc[col:],len(cols) + col - 1)
-                else:
-                    values = _toList(r.loc[col:])
-            elif r.at[col] != '':
-                # Vertical list or scalar
-                values.append(r.at[col])
-        elif k in colHdrKeys and not r.iloc[col:len(cols) + col].eq('').all():
-            # Must be an array row
-            values.append(_toList(r.loc[col:], len(cols) + col - 1))
-        elif not r.eq('').all():
-                values.append(_toList(r.loc[col:]))
-
-    # process the last key
-    __processKey()
+            # A row with data in the next column is a horizontal list which replaces anything
+            # collected before it.  Otherwise each row adds one item to a vertical list or scalar.
+            #
+            if ncols > col + 1:
+                horizontal = ~blockEmpty[:, col + 1]
+            else:
+                horizontal = np.zeros(rows.size, dtype=bool)
+
+            values = []
+            first = 0
+
+            if horizontal.any():
+                last = np.flatnonzero(horizontal)[-1]
+                n = len(cols) + col - 1 if k in colHdrKeys else None
+                values = _blockToLists(block[last:last + 1, col:], blockEmpty[last:last + 1, col:], n)[0]
+                first = last + 1
+
+            if first < rows.size:
+                vertical = block[first:, col][~blockEmpty[first:, col]]
+                values.extend(vertical.tolist())
+        elif k in colHdrKeys:
+            # Must be array rows.  Rows with nothing under the column headers just take what is there.
+            n = np.where(blockEmpty[:, col:len(cols) + col].all(axis=1), 0, len(cols) + col - 1)
+            values = _blockToLists(block[:, col:], blockEmpty[:, col:], n)
+        else:
+            values = _blockToLists(block[:, col:], blockEmpty[:, col:])
+
+        __processKey(k, name, idx, cols, values)
+
+    if nrows == 0:
+        __processKey(None, '', [], None, [])
 
     # add the requested indexes and columns
     if not addIndex is None:
         for k, v in addIndex.items():
             try:
-                dataDict[k].index = eval(v)
+                dataDict[k].index = resolveReference(dataDict, v)
             except Exception as err:
                 raise ValueError(f"Error setting index on '{k}' with '{v}' in source '{sourceName}': {err}")
 
     if not addColumns is None:
         for k, v in addColumns.items():
             try:
-                dataDict[k].rename(columns=dict(zip(dataDict[k].columns, eval(v))), inplace=True)
+                dataDict[k].rename(columns=dict(zip(dataDict[k].columns, resolveReference(dataDict, v))), inplace=True)
             except Exception as err:
                 raise ValueError(f"Error column index on '{k}' with '{v}' in source '{sourceName}': {err}")
 
@@ -214,3 +287,147 @@ def extractKeyedData(sourceName, df, dataTypes, listKeys=[], arrayKeys=[], rowHd
                     raise ValueError(f"Bad type conversion from (type: {type(dataDict[k])})' for key '{k}' in  source '{sourceName}'")
 
     return dataDict
+
+
+def encodeLabels(codes, values, strict=True):
+    """
+        Map labels to the integer codes of a config fast lookup, e.g. a column of tenors to the
+        rows of a tenor correlation matrix, so that the matrix can be indexed with numpy.
+
+        :param codes: Dictionary of label -> integer code
+        :param values: The labels to encode
+        :param strict: If True unknown labels raise a KeyError, otherwise they are coded as -1
+
+        :return: numpy array of the codes for values
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        # encode just the categories and gather by the values' category codes (-1 for NaN)
+        values = pd.Categorical(values)
+        idx = pd.Index(list(codes.keys())).get_indexer(values.categories)
+        idx = np.where(values.codes < 0, -1, np.append(idx, -1)[values.codes])
+    else:
+        idx = pd.Index(list(codes.keys())).get_indexer(values)
+
+    missing = idx < 0
+
+    if missing.any():
+        if strict:
+            raise KeyError(pd.Index(values)[missing].unique().tolist())
+
+        return np.where(missing, -1, np.asarray(list(codes.values()), dtype='int64')[idx])
+
+    return np.asarray(list(codes.values()), dtype='int64')[idx]
+
+
+def joinLabels(left, right):
+    """
+        Concatenate two columns of string labels, e.g. Bucket and SubBucket.  When both are categorical
+        only the distinct pairs of categories are joined and the result is categorical too.
+
+        :param left: Series of labels
+        :param right: Series of labels, with the same index as left
+
+        :return: Series of the joined labels
+    """
+    if not (isinstance(left.dtype, pd.CategoricalDtype) and isinstance(right.dtype, pd.CategoricalDtype)):
+        return left + right
+
+    if left.isna().any() or right.isna().any():
+        return left.astype(object) + right.astype(object)
+
+    # hash the pairs of codes as a single integer, then join and sort just the distinct pairs
+    nRight = len(right.cat.categories)
+    inverse, pairs = pd.factorize(left.cat.codes.to_numpy().astype('int64') * nRight + right.cat.codes.to_numpy())
+    joined = np.array([left.cat.categories[p // nRight] + right.cat.categories[p % nRight] for p in pairs], dtype=object)
+    categories, pairCodes = np.unique(joined, return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(pairCodes[inverse], categories), index=left.index)
+
+
+def pairwiseEqual(values):
+    """
+        The matrix of which pairs of values are equal, as comparing them with == would give, e.g. to build
+        a correlation matrix from its risk factors' names with numpy rather than looping over the pairs.
+        Null values aren't equal to anything, not even each other.
+
+        :param values: Series or array of labels
+
+        :return: numpy bool array of shape (len(values), len(values))
+    """
+    codes = pd.factorize(values)[0]
+    equal = codes[:, None] == codes[None, :]
+
+    if (codes < 0).any():
+        equal &= (codes >= 0)[:, None]
+
+    return equal
+
+
+def lowerToSymmetric(m, block=1024):
+    """
+        Mirror the strictly lower triangle of a square matrix into the upper one and zero the diagonal,
+        the layout of the rho matrices whose correlations are computed for each pair i > j of factors.
+        This is done in place, a block of rows at a time, so that a bucket of tens of thousands of
+        factors doesn't need a second copy of its matrix.
+
+        :param m: Square numpy array whose element [i, j] is the correlation of factor i with factor j
+        :param block: Number of rows mirrored at a time
+
+        :return: m, with m[i, j] both at [i, j] and [j, i] for each i > j
+    """
+    n = m.shape[0]
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        diag = m[start:stop, start:stop]
+        rows, cols = np.indices(diag.shape, sparse=True)
+        m[start:stop, start:stop] = np.where(rows > cols, diag, diag.T)
+        m[start:stop, stop:] = m[stop:, start:stop].T
+
+    np.fill_diagonal(m, 0.0)
+    return m
+
+
+def groupRows(df, field, ranges=None):
+    """
+        Iterate over the rows of df grouped by a field, as df.groupby(field, observed=True) does, or, if
+        df is sorted by the field, over the given ranges of its rows, which saves hashing the field again.
+        This is how the calculators' calcRiskClassCapital split a risk class into its buckets, where the
+        ranges are their bucketRanges argument, e.g. the FNetF.getBucketRanges of a RiskSubGroup of data
+        sorted with FNetF.setHierarchyIndex.
+
+        :param df: DataFrame
+        :param field: The field to group by, e.g. 'Bucket'
+        :param ranges: Optional list of (value, start, stop) of the rows of each group, e.g. from
+                       FNetF.getBucketRanges
+
+        :return: iterator of (value, DataFrame of its rows)
+    """
+    if ranges is None:
+        return iter(df.groupby(field, observed=True))
+
+    return ((value, df.iloc[start:stop]) for value, start, stop in ranges)
+
+
+def scaleCorrelation(level, corr, diag):
+    """
+        Scale a correlation, or matrix of correlations, for the Low, Medium or High correlation scenario.
+
+        :param level: 'Low', 'Medium' or 'High'
+        :param corr: A scalar, numpy array or DataFrame of correlations
+        :param diag: Value for the diagonal of a matrix, 1 for intra-bucket rho and 0 for inter-bucket gamma
+
+        :return: The scaled correlation(s)
+    """
+    if level == 'Low':
+        newCorr = np.maximum(corr * 0.75, 2 * corr - 1)
+    elif level == 'High':
+        newCorr = np.minimum(corr * 1.25, 1.0)
+    else:
+        newCorr = corr.copy() if isinstance(corr, (pd.DataFrame, np.ndarray)) else corr
+
+    if isinstance(newCorr, pd.DataFrame):       # we might be called with a scalar in which case there is no diagonal
+        np.fill_diagonal(newCorr.values, diag)
+    elif isinstance(newCorr, np.ndarray) and newCorr.ndim == 2:
+        np.fill_diagonal(newCorr, diag)
+
+    return newCorr
@@ -26,6 +26,7 @@ import pandas as pd
 import datetime as dt
 
 import FRTBCalculator
+import FRTBUtils as FNU
 
 class SA_DRC_Calc(FRTBCalculator.FRTBCalculator):
     # This is the primary entry point and computes capital for a single risk class
@@ -42,10 +43,13 @@ class SA_DRC_Calc(FRTBCalculator.FRTBCalculator):
     #   }
     # ]
     #
-    def calcRiskClassCapital(self, riskClass, df):
+    # bucketRanges is passed on to FRTBUtils.groupRows, see there.
+    #
+    @FRTBCalculator.pinConfig
+    def calcRiskClassCapital(self, riskClass, df, bucketRanges=None):
         bucketResults = []
 
-        for bucket, bucketSensis in df.groupby('Bucket'):
+        for bucket, bucketSensis in FNU.groupRows(df, 'Bucket', bucketRanges):
             bdf = self.prepareData(riskClass, bucketSensis)
             bdf = self.applyRiskWeights(riskClass, bdf)
             bdf = self.collectRiskFactors(riskClass, bdf)  # this ought to be a no-op for DRC
@@ -103,7 +107,7 @@ class SA_DRC_Calc(FRTBCalculator.FRTBCalculator):
         res = pd.DataFrame()
         kk = ['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + fields
 
-        for k, v in df.groupby(kk, dropna=False):
+        for k, v in df.groupby(kk, dropna=False, observed=True):
             r = self._netByObligor(v)
             r = pd.concat([r, pd.Series(k, kk)])
             res = pd.concat([res, r.to_frame().T], axis=0)
@@ -119,10 +123,9 @@ class SA_DRC_Calc(FRTBCalculator.FRTBCalculator):
 
 
     def applyRiskWeights(self, riskClass, df):
-        riskWeight = self.getConfigItem('CQRiskWeight')
-
         if 'Rating' in df.columns:
-            df.loc[~df['Rating'].isnull(), 'RiskWeight'] = df[~df['Rating'].isnull()]['Rating'].apply(lambda rating : riskWeight.at[rating])
+            rated = ~df['Rating'].isnull()
+            df.loc[rated, 'RiskWeight'] = self.getWeights('CQRiskWeight', 'RatingCodes', df.loc[rated, 'Rating'])
 
         df.loc[:, 'WeightedNetJTDLong'] = df['NetJTDLong'] * df['RiskWeight']
         df.loc[:, 'WeightedNetJTDShort'] = df['NetJTDShort'] * df['RiskWeight']
@@ -136,7 +139,7 @@ class SA_DRC_Calc(FRTBCalculator.FRTBCalculator):
         #
         factorFields = self.getFactorNettingFields()
         valueFields = ['GrossJTDLong', 'GrossJTDShort', 'NetJTDLong', 'NetJTDShort', 'WeightedNetJTDLong', 'WeightedNetJTDShort']
-        ndf = df[['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields + valueFields].groupby(['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields, dropna=False).sum().reset_index()
+        ndf = df[['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields + valueFields].groupby(['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields, dropna=False, observed=True).sum().reset_index()
         return ndf
 
 
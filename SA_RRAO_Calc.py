@@ -25,6 +25,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import pandas as pd
 
 import FRTBCalculator
+import FRTBUtils as FNU
 
 @FRTBCalculator.registerClass
 class MR_RR_SA_RRAO(FRTBCalculator.FRTBCalculator):
@@ -37,10 +38,13 @@ class MR_RR_SA_RRAO(FRTBCalculator.FRTBCalculator):
     #       'Medium'    : 123.45,
     #   }
     #
-    def calcRiskClassCapital(self, riskClass, df):
+    # bucketRanges is passed on to FRTBUtils.groupRows, see there.
+    #
+    @FRTBCalculator.pinConfig
+    def calcRiskClassCapital(self, riskClass, df, bucketRanges=None):
         bucketResult = []
 
-        for bucket, bucketSensis in df.groupby('Bucket'):
+        for bucket, bucketSensis in FNU.groupRows(df, 'Bucket', bucketRanges):
             bdf = self.prepareData(riskClass, bucketSensis)
             bdf = self.applyRiskWeights(riskClass, bdf)
             bdf = self.collectRiskFactors(riskClass, bdf)  # this ought to be a no-op for RRAO
@@ -62,9 +66,8 @@ class MR_RR_SA_RRAO(FRTBCalculator.FRTBCalculator):
 
 
     def applyRiskWeights(self, riskClass, df):
-        RW = self.getConfigItem('RiskWeight')
         ndf = df.copy()
-        ndf.loc[:, 'RiskWeight'] = ndf['Bucket'].apply(lambda x: RW[x])
+        ndf.loc[:, 'RiskWeight'] = self.getWeights('RiskWeight', 'BucketCodes', ndf['Bucket'])
         ndf.loc[:, 'WeightedNotionalAmount'] = ndf['RiskWeight'] * df['NotionalAmount']
         return ndf
 
@@ -77,7 +80,7 @@ class MR_RR_SA_RRAO(FRTBCalculator.FRTBCalculator):
         #
         factorFields = ['RiskWeight']
         valueFields = ['NotionalAmount', 'WeightedNotionalAmount']
-        ndf = df[['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields + valueFields].groupby(['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields, dropna=False).sum().reset_index()
+        ndf = df[['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields + valueFields].groupby(['RiskGroup', 'RiskSubGroup', 'RiskClass', 'Bucket'] + factorFields, dropna=False, observed=True).sum().reset_index()
         return ndf
 
 
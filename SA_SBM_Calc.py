@@ -28,6 +28,7 @@ import numpy as np
 import pandas as pd
 
 import FRTBCalculator
+import FRTBUtils as FNU
 
 class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
     # This is the primary entry point and computes capital for a single risk class
@@ -41,10 +42,13 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
     #       'High'      : 345.67
     #   }
     #
-    def calcRiskClassCapital(self, riskClass, df):
+    # bucketRanges is passed on to FRTBUtils.groupRows, see there.
+    #
+    @FRTBCalculator.pinConfig
+    def calcRiskClassCapital(self, riskClass, df, bucketRanges=None):
         bucketResults = []
 
-        for bucket, bucketSensis in df.groupby('Bucket'):
+        for bucket, bucketSensis in FNU.groupRows(df, 'Bucket', bucketRanges):
             bdf = self.prepareData(riskClass, bucketSensis)
             bdf = self.applyRiskWeights(riskClass, bdf)
             bdf = self.collectRiskFactors(riskClass, bdf)
@@ -147,12 +151,12 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
         # For CVA there is just Medium correation and for Market Risk the Sb is the
         # same for all correlation levels so we just calculate it once.
         #
-        gamma = self.getGamma(bdf[bdf['Correlation'] == 'Medium'])
+        mbdf = bdf[bdf['Correlation'] == 'Medium']
 
         for corr in self._correlationLevels:
             capital = {}
             capital['RiskClass'] = riskClass
-            scaledGamma = self.scaleCorrelation(corr, gamma, 0)
+            scaledGamma = self.getScaledGamma(mbdf, corr)
             nbdf = bdf[bdf['Correlation'] == corr].set_index('Bucket')
             Kb2 = nbdf['Kb'] ** 2
             Sb = nbdf['Sb']
@@ -249,14 +253,14 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
 
     def calcCurvature(self, riskClass, bdf):
         capitals = []
-        gamma = self.getGamma(bdf[bdf['Correlation'] == 'Medium'])
+        mbdf = bdf[bdf['Correlation'] == 'Medium']
 
         for corr in self._correlationLevels:
             capital = {}
             capital['RiskClass'] = riskClass
             # scaledGamma = self.scaleCorrelation(corr, gamma, 0) * 2
             # Industry consesus is square beofre scaling. SA-SARB (1 July 2025) rules are explicit on this.
-            scaledGamma = self.scaleCorrelation(corr, gamma ** 2, 0)
+            scaledGamma = self.getScaledGamma(mbdf, corr, curvature=True)
             nbdf = bdf[bdf['Correlation'] == corr].set_index('Bucket')
             psi = 1 - np.outer(nbdf['Sb'].lt(0), nbdf['Sb'].lt(0))
             Kb2 = nbdf['Kb'] ** 2
@@ -294,7 +298,7 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
             valueFields = ['Sensitivity', 'WeightedSensitivity']
             factorFields.append('RiskWeight')
 
-        ndf = df[keyFields + factorFields + valueFields].groupby(keyFields + factorFields).sum().reset_index()
+        ndf = df[keyFields + factorFields + valueFields].groupby(keyFields + factorFields, observed=True).sum().reset_index()
         return ndf
 
 
@@ -318,11 +322,9 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
         riskType = riskClass[5:]
 
         if riskType == 'Delta':
-            RWBucket = self.getConfigItem('DeltaBucketRiskWeight')
-            df.loc[:, 'RiskWeight'] = df.apply(lambda r : RWBucket.at[r['Bucket']+r['SubBucket']], axis=1)
+            df.loc[:, 'RiskWeight'] = self.getWeights('DeltaBucketRiskWeight', 'BucketCodes', FNU.joinLabels(df['Bucket'], df['SubBucket']))
         elif riskType == 'Vega':
-            RWVega = self.getConfigItem('VegaRiskWeight')
-            df.loc[:, 'RiskWeight'] = RWVega
+            df.loc[:, 'RiskWeight'] = self._params.VegaRiskWeight
         else:
             # Curvature - is there any risk weight for curvature?
             # CVR+ and CVR- are already delta-neutralised so nothing to do.
@@ -345,19 +347,86 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
         return pd.DataFrame(np.zeros((df.shape[0], df.shape[0])))
 
 
-    def getGamma(self, df):
-        # gamma correlations come in two flavours, either a full matrix of inter-bucket correlations
-        # or a single value to be applied between all bucket pairs.  In either case we want to return
-        # a full matrix of gamma values for the buckets that are in the input dataframe.   We don't worry
-        # about the diagonal of the matrix here as it will be set when we call scaleCorrelation.
+    def getProductRho(self, df, fieldRhos, optionMaturity=False, sameMaturity=True):
+        # The rho of the risk classes whose correlations are products of a rho for each field in which a pair
+        # of factors differ.  Starting from 1.0, each pair of factors has its correlation multiplied by the
+        # rho of each (field, rho) in fieldRhos, in order, whose values differ for the pair.  With
+        # optionMaturity it is then multiplied by the correlation of their option maturities and capped at
+        # 1.0, for every pair or, without sameMaturity, just for the pairs whose maturities differ.
+        #
+        # The whole matrix is built at once from masks of which pairs of factors differ, multiplying in place
+        # in the same order as for a single pair so that each correlation is the same to the last bit, and
+        # the option maturity correlations are gathered from the raw matrix by the codes of the maturities.
+        # Only the one float matrix of the whole bucket is allocated, the masks take a byte a pair.
+        #
+        n = df.shape[0]
+        corr = np.ones((n, n))
+
+        def differ(field):
+            equal = FNU.pairwiseEqual(df[field].to_numpy(dtype=object))
+            return np.logical_not(equal, out=equal)
+
+        for field, fieldRho in fieldRhos:
+            np.multiply(corr, fieldRho, out=corr, where=differ(field))
+
+        if optionMaturity:
+            optionTenorRho = self.getFastLookup('VegaOptionTenorRho')
+            optionIdx = FNU.encodeLabels(self.getFastLookup('VegaTenors'), df['OptionMaturity'])
+            otherMaturity = True if sameMaturity else differ('OptionMaturity')
+
+            # a block of rows at a time so as not to hold a second matrix of the whole bucket
+            for start in range(0, n, 1024):
+                block = corr[start:start + 1024]
+                where = True if sameMaturity else otherMaturity[start:start + 1024]
+                np.multiply(block, optionTenorRho[optionIdx[start:start + 1024, None], optionIdx[None, :]], out=block, where=where)
+                np.minimum(block, 1.0, out=block, where=where)
+
+        rho = FNU.lowerToSymmetric(corr)
+        return pd.DataFrame(rho, index=df.index, columns=df.index)
+
+
+    def getCreditRho(self, riskClass, df, nameRho, basisRho, tenorRho):
+        # The rho of the credit spread risk classes (MS_CR, MS_CC and MS_CS), whose factors are a name (the
+        # obligor, underlier or tranche), then a CurveType and a Tenor for delta or an OptionMaturity for vega.
+        # Each pair of factors has its correlation multiplied by nameRho if their names differ, then for delta
+        # by basisRho if their CurveTypes differ and by tenorRho if their Tenors differ, or for vega by the
+        # correlation of their option maturities, capped at 1.0.
+        #
+        fields = self._rhoFactorFields[riskClass[5:]]
+        fieldRhos = [(fields[0], nameRho)]
+
+        if riskClass[5:] == 'Delta':
+            fieldRhos += [(fields[1], basisRho), (fields[2], tenorRho)]
+
+        return self.getProductRho(df, fieldRhos, optionMaturity=riskClass[5:] == 'Vega')
+
+
+    def getScaledGamma(self, df, level, curvature=False):
+        # gamma correlations come in two flavours, either a full matrix of inter-bucket correlations or a
+        # single value to be applied between all bucket pairs.  In either case we return a full matrix of the
+        # gamma between the buckets in the input dataframe, scaled for the correlation level and, for
+        # curvature, squared first.  It's gathered from the gamma the config has already scaled for each
+        # level.  The diagonal is zero.
         #
-        gamma = self.getConfigItem('Gamma')
+        gamma = self.getFastLookup(('CurvatureGamma' if curvature else 'Gamma') + level)
         buckets = df['Bucket']
 
-        if isinstance(gamma, pd.DataFrame):
-            return gamma.loc[buckets, buckets]
+        if gamma.ndim == 2:
+            idx = FNU.encodeLabels(self.getFastLookup('GammaBuckets'), buckets)
+            g = gamma[np.ix_(idx, idx)]
         else:
-            return pd.DataFrame(np.full((df.shape[0], df.shape[0]), gamma), index=buckets, columns=buckets)
+            g = np.full((df.shape[0], df.shape[0]), gamma)
+            np.fill_diagonal(g, 0)
+
+        return self._gammaFrame(g, level, buckets)
+
+    def _gammaFrame(self, g, level, buckets):
+        # Lay the matrix out in memory as scaling a DataFrame of the unscaled gamma with scaleCorrelation
+        # would, so that numpy sums the products in Sb.T @ gamma @ Sb in the same order as it always has and
+        # the capital is unchanged to the last bit.
+        #
+        g = np.asarray(g, order='C' if level == 'High' else 'F')
+        return pd.DataFrame(g, index=buckets, columns=buckets, copy=False)
 
 
     def scaleCorrelation(self, level, corr, diag):
@@ -365,17 +434,7 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
         #   for intra-bucket rho factors, diag = 1
         #   for inter-bucket gamma factors, diag = 0
         #
-        if level == 'Low':
-            newCorr = np.maximum(corr * 0.75, 2 * corr - 1)
-        elif level == 'High':
-            newCorr = np.minimum(corr * 1.25, 1.0)
-        else:
-            newCorr = corr.copy() if isinstance(corr, pd.DataFrame) else corr
-
-        if isinstance(newCorr, pd.DataFrame):       # we might be called with a scalar in which case there is no diagonal
-            np.fill_diagonal(newCorr.values, diag)
-
-        return newCorr
+        return FNU.scaleCorrelation(level, corr, diag)
 
 
 #%%################################################
@@ -391,6 +450,15 @@ class SA_SBM_Calc(FRTBCalculator.FRTBCalculator):
 #
 @FRTBCalculator.registerClass
 class MS_IR_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaCurveRho'            : float,
+        'DeltaInflationRho'        : float,
+        'DeltaXCcyBasisRho'        : float,
+        'DeltaInflationRiskWeight' : float,
+        'DeltaXCcyBasisRiskWeight' : float,
+        'VegaRiskWeight'           : float
+    }
+
     _rhoFactorFields = {
         'Delta'     : ['CurveType', 'Curve', 'Tenor'],
         'Vega'      : ['CurveType', 'OptionMaturity', 'UnderlyingResidualMaturity'],
@@ -401,18 +469,15 @@ class MS_IR_SA_SBM_Calc(SA_SBM_Calc):
         riskType = riskClass[5:]
 
         if riskType == 'Delta':
-            RWTenor = self.getConfigItem('DeltaTenorRiskWeight')
-            RWInfl = self.getConfigItem('DeltaInflationRiskWeight')
-            RWXCcy = self.getConfigItem('DeltaXCcyBasisRiskWeight')
-            baselCcys = set(self.getConfigItem('BaselCcys'))
-            baselCcys.add(self._ownCcy)  # TODO : change name to reportingCcy
-            df.loc[df['CurveType']=='IR', 'RiskWeight'] = df[df['CurveType']=='IR'].apply(lambda x: RWTenor[x['Tenor']], axis=1)
-            df.loc[df['CurveType']=='INFL', 'RiskWeight'] = df[df['CurveType']=='INFL'].apply(lambda x: RWInfl, axis=1)
-            df.loc[df['CurveType']=='XCCY', 'RiskWeight'] = df[df['CurveType']=='XCCY'].apply(lambda x: RWXCcy, axis=1)
-            df.loc[df['Bucket'].isin(baselCcys), 'RiskWeight'] = df.loc[df['Bucket'].isin(baselCcys), 'RiskWeight'] / (2.0 ** 0.5)
+            params = self._params
+            isIR = df['CurveType'] == 'IR'
+            isBasel = self.inCurrencyGroup('BaselCcys', df['Bucket']) | (df['Bucket'] == self._ownCcy).to_numpy()  # TODO : change name to reportingCcy
+            df.loc[isIR, 'RiskWeight'] = self.getWeights('DeltaTenorRiskWeight', 'DeltaTenors', df.loc[isIR, 'Tenor'])
+            df.loc[df['CurveType']=='INFL', 'RiskWeight'] = params.DeltaInflationRiskWeight
+            df.loc[df['CurveType']=='XCCY', 'RiskWeight'] = params.DeltaXCcyBasisRiskWeight
+            df.loc[isBasel, 'RiskWeight'] = df.loc[isBasel, 'RiskWeight'] / (2.0 ** 0.5)
         elif riskType == 'Vega':
-            RWVega = self.getConfigItem('VegaRiskWeight')
-            df.loc[:, 'RiskWeight'] = RWVega
+            df.loc[:, 'RiskWeight'] = self._params.VegaRiskWeight
         else:
             # Curvature - is there any risk weight for curvature?
             # CVR+ and CVR- are already delta-neutralised so nothing to do.
@@ -423,86 +488,104 @@ class MS_IR_SA_SBM_Calc(SA_SBM_Calc):
         return df
 
     def getRho(self, riskClass, bucket, df):
-        rho = np.zeros((df.shape[0], df.shape[0]))
         factors = df[self._rhoFactorFields[riskClass[5:]]]
-        tenorRho = self.getConfigItem('DeltaTenorRho')
-        curveRho = self.getConfigItem('DeltaCurveRho')
-        inflRho = self.getConfigItem('DeltaInflationRho')
-        xCcyRho = self.getConfigItem('DeltaXCcyBasisRho')
-        optionTenorRho = self.getConfigItem('VegaOptionTenorRho')
-        underlyingTenorRho = self.getConfigItem('VegaUnderlyingTenorRho')
-
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                if riskClass[5:] == 'Delta':
-                    if r[0] == 'XCCY' or c[0] == 'XCCY':
-                        corr = xCcyRho
-                    elif r[0] == 'INFL' or c[0] == 'INFL':
-                        if r[0] == c[0]:    # both are INFL
-                            corr = 1.0      # different curves are handled below
-                        else:
-                            corr = inflRho
-                    else:
-                        corr = tenorRho.at[r[2], c[2]]
-
-                    if r[0] == c[0] and r[1] != c[1]:
-                        # Same CurveType, Differnt Curve
-                        # i.e. we have two different IR curves
-                        #           or two different XCCY curves
-                        #           or two different INFL curves
-                        corr *= curveRho
-                elif riskClass[5:] == 'Vega':
-                    if r[0] == 'IR' and c[0] == 'IR':
-                        # corr = optionMaturity * underlyingResidualMaturity
-                        corr = optionTenorRho.loc[r[1], c[1]] * underlyingTenorRho.loc[r[2], c[2]]
-                    elif r[0] == c[0]:
-                        # if we get here then both are XCCY or both are INFL
-                        # just use the rho for the option maturity
-                        corr = optionTenorRho.loc[r[1], c[1]]
-                    elif r[0] == 'XCCY' or c[0] == 'XCCY':
-                        # just one is XCCY
-                        corr = xCcyRho
-                    else:
-                        # one is INFL and the other is IR
-                        corr = inflRho * optionTenorRho.loc[r[1], c[1]]
-
-                    corr = min(corr, 1.0)
-
-                rho[i, j] = rho[j, i] = corr
+        params = self._params
+        curveRho = params.DeltaCurveRho
+        inflRho = params.DeltaInflationRho
+        xCcyRho = params.DeltaXCcyBasisRho
+
+        # The correlation of each pair of factors is built for the whole matrix at once from masks of the
+        # pairs' CurveTypes, with element [i, j] the correlation of factor i (r) with factor j (c), and
+        # then the lower triangle is mirrored into the upper one.  The tenor correlations are gathered
+        # from the raw matrices by the integer codes of the tenors.  Tenors are only encoded for the
+        # factors whose tenors are looked up, the others are left as -1 and their gathers masked out.
+        #
+        if riskClass[5:] in ['Delta', 'Vega']:
+            curveType = factors['CurveType'].to_numpy(dtype=object)
+            sameType = FNU.pairwiseEqual(curveType)
+
+        if riskClass[5:] == 'Delta':
+            tenorRho = self.getFastLookup('DeltaTenorRho')
+            tenorIdx = np.full(df.shape[0], -1)
+            hasTenor = (~factors['CurveType'].isin(['XCCY', 'INFL'])).to_numpy()
+            tenorIdx[hasTenor] = FNU.encodeLabels(self.getFastLookup('DeltaTenors'), factors['Tenor'][hasTenor])
+            isXCcy = curveType == 'XCCY'
+            isInfl = curveType == 'INFL'
+            anyXCcy = isXCcy[:, None] | isXCcy[None, :]
+            anyInfl = isInfl[:, None] | isInfl[None, :]
+            bothInfl = isInfl[:, None] & isInfl[None, :]    # different curves are handled below
+
+            corr = np.where(anyXCcy, xCcyRho,
+                   np.where(anyInfl, np.where(bothInfl, 1.0, inflRho),
+                            tenorRho[tenorIdx[:, None], tenorIdx[None, :]]))
+
+            # Same CurveType, Different Curve
+            # i.e. we have two different IR curves
+            #           or two different XCCY curves
+            #           or two different INFL curves
+            otherCurve = sameType & ~FNU.pairwiseEqual(factors['Curve'].to_numpy(dtype=object))
+            corr[otherCurve] *= curveRho
+        elif riskClass[5:] == 'Vega':
+            optionTenorRho = self.getFastLookup('VegaOptionTenorRho')
+            underlyingTenorRho = self.getFastLookup('VegaUnderlyingTenorRho')
+            vegaTenors = self.getFastLookup('VegaTenors')
+            isIR = (factors['CurveType'] == 'IR').to_numpy()
+            isXCcy = curveType == 'XCCY'
+            # an XCCY factor's OptionMaturity is only looked up against another XCCY factor's
+            hasOption = ~isXCcy | (isXCcy.sum() > 1)
+            optionIdx = np.full(df.shape[0], -1)
+            optionIdx[hasOption] = FNU.encodeLabels(vegaTenors, factors['OptionMaturity'][hasOption])
+            underlyingIdx = np.full(df.shape[0], -1)
+            underlyingIdx[isIR] = FNU.encodeLabels(vegaTenors, factors['UnderlyingResidualMaturity'][isIR])
+            optionRho = optionTenorRho[optionIdx[:, None], optionIdx[None, :]]
+
+            # both IR: corr = optionMaturity * underlyingResidualMaturity
+            # both XCCY or both INFL: just use the rho for the option maturity
+            # just one is XCCY: xCcyRho
+            # one is INFL and the other is IR: inflRho * optionMaturity
+            corr = np.where(isIR[:, None] & isIR[None, :], optionRho * underlyingTenorRho[underlyingIdx[:, None], underlyingIdx[None, :]],
+                   np.where(sameType, optionRho,
+                   np.where(isXCcy[:, None] | isXCcy[None, :], xCcyRho,
+                            inflRho * optionRho)))
+            corr = np.minimum(corr, 1.0)
+        else:
+            corr = np.zeros((df.shape[0], df.shape[0]))
 
+        rho = FNU.lowerToSymmetric(corr)
         return pd.DataFrame(rho, index=df.index, columns=df.index)
 
 
-    def getGamma(self, df):
+    def getScaledGamma(self, df, level, curvature=False):
         if self._regulator != 'EU-EBA':
-            return super().getGamma(df)
+            return super().getScaledGamma(df, level, curvature)
 
-        ERMgamma = self.getConfigItem('GammaERMII')
-        ERMCcys = self.getConfigItem('ERMIICcys').to_list()
-        gamma = self.getConfigItem('Gamma')
+        prefix = 'Curvature' if curvature else ''
+        gamma = self.getFastLookup(prefix + 'Gamma' + level)
+        ERMgamma = self.getFastLookup(prefix + 'GammaERMII' + level)
         buckets = df['Bucket']
-        g = np.zeros((df.shape[0], df.shape[0]))
-
-        for i, rb in enumerate(buckets):
-            for j, cb in enumerate(buckets):
-                if i <= j:
-                    break
-
-                if rb in ERMCcys and cb == 'EUR' or cb in ERMCcys and rb == 'EUR':
-                    g[i, j] = g[j, i] = ERMgamma
-                else:
-                    g[i, j] = g[j, i] = gamma
-
-        return pd.DataFrame(g, index=buckets, columns=buckets)
+        isERM = self.inCurrencyGroup('ERMIICcys', buckets)
+        isEUR = (buckets == 'EUR').to_numpy()
+        g = np.where(np.outer(isERM, isEUR) | np.outer(isEUR, isERM), ERMgamma, gamma)
+        np.fill_diagonal(g, 0)
+        return self._gammaFrame(g, level, buckets)
 
 
 ## CR : Credit Non-Securitisations / CSR_NS
 #
 @FRTBCalculator.registerClass
 class MS_CR_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'IndexBuckets'       : frozenset,
+        'DeltaNameRho'       : float,
+        'DeltaTenorRho'      : float,
+        'DeltaBasisRho'      : float,
+        'DeltaNameIndexRho'  : float,
+        'DeltaTenorIndexRho' : float,
+        'DeltaBasisIndexRho' : float,
+        'OtherBucket'        : str,
+        'VegaRiskWeight'     : float
+    }
+
     _rhoFactorFields = {
         'Delta'     : ['CreditName', 'CurveType', 'Tenor'],
         'Vega'      : ['CreditName', 'OptionMaturity'],
@@ -513,58 +596,31 @@ class MS_CR_SA_SBM_Calc(SA_SBM_Calc):
         if riskClass[5:] != 'Delta':
             return super().getRiskWeights(riskClass, df)
 
-        RWBucket = self.getConfigItem('DeltaBucketRiskWeight')
         # Covered Bonds should already be assigned to the appropriate SubBuckets.
         # CovBondBucket = self.getConfigItem('CoveredBondBucket')
         # CovBondHighQuality = self.getConfigItem('CoveredBondHighQuality')
         ndf = df.reset_index()
-        ndf['RiskWeight'] = ndf.apply(lambda r: RWBucket.at[r['Bucket']+r['SubBucket']], axis=1)
+        ndf['RiskWeight'] = self.getWeights('DeltaBucketRiskWeight', 'BucketCodes', FNU.joinLabels(ndf['Bucket'], ndf['SubBucket']))
         return ndf.set_index(df.index)
 
 
     def getRho(self, riskClass, bucket, df):
-        rho = np.zeros((df.shape[0], df.shape[0]))
-        factors = df[self._rhoFactorFields[riskClass[5:]]]
-        indexBuckets = self.getConfigItem('IndexBuckets').to_list()
+        params = self._params
 
-        if bucket in indexBuckets:
-            nameRho = self.getConfigItem('DeltaNameIndexRho')
-            tenorRho = self.getConfigItem('DeltaTenorIndexRho')
-            basisRho = self.getConfigItem('DeltaBasisIndexRho')
+        if bucket in params.IndexBuckets:
+            nameRho = params.DeltaNameIndexRho
+            tenorRho = params.DeltaTenorIndexRho
+            basisRho = params.DeltaBasisIndexRho
         else:
-            nameRho = self.getConfigItem('DeltaNameRho')
-            tenorRho = self.getConfigItem('DeltaTenorRho')
-            basisRho = self.getConfigItem('DeltaBasisRho')
-
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                corr = 1.0
-
-                if r[0] != c[0]:
-                    # Different Obligor Names
-                    corr *= nameRho
-
-                if riskClass[5:] == 'Delta':
-                    if r[1] != c[1]:
-                        # Different curve types
-                        corr *= basisRho
-
-                    if r[2] != c[2]:
-                        # Different tenors
-                        corr *= tenorRho
-                elif riskClass[5:] == 'Vega':
-                    corr = min(corr * self.getConfigItem('VegaOptionTenorRho').at[r[1], c[1]], 1.0)
-
-                rho[i, j] = rho[j, i] = corr
+            nameRho = params.DeltaNameRho
+            tenorRho = params.DeltaTenorRho
+            basisRho = params.DeltaBasisRho
 
-        return pd.DataFrame(rho, index=df.index, columns=df.index)
+        return self.getCreditRho(riskClass, df, nameRho, basisRho, tenorRho)
 
 
     def  getBucketCalculator(self, riskClass, bucket):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if bucket != otherBucket:
             if riskClass[5:] == 'Curvature':
@@ -583,6 +639,14 @@ class MS_CR_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class MS_CC_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaNameRho'   : float,
+        'DeltaTenorRho'  : float,
+        'DeltaBasisRho'  : float,
+        'OtherBucket'    : str,
+        'VegaRiskWeight' : float
+    }
+
     _rhoFactorFields = {
         'Delta' : ['Underlier', 'CurveType', 'Tenor'],
         'Vega' : ['Underlier', 'OptionMaturity'],
@@ -590,41 +654,16 @@ class MS_CC_SA_SBM_Calc(SA_SBM_Calc):
     }
 
     def getRho(self, riskClass, bucket, df):
-        rho = np.zeros((df.shape[0], df.shape[0]))
-        factors = df[self._rhoFactorFields[riskClass[5:]]]
-        nameRho = self.getConfigItem('DeltaNameRho')
-        tenorRho = self.getConfigItem('DeltaTenorRho')
-        basisRho = self.getConfigItem('DeltaBasisRho')
+        params = self._params
+        nameRho = params.DeltaNameRho
+        tenorRho = params.DeltaTenorRho
+        basisRho = params.DeltaBasisRho
 
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                corr = 1.0
-
-                if r[0] != c[0]:
-                    # Different Obligor Names
-                    corr *= nameRho
-
-                if riskClass[5:] == 'Delta':
-                    if r[1] != c[1]:
-                        # Different curve types
-                        corr *= basisRho
-
-                    if r[2] != c[2]:
-                        # Different tenors
-                        corr *= tenorRho
-                elif riskClass[5:] == 'Vega':
-                    corr = min(corr * self.getConfigItem('VegaOptionTenorRho').at[r[1], c[1]], 1.0)
-
-                rho[i, j] = rho[j, i] = corr
-
-        return pd.DataFrame(rho, index=df.index, columns=df.index)
+        return self.getCreditRho(riskClass, df, nameRho, basisRho, tenorRho)
 
 
     def  getBucketCalculator(self, riskClass, bucket):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if bucket != otherBucket:
             if riskClass[5:] == 'Curvature':
@@ -642,6 +681,14 @@ class MS_CC_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class MS_CS_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaTrancheRho' : float,
+        'DeltaTenorRho'   : float,
+        'DeltaBasisRho'   : float,
+        'OtherBucket'     : str,
+        'VegaRiskWeight'  : float
+    }
+
     _rhoFactorFields = {
         'Delta' : ['Underlier', 'CurveType', 'Tenor'],
         'Vega' : ['Underlier', 'OptionMaturity'],
@@ -651,41 +698,17 @@ class MS_CS_SA_SBM_Calc(SA_SBM_Calc):
     def getRho(self, riskClass, bucket, df):
         # won't get called for the "Other" bukcet
         #
-        rho = np.zeros((df.shape[0], df.shape[0]))
-        factors = df[self._rhoFactorFields[riskClass[5:]]]
-        trancheRho = self.getConfigItem('DeltaTrancheRho')
-        tenorRho = self.getConfigItem('DeltaTenorRho')
-        basisRho = self.getConfigItem('DeltaBasisRho')
-
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                corr = 1.0
-
-                if r[0] != c[0]:
-                    # Different Issuer / Tranche / Index
-                    corr *= trancheRho
-
-                if riskClass[5:] == 'Delta':
-                    if r[1] != c[1]:
-                        # Different curve types
-                        corr *= basisRho
-
-                    if r[2] != c[2]:
-                        # Different tenors
-                        corr *= tenorRho
-                elif riskClass[5:] == 'Vega':
-                    corr = min(corr * self.getConfigItem('VegaOptionTenorRho').at[r[1], c[1]], 1.0)
+        params = self._params
+        trancheRho = params.DeltaTrancheRho
+        tenorRho = params.DeltaTenorRho
+        basisRho = params.DeltaBasisRho
 
-                rho[i, j] = rho[j, i] = corr
-
-        return pd.DataFrame(rho, index=df.index, columns=df.index)
+        # the name is the Issuer / Tranche / Index
+        return self.getCreditRho(riskClass, df, trancheRho, basisRho, tenorRho)
 
 
     def  getBucketCalculator(self, riskClass, bucket):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if bucket != otherBucket:
             if riskClass[5:] == 'Curvature':
@@ -708,7 +731,7 @@ class MS_CS_SA_SBM_Calc(SA_SBM_Calc):
     # The PRA regs are slightly clearer on this at Article 325ao.
     #
     def calcDeltaVega(self, riskClass, bdf):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if otherBucket in bdf['Bucket'].values:
             nbdf = bdf[bdf['Bucket'] != otherBucket]
@@ -746,7 +769,7 @@ class MS_CS_SA_SBM_Calc(SA_SBM_Calc):
 
 
     def calcCurvature(self, riskClass, bdf):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if otherBucket in bdf['Bucket'].values:
             nbdf = bdf[bdf['Bucket'] != otherBucket]
@@ -786,6 +809,12 @@ class MS_CS_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class MS_EQ_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaNameBucketRho' : dict,
+        'DeltaSpotRepoRho'   : float,
+        'OtherBucket'        : str
+    }
+
     _rhoFactorFields = {
         'Delta'     : ['EquityName', 'SpotRepo'],
         'Vega'      : ['EquityName', 'OptionMaturity'],
@@ -796,12 +825,18 @@ class MS_EQ_SA_SBM_Calc(SA_SBM_Calc):
         riskType = riskClass[5:]
 
         if riskType == 'Delta':
-            RWBucket = self.getConfigItem('DeltaBucketRiskWeight')
-            df.loc[:, 'RiskWeight'] = df.apply(lambda row : RWBucket.at[row['SpotRepo'], row['Bucket']+row['SubBucket']], axis=1)
+            RWBucket = self.getFastLookup('DeltaBucketRiskWeight')
+            spotRepo = FNU.encodeLabels(self.getFastLookup('SpotRepoCodes'), df['SpotRepo'])
+            bucket = FNU.encodeLabels(self.getFastLookup('BucketCodes'), FNU.joinLabels(df['Bucket'], df['SubBucket']))
+            df.loc[:, 'RiskWeight'] = RWBucket[spotRepo, bucket]
         elif riskType == 'Vega':
-            RWVega = self.getConfigItem('VegaRiskWeight')
-            bucketInfo = self.getConfigItem('Bucket').set_index(['Bucket', 'SubBucket'])
-            df.loc[:, 'RiskWeight'] = df.apply(lambda r : RWVega.at[bucketInfo.at[(r['Bucket'],r['SubBucket']), 'MarketCap'], 'RiskWeight'], axis=1)
+            # the vega risk weight depends on the market cap of the bucket
+            marketCap = self.getFastLookup('BucketMarketCap')[FNU.encodeLabels(self.getFastLookup('BucketCodes'), FNU.joinLabels(df['Bucket'], df['SubBucket']))]
+
+            if (marketCap < 0).any():
+                raise KeyError('MarketCap')
+
+            df.loc[:, 'RiskWeight'] = self.getFastLookup('VegaRiskWeight')[marketCap]
         else:
             # Curvature - is there any risk weight for curvature?
             # CVR+ and CVR- are already delta-neutralised so nothing to do.
@@ -813,38 +848,19 @@ class MS_EQ_SA_SBM_Calc(SA_SBM_Calc):
 
 
     def getRho(self, riskClass, bucket, df):
-        rho = np.zeros((df.shape[0], df.shape[0]))
-        factors = df[self._rhoFactorFields[riskClass[5:]]]
-        nameRho = self.getConfigItem('DeltaNameBucketRho').at[bucket]
-        spotRepoRho = self.getConfigItem('DeltaSpotRepoRho')
+        params = self._params
+        nameRho = params.DeltaNameBucketRho[bucket]
+        spotRepoRho = params.DeltaSpotRepoRho
 
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                corr = 1.0
-
-                if r[0] != c[0]:
-                    # Different Names
-                    corr *= nameRho
-
-                if riskClass[5:] == 'Delta':
-                    if r[1] != c[1]:
-                        # One spot one repo
-                        corr *= spotRepoRho
-                elif riskClass[5:] == 'Vega':
-                    if r[1] != c[1]:
-                        # Different option maturities
-                        corr = min(corr * self.getConfigItem('VegaOptionTenorRho').at[r[1], c[1]], 1.0)
-
-                rho[i, j] = rho[j, i] = corr
-
-        return pd.DataFrame(rho, index=df.index, columns=df.index)
+        # Different Names, then for delta one spot one repo, or for vega different option maturities
+        if riskClass[5:] == 'Delta':
+            return self.getProductRho(df, [('EquityName', nameRho), ('SpotRepo', spotRepoRho)])
+        else:
+            return self.getProductRho(df, [('EquityName', nameRho)], optionMaturity=riskClass[5:] == 'Vega', sameMaturity=False)
 
 
     def  getBucketCalculator(self, riskClass, bucket):
-        otherBucket = self.getConfigItem('OtherBucket')
+        otherBucket = self._params.OtherBucket
 
         if bucket != otherBucket:
             if riskClass[5:] == 'Curvature':
@@ -862,6 +878,13 @@ class MS_EQ_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class MS_CM_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaCommodityRho' : dict,
+        'DeltaTenorRho'     : float,
+        'DeltaBasisRho'     : float,
+        'VegaRiskWeight'    : float
+    }
+
     _rhoFactorFields = {
         'Delta'     : ['CommodityName', 'DeliveryLocation', 'Tenor'],
         'Vega'      : ['CommodityName', 'OptionMaturity'],
@@ -869,43 +892,28 @@ class MS_CM_SA_SBM_Calc(SA_SBM_Calc):
     }
 
     def getRho(self, riskClass, bucket, df):
-        rho = np.zeros((df.shape[0], df.shape[0]))
-        factors = df[self._rhoFactorFields[riskClass[5:]]]
-        commodityRho = self.getConfigItem('DeltaCommodityRho').at[bucket]
-        deltaTenorRho = self.getConfigItem('DeltaTenorRho')
-        basisRho = self.getConfigItem('DeltaBasisRho')
-
-        for i, r in enumerate(factors.itertuples(index=False)):
-            for j, c in enumerate(factors.itertuples(index=False)):
-                if i <= j:
-                    break
-
-                corr = 1.0
-
-                if r[0] != c[0]:
-                    # Different Names
-                    corr *= commodityRho
-
-                if riskClass[5:] == 'Delta':
-                    if r[2] != c[2]:
-                        # Different tenors
-                        corr *= deltaTenorRho
-
-                    if r[1] != c[1]:
-                        # Different delivery locations
-                        corr *= basisRho
-                elif riskClass[5:] == 'Vega':
-                    corr = min(corr * self.getConfigItem('VegaOptionTenorRho').at[r[1], c[1]], 1)
-
-                rho[i, j] = rho[j, i] = corr
-
-        return pd.DataFrame(rho, index=df.index, columns=df.index)
+        params = self._params
+        commodityRho = params.DeltaCommodityRho[bucket]
+        deltaTenorRho = params.DeltaTenorRho
+        basisRho = params.DeltaBasisRho
+
+        # Different Names, then for delta different tenors and different delivery locations
+        if riskClass[5:] == 'Delta':
+            return self.getProductRho(df, [('CommodityName', commodityRho), ('Tenor', deltaTenorRho), ('DeliveryLocation', basisRho)])
+        else:
+            return self.getProductRho(df, [('CommodityName', commodityRho)], optionMaturity=riskClass[5:] == 'Vega')
 
 
 ## FX : Foreign Exchange
 #
 @FRTBCalculator.registerClass
 class MS_FX_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaRiskWeight' : float,
+        'ERMIIBand'       : (float, None),
+        'VegaRiskWeight'  : float
+    }
+
     _rhoFactorFields = {
         'Delta' : [],
         'Vega' : ['OptionMaturity'],
@@ -915,24 +923,20 @@ class MS_FX_SA_SBM_Calc(SA_SBM_Calc):
     def getRiskWeights(self, riskClass, df):
         riskType = riskClass[5:]
         if riskType == 'Delta':
-            RW = self.getConfigItem('DeltaRiskWeight')
-            baselCcys = self.getConfigItem('BaselCcys').to_list()
+            RW = self._params.DeltaRiskWeight
             df.loc[:, 'RiskWeight'] = RW
 
             if self._regulator == 'EU-EBA':
-                ERMCcys = self.getConfigItem('ERMIICcys')
-                ERMBand = self.getConfigItem('ERMIIBand')
-                EURPegCcys = self.getConfigItem('EURPegCcys').to_list()
-                df.loc[df['Bucket'].isin(baselCcys), 'RiskWeight'] = RW / (2 ** 0.5)
-                df.loc[df['Bucket'].isin(ERMCcys.index), 'RiskWeight'] = df.loc[df['Bucket'].isin(ERMCcys.index), :].apply(
-                    lambda x: ERMCcys.at[x['Bucket']] if ERMCcys.at[x['Bucket']] < ERMBand else RW / 3.0
-                    , axis=1)
-                df.loc[df['Bucket'].isin(EURPegCcys), 'RiskWeight'] = RW / 2.0
+                ERMBand = self._params.ERMIIBand
+                isERM = self.inCurrencyGroup('ERMIICcys', df['Bucket'])
+                ERMRW = self.getWeights('ERMIICcys', 'ERMIICcyCodes', df.loc[isERM, 'Bucket'])
+                df.loc[self.inCurrencyGroup('BaselCcys', df['Bucket']), 'RiskWeight'] = RW / (2 ** 0.5)
+                df.loc[isERM, 'RiskWeight'] = np.where(ERMRW < ERMBand, ERMRW, RW / 3.0)
+                df.loc[self.inCurrencyGroup('EURPegCcys', df['Bucket']), 'RiskWeight'] = RW / 2.0
             else:
-                df.loc[df['Bucket'].isin(baselCcys), 'RiskWeight'] = RW / (2 ** 0.5)
+                df.loc[self.inCurrencyGroup('BaselCcys', df['Bucket']), 'RiskWeight'] = RW / (2 ** 0.5)
         elif riskType == 'Vega':
-            RWVega = self.getConfigItem('VegaRiskWeight')
-            df.loc[:, 'RiskWeight'] = RWVega
+            df.loc[:, 'RiskWeight'] = self._params.VegaRiskWeight
         else:
             # Curvature - is there any risk weight for curvature?
             # CVR+ and CVR- are already delta-neutralised so nothing to do.
@@ -946,9 +950,10 @@ class MS_FX_SA_SBM_Calc(SA_SBM_Calc):
         if riskClass[5:] != 'Vega':
             return super().getRho(riskClass, bucket, df)
 
-        rhoTenor = self.getConfigItem('VegaOptionTenorRho')
-        tenors = df['OptionMaturity'].to_list()
-        return rhoTenor.loc[tenors, tenors]
+        rhoTenor = self.getFastLookup('VegaOptionTenorRho')
+        tenors = pd.Index(df['OptionMaturity'], name='VegaTenors')
+        tenorIdx = FNU.encodeLabels(self.getFastLookup('VegaTenors'), tenors)
+        return pd.DataFrame(rhoTenor[np.ix_(tenorIdx, tenorIdx)], index=tenors, columns=tenors)
 
 
 #%%################################################
@@ -963,6 +968,18 @@ class MS_FX_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class CS_IR_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'BaselCcys'                        : frozenset,
+        'ERMIICcys'                        : (frozenset, frozenset()),
+        'DeltaInflationRiskWeight'         : float,
+        'DeltaTenorIlliquidRiskWeight'     : float,
+        'DeltaInflationIlliquidRiskWeight' : float,
+        'DeltaIlliquidRho'                 : float,
+        'DeltaInflationRho'                : float,
+        'VegaRho'                          : float,
+        'VegaRiskWeight'                   : float
+    }
+
     _rhoFactorFields = {
         'Delta' : ['CurveType', 'Tenor'],
         'Vega' : ['CurveType']
@@ -972,31 +989,39 @@ class CS_IR_SA_SBM_Calc(SA_SBM_Calc):
         if riskClass[5:] != 'Delta':
             return super().getRiskWeights(riskClass, df)
 
-        BaselCcys = self.getConfigItem('BaselCcys').to_list()
+        isBasel = self.inCurrencyGroup('BaselCcys', df['Bucket'])
 
         if self._regulator == 'EU-EBA':
-            BaselCcys.extend(self.getConfigItem('ERMIICcys').to_list())
-
-        tenorRW = self.getConfigItem('DeltaTenorRiskWeight')
-        inflationRW = self.getConfigItem('DeltaInflationRiskWeight')
-        tenorIlliquidRW = self.getConfigItem('DeltaTenorIlliquidRiskWeight')
-        inflationIlliquidRW = self.getConfigItem('DeltaInflationIlliquidRiskWeight')
-        df.loc[df['Bucket'].isin(BaselCcys), 'RiskWeight'] = df[df['Bucket'].isin(BaselCcys)].apply(lambda x: tenorRW.at[x['Tenor']] if x['CurveType']=='IR' else inflationRW, axis=1)
-        df.loc[~df['Bucket'].isin(BaselCcys), 'RiskWeight'] = df[~df['Bucket'].isin(BaselCcys)].apply(lambda x: tenorIlliquidRW if x['CurveType']=='IR' else inflationIlliquidRW, axis=1)
+            isBasel |= self.inCurrencyGroup('ERMIICcys', df['Bucket'])
+
+        params = self._params
+        inflationRW = params.DeltaInflationRiskWeight
+        tenorIlliquidRW = params.DeltaTenorIlliquidRiskWeight
+        inflationIlliquidRW = params.DeltaInflationIlliquidRiskWeight
+        isIR = (df['CurveType'] == 'IR').to_numpy()
+        df.loc[isBasel & ~isIR, 'RiskWeight'] = inflationRW
+        df.loc[isBasel & isIR, 'RiskWeight'] = self.getWeights('DeltaTenorRiskWeight', 'DeltaTenors', df.loc[isBasel & isIR, 'Tenor'])
+        df.loc[~isBasel, 'RiskWeight'] = np.where(isIR[~isBasel], tenorIlliquidRW, inflationIlliquidRW)
         return df
 
     def getRho(self, riskClass, bucket, df):
         rho = np.zeros((df.shape[0], df.shape[0]))
         factors = df[self._rhoFactorFields[riskClass[5:]]]
-        BaselCcys = self.getConfigItem('BaselCcys').to_list()
+        params = self._params
+        BaselCcys = params.BaselCcys
 
         if self._regulator == 'EU-EBA':
-            BaselCcys.extend(self.getConfigItem('ERMIICcys').to_list())
+            BaselCcys = BaselCcys | params.ERMIICcys
 
-        deltaTenorRho = self.getConfigItem('DeltaTenorRho')
-        deltaIlliquidRho = self.getConfigItem('DeltaIlliquidRho')
-        deltaInflationRho = self.getConfigItem('DeltaInflationRho')
-        vegaRho = self.getConfigItem('VegaRho')
+        deltaIlliquidRho = params.DeltaIlliquidRho
+        deltaInflationRho = params.DeltaInflationRho
+        vegaRho = params.VegaRho
+
+        if riskClass[5:] == 'Delta' and bucket in BaselCcys:
+            deltaTenorRho = self.getFastLookup('DeltaTenorRho')
+            tenorIdx = np.full(df.shape[0], -1)
+            hasTenor = (factors['CurveType'] != 'INFL').to_numpy()
+            tenorIdx[hasTenor] = FNU.encodeLabels(self.getFastLookup('DeltaTenors'), factors['Tenor'][hasTenor])
 
         for i, r in enumerate(factors.itertuples(index=False)):
             for j, c in enumerate(factors.itertuples(index=False)):
@@ -1010,7 +1035,7 @@ class CS_IR_SA_SBM_Calc(SA_SBM_Calc):
                         else:
                             corr = deltaInflationRho
                     elif bucket in BaselCcys:
-                        corr = deltaTenorRho.at[r[1], c[1]]
+                        corr = deltaTenorRho[tenorIdx[i], tenorIdx[j]]
                     else:
                         corr = deltaIlliquidRho
                 elif riskClass[5:] == 'Vega':
@@ -1024,6 +1049,11 @@ class CS_IR_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class CS_FX_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'DeltaRiskWeight' : float,
+        'VegaRiskWeight'  : float
+    }
+
     _rhoFactorFields = {
         'Delta' : [],
         'Vega' : []
@@ -1033,9 +1063,9 @@ class CS_FX_SA_SBM_Calc(SA_SBM_Calc):
         riskType = riskClass[5:]
 
         if riskType == 'Delta':
-            RW = self.getConfigItem('DeltaRiskWeight')
+            RW = self._params.DeltaRiskWeight
         elif riskType == 'Vega':
-            RW = self.getConfigItem('VegaRiskWeight')
+            RW = self._params.VegaRiskWeight
 
         df.loc[:, 'RiskWeight'] = RW
         return df
@@ -1048,36 +1078,49 @@ class CS_FX_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class CS_CC_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'IndexBuckets'               : frozenset,
+        'DeltaNameRelatedRho'        : float,
+        'DeltaNameUnrelatedRho'      : float,
+        'DeltaTenorRho'              : float,
+        'DeltaCreditQualityRho'      : float,
+        'DeltaNameRelatedIndexRho'   : float,
+        'DeltaNameUnrelatedIndexRho' : float,
+        'DeltaTenorIndexRho'         : float,
+        'DeltaCreditQualityIndexRho' : float
+    }
+
     _rhoFactorFields = {
         'Delta' : ['CreditName', 'ParentName', 'IG_HYNR', 'Tenor']
     }
 
     def getRiskWeights(self, riskClass, df):
         ndf = df.copy()
-        RW = self.getConfigItem('DeltaRiskWeight')
+        RW = self.getFastLookup('DeltaRiskWeight')
+        bucket = FNU.encodeLabels(self.getFastLookup('BucketCodes'), FNU.joinLabels(ndf['Bucket'], ndf['SubBucket']))
 
         if self._regulator == 'EU-EBA':
-            ndf.loc[:, 'RiskWeight'] = ndf.apply(lambda x : RW.iloc[0, :].at[x['Bucket']+x['SubBucket']], axis=1)
+            ndf.loc[:, 'RiskWeight'] = RW[0, bucket]
         else:
-            ndf.loc[:, 'RiskWeight'] = ndf.apply(lambda x : RW.at[x['IG_HYNR'], x['Bucket']+x['SubBucket']], axis=1)
+            ndf.loc[:, 'RiskWeight'] = RW[FNU.encodeLabels(self.getFastLookup('CreditQualityCodes'), ndf['IG_HYNR']), bucket]
 
         return ndf
 
     def getRho(self, riskClass, bucket, df):
         rho = np.zeros((df.shape[0], df.shape[0]))
         factors = df[self._rhoFactorFields[riskClass[5:]]]
-        indexBuckets = self.getConfigItem('IndexBuckets').to_list()
+        params = self._params
 
-        if bucket in indexBuckets:
-            nameRelatedRho = self.getConfigItem('DeltaNameRelatedIndexRho')
-            nameUnrelatedRho = self.getConfigItem('DeltaNameUnrelatedIndexRho')
-            tenorRho = self.getConfigItem('DeltaTenorIndexRho')
-            ratingRho = self.getConfigItem('DeltaCreditQualityIndexRho')
+        if bucket in params.IndexBuckets:
+            nameRelatedRho = params.DeltaNameRelatedIndexRho
+            nameUnrelatedRho = params.DeltaNameUnrelatedIndexRho
+            tenorRho = params.DeltaTenorIndexRho
+            ratingRho = params.DeltaCreditQualityIndexRho
         else:
-            nameRelatedRho = self.getConfigItem('DeltaNameRelatedRho')
-            nameUnrelatedRho = self.getConfigItem('DeltaNameUnrelatedRho')
-            tenorRho = self.getConfigItem('DeltaTenorRho')
-            ratingRho = self.getConfigItem('DeltaCreditQualityRho')
+            nameRelatedRho = params.DeltaNameRelatedRho
+            nameUnrelatedRho = params.DeltaNameUnrelatedRho
+            tenorRho = params.DeltaTenorRho
+            ratingRho = params.DeltaCreditQualityRho
 
         for i, r in enumerate(factors.itertuples(index=False)):
             for j, c in enumerate(factors.itertuples(index=False)):
@@ -1107,6 +1150,10 @@ class CS_CC_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class CS_CR_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'VegaRiskWeight' : float
+    }
+
     _rhoFactorFields = {
         'Delta' : [],
         'Vega' : []
@@ -1129,11 +1176,11 @@ class CS_EQ_SA_SBM_Calc(SA_SBM_Calc):
         riskType = riskClass[5:]
 
         if riskType == 'Delta':
-            RWBucket = self.getConfigItem('DeltaBucketRiskWeight')
+            RWBucket = 'DeltaBucketRiskWeight'
         elif riskType == 'Vega':
-            RWBucket = self.getConfigItem('VegaBucketRiskWeight')
+            RWBucket = 'VegaBucketRiskWeight'
 
-        df.loc[:, 'RiskWeight'] = df.apply(lambda r : RWBucket.at[r['Bucket']+r['SubBucket']], axis=1)
+        df.loc[:, 'RiskWeight'] = self.getWeights(RWBucket, 'BucketCodes', FNU.joinLabels(df['Bucket'], df['SubBucket']))
         return df
 
     def getRho(self, riskClass, bucket, df):
@@ -1144,6 +1191,10 @@ class CS_EQ_SA_SBM_Calc(SA_SBM_Calc):
 #
 @FRTBCalculator.registerClass
 class CS_CM_SA_SBM_Calc(SA_SBM_Calc):
+    _parameters = {
+        'VegaRiskWeight' : float
+    }
+
     _rhoFactorFields = {
         'Delta' : [],
         'Vega' : []
@@ -0,0 +1,103 @@
+"""
+Tests of FNetF, run with pytest from the root of the repository:
+
+    python -m pytest Tests
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import pytest
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FNetF
+
+
+unitTestFile = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Examples', 'UnitTests_BCBS_FNetF_v0.9.xlsx')
+
+
+@pytest.fixture(scope='module')
+def unitTests():
+    fnf = FNetF.FNetF()
+    fnf.load(unitTestFile)
+    return fnf
+
+
+def testUnitTestRowsAfterReplace(unitTests):
+    # MS_IR_000043 is "ALL MS_IRD_", whose prefix must still be expanded once the risk class data has been
+    # replaced and the rows worked out at load have been dropped
+    riskClass = 'MS_IRDelta'
+    loaded = unitTests.getUnitTestSensis('CapitalTests', 'MS_IR_000043', riskClass)
+    assert len(loaded) > 0
+
+    unitTests.setRiskClassData(riskClass, unitTests.getRiskClassData(riskClass))
+    replaced = unitTests.getUnitTestSensis('CapitalTests', 'MS_IR_000043', riskClass)
+    assert replaced['Sensitivity ID'].tolist() == loaded['Sensitivity ID'].tolist()
+
+    unitTests.upsertRiskClassData(riskClass, unitTests.getRiskClassData(riskClass).iloc[:1])
+    upserted = unitTests.getUnitTestSensis('CapitalTests', 'MS_IR_000043', riskClass)
+    assert sorted(upserted['Sensitivity ID']) == sorted(loaded['Sensitivity ID'])
+
+
+def testUnitTestRowsAcrossRiskClasses(unitTests):
+    # a test added with setUnitTests finds its sensitivities in every risk class, not just its RiskClass's
+    irId = unitTests.getRiskClassData('MS_IRDelta')['Sensitivity ID'].iat[0]
+    crId = unitTests.getRiskClassData('MS_CRDelta')['Sensitivity ID'].iat[0]
+    tests = unitTests.getUnitTests('CapitalTests').iloc[:1].copy()
+    tests['Test ID'] = 'Mixed'
+    tests['RiskClass'] = 'MS_IRDelta'
+    tests['Sensitivity IDs'] = f"{irId}, {crId}"
+    unitTests.setUnitTests('CapitalTests', pd.concat([unitTests.getUnitTests('CapitalTests'), tests], ignore_index=True))
+
+    rows = unitTests.getUnitTestRows('CapitalTests', 'Mixed')
+    assert unitTests.getRiskClassData('MS_IRDelta')['Sensitivity ID'].iloc[rows['MS_IRDelta']].tolist() == [irId]
+    assert unitTests.getRiskClassData('MS_CRDelta')['Sensitivity ID'].iloc[rows['MS_CRDelta']].tolist() == [crId]
+
+
+def testMappedRoundTrip(unitTests, tmp_path):
+    # a mapped FNetF holds only numbers and strings, none of it pickled, and loads back as it was saved
+    path = str(tmp_path / 'UnitTests.fnmap')
+    unitTests.save(path)
+    mapped = FNetF.FNetF()
+    mapped.load(path)
+
+    for riskClass in unitTests.getRiskClasses():
+        actual = mapped.getRiskClassData(riskClass)
+        expected = unitTests.getRiskClassData(riskClass)[actual.columns]  # only the risk class's own fields are saved
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, check_categorical=False)
+
+    for root, dirs, files in os.walk(path):
+        assert not [f for f in files if f.endswith('.objects.npy')]
+
+
+def testMappedRejectsObjects(unitTests, tmp_path):
+    # a column of anything but strings and numbers would have to be pickled, so it isn't saved
+    fnf = FNetF.FNetF()
+    tests = unitTests.getUnitTests('CapitalTests').copy()
+    tests['Sensitivity IDs'] = tests['Sensitivity IDs'].str.split(', ')
+    fnf.setUnitTests('CapitalTests', tests)
+
+    with pytest.raises(ValueError, match='Sensitivity IDs'):
+        fnf.save(str(tmp_path / 'Objects.fnmap'))
+
+    assert not os.path.exists(tmp_path / 'Objects.fnmap')
@@ -0,0 +1,92 @@
+"""
+Tests of FNetFStore, run with pytest from the root of the repository:
+
+    python -m pytest Tests
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import datetime as dt
+import pytest
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FNetF
+import FNetFStore
+
+
+cob = dt.date(2024, 4, 1)
+
+
+def makeFNetF(sensitivity):
+    fnf = FNetF.FNetF()
+    fnf.setParam('COB Date', cob.isoformat())
+    fnf.setRiskClassData('MS_IRDelta', pd.DataFrame({
+        'Sensitivity ID'    : ['IR1', 'IR2'],
+        'RiskGroup'         : ['Rates', 'Rates'],
+        'RiskSubGroup'      : ['Main', 'Main'],
+        'RiskClass'         : ['MS_IRDelta', 'MS_IRDelta'],
+        'Bucket'            : ['USD', 'USD'],
+        'CurveType'         : ['IR', 'IR'],
+        'Curve'             : ['OIS', 'OIS'],
+        'Tenor'             : ['1', '5'],
+        'Sensitivity'       : [sensitivity, sensitivity],
+    }))
+    fnf.setRiskClassData('MS_FXDelta', pd.DataFrame({
+        'Sensitivity ID'    : ['FX1'],
+        'RiskGroup'         : ['Rates'],
+        'RiskSubGroup'      : ['Main'],
+        'RiskClass'         : ['MS_FXDelta'],
+        'Bucket'            : ['EUR'],
+        'Sensitivity'       : [sensitivity],
+    }))
+    return fnf
+
+
+def testFailedSaveKeepsRiskGroup(tmp_path, monkeypatch):
+    # a RiskGroup is only replaced once all of its new risk classes are written
+    store = FNetFStore.FNetFStore(str(tmp_path))
+    store.save(makeFNetF(100.0))
+    writePartition = store._writePartition
+
+    def failOnFX(riskClass, df, path):
+        if riskClass == 'MS_FXDelta':
+            raise OSError('disk full')
+
+        writePartition(riskClass, df, path)
+
+    monkeypatch.setattr(store, '_writePartition', failOnFX)
+
+    with pytest.raises(OSError):
+        store.save(makeFNetF(200.0))
+
+    fnf = store.load(cob, cob)[cob]
+    assert fnf.getRiskClassData('MS_IRDelta')['Sensitivity'].tolist() == [100.0, 100.0]
+    assert fnf.getRiskClassData('MS_FXDelta')['Sensitivity'].tolist() == [100.0]
+    assert store.getRiskGroups(cob) == ['Rates']
+    assert sorted(os.listdir(tmp_path / ('COBDate=' + cob.isoformat()))) == ['Parameters.parquet', 'RiskGroup=Rates']
+
+    monkeypatch.setattr(store, '_writePartition', writePartition)
+    store.save(makeFNetF(200.0))
+    fnf = store.load(cob, cob)[cob]
+    assert fnf.getRiskClassData('MS_FXDelta')['Sensitivity'].tolist() == [200.0]
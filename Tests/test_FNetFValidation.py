@@ -0,0 +1,101 @@
+"""
+Tests of FNetF validation, see FNetF.setValidation, run with pytest from the root of the repository:
+
+    python -m pytest Tests
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FNetF
+
+
+def creditSensis(ids, **fields):
+    sensis = pd.DataFrame({
+        'Sensitivity ID'    : ids,
+        'RiskGroup'         : 'Check',
+        'RiskSubGroup'      : 'Check',
+        'RiskClass'         : 'MS_CRDelta',
+        'Bucket'            : '1',
+        'SubBucket'         : '',
+        'CurveType'         : 'Bond',
+        'Tenor'             : '1',
+        'Sensitivity'       : 1.0,
+    })
+
+    for field, values in fields.items():
+        sensis[field] = values
+
+    return sensis
+
+
+def testMissingKeyFieldsRejectedWithoutConfig():
+    # None, NaN and blank key fields are all missing, even with no config to check the reference data,
+    # while a blank SubBucket is valid
+    fnf = FNetF.FNetF()
+    fnf.setValidation()
+    fnf.setRiskClassData('MS_CRDelta', creditSensis(['Valid', 'NoRiskGroup', 'NaNBucket', 'BlankRiskSubGroup'],
+                                                    RiskGroup=['Check', None, 'Check', 'Check'],
+                                                    RiskSubGroup=['Check', 'Check', 'Check', ''],
+                                                    Bucket=['1', '1', np.nan, '1']))
+
+    assert fnf.getRiskClassData('MS_CRDelta')['Sensitivity ID'].tolist() == ['Valid']
+    rejects = fnf.getRejects('MS_CRDelta')
+    assert rejects['Sensitivity ID'].tolist() == ['NoRiskGroup', 'NaNBucket', 'BlankRiskSubGroup']
+    assert rejects['Reject Reason'].tolist() == ["RiskGroup 'None' is missing", "Bucket 'nan' is missing", "RiskSubGroup '' is missing"]
+
+
+def testNonFiniteSensitivityRejected():
+    fnf = FNetF.FNetF()
+    fnf.setValidation()
+    fnf.setRiskClassData('MS_CRDelta', creditSensis(['Valid', 'Infinite'], Sensitivity=[1.0, np.inf]))
+
+    assert fnf.getRiskClassData('MS_CRDelta')['Sensitivity ID'].tolist() == ['Valid']
+    assert fnf.getRejects('MS_CRDelta')['Reject Reason'].tolist() == ["Sensitivity 'inf' is not a finite number"]
+
+
+def testRejectedAmendmentKeepsHeldRow():
+    # an upsert whose row fails validation leaves the row it would have replaced as it was
+    fnf = FNetF.FNetF()
+    fnf.setValidation()
+    fnf.setRiskClassData('MS_CRDelta', creditSensis(['A', 'B']))
+    fnf.upsertRiskClassData('MS_CRDelta', creditSensis(['A'], Sensitivity=np.inf))
+
+    held = fnf.getRiskClassData('MS_CRDelta')
+    assert held['Sensitivity ID'].tolist() == ['A', 'B']
+    assert held['Sensitivity'].tolist() == [1.0, 1.0]
+    assert fnf.getRejects('MS_CRDelta')['Sensitivity ID'].tolist() == ['A']
+
+
+def testLoadCSVCountsExcludeRejects(tmp_path):
+    # loadCSV reports the rows that were loaded once the rejects have been set aside
+    path = str(tmp_path / 'Sensis.csv')
+    creditSensis(['Valid', 'Infinite', 'NoBucket'], Sensitivity=[1.0, np.inf, 1.0], Bucket=['1', '1', '']).to_csv(path, index=False)
+    fnf = FNetF.FNetF()
+    fnf.setValidation()
+
+    assert fnf.loadCSV(path) == {'MS_CRDelta' : 1}
+    assert fnf.getRejects('MS_CRDelta')['Sensitivity ID'].tolist() == ['Infinite', 'NoBucket']
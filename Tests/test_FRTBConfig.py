@@ -0,0 +1,73 @@
+"""
+Tests of FRTBConfig, run with pytest from the root of the repository:
+
+    python -m pytest Tests
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import pickle
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FRTBConfig
+
+
+regulator = 'BCBS'
+
+
+class Unloadable(object):
+    # unpickles by calling int('x'), which raises a ValueError as a snapshot from other versions might
+    def __reduce__(self):
+        return (int, ('x',))
+
+
+def testUnloadableSnapshotRebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(FRTBConfig.FRTBConfig, '_snapshotDir', str(tmp_path))
+    sheets = FRTBConfig.FRTBConfig(regulator)._sheetNames
+    snapfile = FRTBConfig.FRTBConfig.getSnapshotPath(regulator, '_Sheets')
+
+    with open(snapfile, 'wb') as f:
+        pickle.dump(Unloadable(), f)
+
+    assert FRTBConfig.FRTBConfig(regulator)._sheetNames == sheets
+
+
+def testSnapshotOfOtherLibrariesRebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(FRTBConfig.FRTBConfig, '_snapshotDir', str(tmp_path))
+    config = FRTBConfig.FRTBConfig(regulator)
+    sheets = config._sheetNames
+    snapfile = FRTBConfig.FRTBConfig.getSnapshotPath(regulator, '_Sheets')
+
+    with open(snapfile, 'rb') as f:
+        snap = pickle.load(f)
+
+    assert config.readSnapshot('_Sheets') == sheets
+
+    snap['Libraries'] = ('3.0.0', '1.0.0', '1.0.0')
+    snap['Config'] = ['Stale']
+
+    with open(snapfile, 'wb') as f:
+        pickle.dump(snap, f)
+
+    assert config.readSnapshot('_Sheets') is None
+    assert FRTBConfig.FRTBConfig(regulator)._sheetNames == sheets
@@ -0,0 +1,50 @@
+"""
+Tests of the SBM calculators, run with pytest from the root of the repository:
+
+    python -m pytest Tests
+
+Copyright © 2024 frtb.net limited
+
+Author: Alan Skea, frtb.net limited
+
+Contact us at <info@frtb.net> or via our website at <https://frtb.net>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FRTBCalculator
+import SA_SBM_Calc           # registers the SBM calculators with FRTBCalculator
+
+
+def testIRVegaXCcyWithoutOptionMaturity():
+    # a lone XCCY factor's OptionMaturity is never looked up, so it needn't be a vega tenor
+    calc = FRTBCalculator.FRTBCalculator.create('MS_IR', 'BCBS', 'USD', dt.date(2024, 4, 1))
+    df = pd.DataFrame({
+        'CurveType'                     : ['IR', 'IR', 'INFL', 'XCCY'],
+        'OptionMaturity'                : ['1', '5', '1', ''],
+        'UnderlyingResidualMaturity'    : ['1', '10', np.nan, np.nan],
+    })
+    rho = calc.getRho('MS_IRVega', 'USD', df).to_numpy()
+
+    expected = calc.getRho('MS_IRVega', 'USD', df.assign(OptionMaturity=['1', '5', '1', '1'])).to_numpy()
+    assert np.array_equal(rho, expected)
+    assert np.array_equal(rho[3, :3], np.full(3, calc._params.DeltaXCcyBasisRho))